@@ -0,0 +1,168 @@
+"""Cross-worker coherence check: how long until another worker evicts a write.
+
+Runs two invalidation buses (services/invalidation.py) against the same
+database, each on its own client as two workers would be. Worker A writes
+(alternating portfolio updates and section inserts, each followed by the
+version bump); the check measures the time until worker B's bus delivers the
+new version, and reports p50/p95/p99/max and any write B never saw.
+
+Change streams need a replica set; a local single-node one is enough:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval 'rs.initiate()'
+
+    python -m benchmarks.coherence --mode changestream --mongo-url "mongodb://localhost:27017/?replicaSet=rs0"
+    python -m benchmarks.coherence --mode poll --mongo-url mongodb://localhost:27017
+
+Poll mode also runs without a server, on mongomock-motor (the default when
+--mongo-url is not given). Exits non-zero if any write was missed.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+
+from models.experience import ExperienceCreate
+from models.portfolio import PersonalInfo, PortfolioCreate, PortfolioUpdate, Stat
+from services.invalidation import InvalidationBus
+from services.storage import build_storage
+from services.versioning import bump_version
+from benchmarks.load_test import summarize
+
+
+class Worker:
+    """One side of the check: a bus plus the versions it has been told about"""
+
+    def __init__(self, db, args):
+        self.db = db
+        self.waiting = {}  # user_id -> (version, future)
+        self.bus = InvalidationBus(db, args.mode, self.on_change, args.poll_interval, args.overlap)
+
+    def on_change(self, user_id, version, sections):
+        entry = self.waiting.get(user_id)
+        # Section events (version None) precede the bump; wait for the versioned one
+        if entry is not None and version is not None and version >= entry[0] and not entry[1].done():
+            entry[1].set_result(time.perf_counter())
+
+    async def wait_for(self, user_id: str, version: int, timeout: float):
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[user_id] = (version, future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.waiting.pop(user_id, None)
+
+
+def open_databases(args):
+    """(db for worker A, db for worker B, drop coroutine function)"""
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        clients = [AsyncIOMotorClient(args.mongo_url, serverSelectionTimeoutMS=5000) for _ in range(2)]
+    else:
+        if args.mode == "changestream":
+            sys.exit("--mode changestream needs --mongo-url pointing at a replica set")
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("Without --mongo-url this check needs mongomock-motor (pip install mongomock-motor)")
+        client = AsyncMongoMockClient()
+        clients = [client, client]
+
+    async def drop():
+        await clients[0].drop_database(args.db_name)
+
+    return clients[0][args.db_name], clients[1][args.db_name], drop
+
+
+async def write(storage, user_id: str, portfolio_id, i: int) -> int:
+    """One write as the API performs it; returns the new version"""
+    if i % 2:
+        updated = await storage.portfolios.update(user_id, PortfolioUpdate(stats=[Stat(value=str(i), label="Writes")]))
+        return updated["version"]
+    item = ExperienceCreate(role=f"Role {i}", company="Coherence", location="Remote", period="2024", order=i)
+    await storage.sections["experience"].insert(portfolio_id, item)
+    return await bump_version(storage.portfolios, portfolio_id)
+
+
+async def main_async(args):
+    db_a, db_b, drop = open_databases(args)
+    storage = build_storage("mongo", db_a)
+    writer, reader = Worker(db_a, args), Worker(db_b, args)
+    users = []
+    for _ in range(args.portfolios):
+        user_id = f"coherence-{uuid.uuid4().hex[:8]}"
+        portfolio = await storage.portfolios.insert(
+            PortfolioCreate(userId=user_id, personalInfo=PersonalInfo(name="Coherence", title="Check"))
+        )
+        users.append((user_id, portfolio.id))
+
+    writer.bus.start()
+    reader.bus.start()
+    samples, missed = [], 0
+    started = time.perf_counter()
+    try:
+        # Warm up until the reader's stream or poll loop is live
+        user_id, portfolio_id = users[0]
+        for _ in range(args.warmup_attempts):
+            version = await write(storage, user_id, portfolio_id, 1)
+            await writer.bus.publish(user_id, portfolio_id, version)
+            if await reader.wait_for(user_id, version, args.timeout) is not None:
+                break
+        else:
+            sys.exit(f"Worker B saw none of {args.warmup_attempts} warm-up writes; is the {args.mode} source available?")
+
+        for i in range(args.writes):
+            user_id, portfolio_id = users[i % len(users)]
+            version = await write(storage, user_id, portfolio_id, i)
+            await writer.bus.publish(user_id, portfolio_id, version)
+            written = time.perf_counter()
+            received = await reader.wait_for(user_id, version, args.timeout)
+            if received is None:
+                missed += 1
+            else:
+                samples.append(received - written)
+            await asyncio.sleep(args.interval)
+    finally:
+        await writer.bus.stop()
+        await reader.bus.stop()
+        await drop()
+
+    lag = summarize(samples, missed, time.perf_counter() - started)
+    del lag["rps"], lag["errors"]
+    return {
+        "mode": args.mode,
+        "backend": "mongod" if args.mongo_url else "mongomock",
+        "poll_interval": args.poll_interval if args.mode == "poll" else None,
+        "writes": args.writes,
+        "missed": missed,
+        "lag": lag,
+        "reader": reader.bus.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("changestream", "poll"), default="poll")
+    parser.add_argument("--mongo-url", help="Run against this server (a replica set for changestream)")
+    parser.add_argument("--db-name", default="portfolio_coherence", help="Scratch database (dropped afterwards)")
+    parser.add_argument("--portfolios", type=int, default=5)
+    parser.add_argument("--writes", type=int, default=100)
+    parser.add_argument("--interval", type=float, default=0.01, help="Seconds between writes")
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--overlap", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds before a write counts as missed")
+    parser.add_argument("--warmup-attempts", type=int, default=5)
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    print(json.dumps(report, indent=2, default=str))
+    sys.exit(1 if report["missed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""Load test: drive the API in-process with a read/write mix and report latency.
+
+Boots `server.app` in-process (no network, no uvicorn) against an in-memory
+MongoDB stand-in (mongomock-motor, the default), one of the other storage
+backends (memory, sqlite; see services/storage.py) or a local mongod, seeds
+N portfolios through the API and runs a weighted mix of requests across the
+/api/portfolio routes at fixed concurrency. Prints throughput and
+p50/p95/p99 per operation as JSON.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test --portfolios 50 --items 20 --requests 5000
+    python -m benchmarks.load_test --backend sqlite
+    python -m benchmarks.load_test --mongo-url mongodb://localhost:27017 --mix write-heavy
+
+Results are reproducible for a given --seed and backend; compare runs of the
+same configuration before and after a change.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Operation weights per mix: (operation, weight)
+MIXES = {
+    "read-heavy": {
+        "get_portfolio": 40, "get_portfolio_304": 15, "get_section": 20, "get_section_page": 10,
+        "create_item": 4, "update_item": 6, "delete_item": 2, "update_portfolio": 3,
+    },
+    "balanced": {
+        "get_portfolio": 30, "get_portfolio_304": 10, "get_section": 15, "get_section_page": 5,
+        "create_item": 12, "update_item": 15, "delete_item": 5, "update_portfolio": 8,
+    },
+    "write-heavy": {
+        "get_portfolio": 20, "get_portfolio_304": 5, "get_section": 15, "get_section_page": 5,
+        "create_item": 20, "update_item": 20, "delete_item": 8, "update_portfolio": 7,
+    },
+}
+
+SECTION_NAMES = ["experience", "projects", "skills", "education", "certifications"]
+
+
+def portfolio_payload(user_id: str):
+    return {
+        "userId": user_id,
+        "personalInfo": {
+            "name": f"Bench {user_id}",
+            "title": "Building Safer Systems at the Intersection of Cybersecurity & AI",
+            "bio": "Cybersecurity professional building safer digital ecosystems with AI and traditional security practices.",
+            "location": "Buffalo, NY",
+            "email": f"{user_id}@example.com",
+        },
+        "stats": [{"value": f"{i}+", "label": f"Stat {i}", "order": i} for i in range(4)],
+    }
+
+
+def item_payload(section: str, i: int):
+    """A create payload shaped like the seeded portfolio's items"""
+    if section == "experience":
+        return {
+            "role": f"Security Engineer {i}", "company": "Catenactio Inc", "location": "Los Angeles, CA",
+            "period": "May 2024 – Present", "order": i,
+            "highlights": ["Tuned SIEM rules (Wazuh) to reduce false positives across enterprise clients"] * 4,
+            "skills": ["SIEM", "Wazuh", "IAM", "Okta", "Linux Hardening", "Incident Response"],
+        }
+    if section == "projects":
+        return {
+            "title": f"Project {i}", "status": "Completed", "icon": "shield", "order": i,
+            "description": "Automated alert triage pipeline combining LLM classification with SOAR playbooks.",
+            "tech": ["Python", "Wazuh", "Elastic", "Docker", "Terraform"], "github": True,
+        }
+    if section == "skills":
+        return {"category": f"Category {i}", "icon": "lock", "skills": ["Nmap", "Burp Suite", "Splunk", "Okta"], "order": i}
+    if section == "education":
+        return {
+            "degree": "MS Cybersecurity", "school": "University at Buffalo", "location": "Buffalo, NY",
+            "period": "2023 – 2025", "coursework": ["Network Security", "Applied Cryptography"], "order": i,
+        }
+    return {"name": f"Certification {i}", "issuer": "Issuer", "credentialId": f"CRED-{i}", "order": i}
+
+
+def update_payload(section: str, rng: random.Random):
+    field = {
+        "experience": "role", "projects": "title", "skills": "category",
+        "education": "degree", "certifications": "name",
+    }[section]
+    return {field: f"Updated {rng.randrange(1_000_000)}"}
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def summarize(samples, errors, elapsed):
+    ordered = sorted(samples)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": round(len(samples) / elapsed, 1) if elapsed else None,
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "max_ms": ms(ordered[-1]) if ordered else None,
+    }
+
+
+class LoadTest:
+    def __init__(self, http, users, rng):
+        self.http = http
+        self.users = users
+        self.rng = rng
+        self.etags = {}
+        # ids of items each user's sections hold, so updates/deletes hit real documents
+        self.items = {user: {section: [] for section in SECTION_NAMES} for user in users}
+
+    async def seed(self, items: int):
+        for user in self.users:
+            response = await self.http.post("/api/portfolio", json=portfolio_payload(user))
+            response.raise_for_status()
+            for section in SECTION_NAMES:
+                payload = {"items": [item_payload(section, i) for i in range(items)]}
+                response = await self.http.post(f"/api/portfolio/{user}/{section}:batch", json=payload)
+                response.raise_for_status()
+                self.items[user][section] = [result["item"]["_id"] for result in response.json()["results"]]
+
+    async def request(self, operation: str):
+        rng = self.rng
+        user = rng.choice(self.users)
+        section = rng.choice(SECTION_NAMES)
+        base = f"/api/portfolio/{user}"
+        ids = self.items[user][section]
+        if operation == "get_portfolio":
+            response = await self.http.get(base)
+            self.etags[user] = response.headers.get("etag")
+        elif operation == "get_portfolio_304":
+            headers = {"If-None-Match": self.etags[user]} if self.etags.get(user) else {}
+            response = await self.http.get(base, headers=headers)
+            self.etags[user] = response.headers.get("etag")
+        elif operation == "get_section":
+            response = await self.http.get(f"{base}/{section}")
+        elif operation == "get_section_page":
+            response = await self.http.get(f"{base}/{section}", params={"limit": 10})
+        elif operation == "create_item":
+            response = await self.http.post(f"{base}/{section}", json=item_payload(section, rng.randrange(1000)))
+            if response.status_code == 200:
+                ids.append(response.json()["_id"])
+        elif operation == "update_item" and ids:
+            response = await self.http.put(f"{base}/{section}/{rng.choice(ids)}", json=update_payload(section, rng))
+        elif operation == "delete_item" and ids:
+            item_id = ids.pop(rng.randrange(len(ids)))
+            response = await self.http.delete(f"{base}/{section}/{item_id}")
+        elif operation == "update_portfolio":
+            response = await self.http.put(base, json={"stats": [{"value": str(rng.randrange(100)), "label": "Runs"}]})
+        else:
+            # update/delete on an empty section: fall back to a read
+            response = await self.http.get(f"{base}/{section}")
+        return response.status_code not in (200, 304)
+
+    async def run(self, mix, total: int, concurrency: int):
+        operations, weights = zip(*mix.items())
+        plan = self.rng.choices(operations, weights=weights, k=total)
+        samples = {operation: [] for operation in operations}
+        errors = {operation: 0 for operation in operations}
+        position = 0
+
+        async def worker():
+            nonlocal position
+            while position < len(plan):
+                operation = plan[position]
+                position += 1
+                started = time.perf_counter()
+                failed = await self.request(operation)
+                samples[operation].append(time.perf_counter() - started)
+                errors[operation] += failed
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        everything = [sample for values in samples.values() for sample in values]
+        return {
+            "seconds": round(elapsed, 3),
+            "total": summarize(everything, sum(errors.values()), elapsed),
+            "operations": {
+                operation: summarize(samples[operation], errors[operation], elapsed)
+                for operation in operations if samples[operation]
+            },
+        }
+
+
+def boot(args, scratch_dir: str):
+    """Import server against the chosen backend and return the module"""
+    os.environ["MONGO_URL"] = args.mongo_url or "mongodb://localhost:27017"
+    os.environ["DB_NAME"] = args.db_name
+    os.environ["STORAGE_BACKEND"] = "mongo" if args.backend in ("mongod", "mongomock") else args.backend
+    os.environ["SQLITE_PATH"] = os.path.join(scratch_dir, "bench.sqlite3")
+    os.environ.setdefault("ENSURE_INDEXES", "false")
+    import server
+
+    if args.backend == "mongomock":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("The mongomock backend needs mongomock-motor (pip install mongomock-motor)")
+        server.db = AsyncMongoMockClient()[args.db_name]
+        server.storage = server.build_storage("mongo", server.db)
+        server.portfolios = server.storage.portfolios
+        server.section_repositories.clear()
+        server.section_repositories.update(server.storage.sections)
+    return server
+
+
+async def main_async(args):
+    import httpx
+
+    scratch_dir = tempfile.mkdtemp(prefix="portfolio-bench-")
+    server = boot(args, scratch_dir)
+    logging_level = server.logging.WARNING
+    server.logging.getLogger().setLevel(logging_level)
+    server.logger.setLevel(logging_level)
+
+    if args.backend == "mongod":
+        await server.db.client.drop_database(args.db_name)
+        await server.ensure_indexes(server.db)
+
+    rng = random.Random(args.seed)
+    users = [f"bench-{i}" for i in range(args.portfolios)]
+    transport = httpx.ASGITransport(app=server.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            test = LoadTest(http, users, rng)
+            seed_started = time.perf_counter()
+            await test.seed(args.items)
+            seed_seconds = time.perf_counter() - seed_started
+            if args.warmup:
+                await test.run(MIXES[args.mix], args.warmup, args.concurrency)
+            result = await test.run(MIXES[args.mix], args.requests, args.concurrency)
+    finally:
+        if args.backend == "mongod" and not args.keep:
+            await server.db.client.drop_database(args.db_name)
+        server.storage.close()
+
+    return {
+        "backend": args.backend,
+        "fetch_mode": server.settings.PORTFOLIO_FETCH_MODE,
+        "mix": args.mix,
+        "portfolios": args.portfolios,
+        "items_per_section": args.items,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "seed_seconds": round(seed_seconds, 3),
+        **result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("mongomock", "memory", "sqlite", "mongod"), default="mongomock")
+    parser.add_argument("--mongo-url", help="Run against this mongod (implies --backend mongod)")
+    parser.add_argument("--db-name", default="portfolio_bench", help="Database to use (dropped before and after)")
+    parser.add_argument("--keep", action="store_true", help="Keep the mongod database after the run")
+    parser.add_argument("--portfolios", type=int, default=20)
+    parser.add_argument("--items", type=int, default=10, help="Items per section per portfolio")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="read-heavy")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-o", "--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    if args.mongo_url:
+        args.backend = "mongod"
+    elif args.backend == "mongod":
+        parser.error("--backend mongod needs --mongo-url")
+
+    report = json.dumps(asyncio.run(main_async(args)), indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Micro-benchmark: in-process search index vs a regex scan over the same items.
+
+Builds a PortfolioIndex (services/search.py) over --items synthetic projects,
+experience entries and skills, then reports build time, memory, p50/p95 query
+latency for exact, prefix and multi-term queries, incremental update cost and,
+for comparison, a case-insensitive regex scan over the searchable fields (what
+a $regex query per keystroke would do, minus the round trip).
+
+Run from the repository root:
+
+    python -m benchmarks.search_bench [--items 3000] [--queries 500]
+"""
+import argparse
+import json
+import random
+import re
+import time
+from bson import ObjectId
+
+from services.search import SEARCH_FIELDS, PortfolioIndex, deep_size
+
+VOCABULARY = (
+    "wazuh splunk elastic siem soar okta iam sso saml oauth kubernetes docker terraform ansible python rust go "
+    "c++ java llvm fuzzing nmap burp zeek suricata snort yara sigma mitre att&ck threat hunting detection "
+    "engineering incident response forensics malware reverse engineering ghidra ida cloud aws azure gcp "
+    "hardening patching vulnerability management pentest red team blue team purple soc analyst automation "
+    "llm prompt injection adversarial machine learning classification triage playbook compliance nist iso "
+    "soc2 pci hipaa gdpr encryption tls pki hsm kms secrets vault zero trust network segmentation firewall"
+).split()
+
+
+def synthetic_items(count: int, seed: int):
+    """(section, document) pairs spread over the searchable sections"""
+    rng = random.Random(seed)
+    # Rare made-up words keep the vocabulary realistic in size
+    rare = [f"{rng.choice(VOCABULARY)}{i}" for i in range(count // 2)]
+
+    def words(n):
+        return " ".join(rng.choice(VOCABULARY) if rng.random() < 0.9 else rng.choice(rare) for _ in range(n))
+
+    items = []
+    for i in range(count):
+        section = ("projects", "experience", "skills")[i % 3]
+        document = {"_id": ObjectId(), "order": i}
+        if section == "projects":
+            document.update(title=words(3), description=words(40), tech=[words(1) for _ in range(5)])
+        elif section == "experience":
+            document.update(role=words(3), company=words(2), highlights=[words(15) for _ in range(4)],
+                            skills=[words(1) for _ in range(6)])
+        else:
+            document.update(category=words(2), skills=[words(1) for _ in range(10)])
+        items.append((section, document))
+    return items
+
+
+def regex_scan(items, query: str, limit: int):
+    """Items whose searchable fields match every query word, as a $regex scan would"""
+    patterns = [re.compile(re.escape(word), re.IGNORECASE) for word in query.split()]
+    matches = []
+    for section, document in items:
+        texts = []
+        for field in SEARCH_FIELDS[section]:
+            value = document.get(field)
+            texts.extend(value if isinstance(value, list) else [value or ""])
+        text = " ".join(texts)
+        if all(pattern.search(text) for pattern in patterns):
+            matches.append(document)
+    return matches[:limit]
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def at(p):
+        return round(ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1e6, 1)
+
+    return {"p50_us": at(50), "p95_us": at(95), "max_us": round(ordered[-1] * 1e6, 1)}
+
+
+def timed(fn, queries):
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    items = synthetic_items(args.items, args.seed)
+    rng = random.Random(args.seed + 1)
+
+    started = time.perf_counter()
+    index = PortfolioIndex(ObjectId())
+    for section, document in items:
+        index.add(section, document)
+    build_seconds = time.perf_counter() - started
+
+    exact = [rng.choice(VOCABULARY) for _ in range(args.queries)]
+    prefix = [word[:3] for word in exact]
+    multi = [" ".join(rng.sample(VOCABULARY, 3)) for _ in range(args.queries)]
+
+    # Incremental update: re-index an edited item, as the update handlers do
+    updates = []
+    for _ in range(args.queries):
+        section, document = rng.choice(items)
+        edited = {**document, "order": document["order"] + 1}
+        started = time.perf_counter()
+        index.add(section, edited)
+        updates.append(time.perf_counter() - started)
+
+    print(json.dumps({
+        "items": args.items,
+        "terms": len(index.terms),
+        "build_ms": round(build_seconds * 1000, 1),
+        "memory_bytes": deep_size(vars(index)),
+        "index": {
+            "exact": timed(lambda query: index.search(query, limit=args.limit), exact),
+            "prefix": timed(lambda query: index.search(query, limit=args.limit), prefix),
+            "three_terms": timed(lambda query: index.search(query, limit=args.limit), multi),
+            "update": percentiles(updates),
+        },
+        "regex_scan": {
+            "exact": timed(lambda query: regex_scan(items, query, args.limit), exact[:50]),
+            "three_terms": timed(lambda query: regex_scan(items, query, args.limit), multi[:50]),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Micro-benchmark: legacy parse_json response path vs dumps_bytes.
+
+Run from the repository root:
+
+    python -m benchmarks.serialization_bench [--iterations 2000]
+"""
+import argparse
+import json
+import time
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from bson import ObjectId
+
+from models.portfolio import Portfolio, PersonalInfo, Stat
+from models.experience import Experience
+from models.project import Project
+from models.skill import Skill
+from models.education import Education
+from models.certification import Certification
+from services.serialization import dumps_bytes, orjson
+
+
+def realistic_portfolio(projects: int = 15, certifications: int = 8):
+    """A portfolio shaped like the seeded one, as raw Mongo documents"""
+    portfolio = Portfolio(
+        userId="bench",
+        personalInfo=PersonalInfo(
+            name="Bench User",
+            title="Building Safer Systems at the Intersection of Cybersecurity & AI",
+            bio="Cybersecurity professional building safer digital ecosystems with AI and traditional security practices.",
+            location="Buffalo, NY",
+            email="bench@example.com",
+        ),
+        stats=[Stat(value=f"{i}+", label=f"Stat {i}", order=i) for i in range(4)],
+    )
+    pid = portfolio.id
+    experience = [
+        Experience(
+            portfolioId=pid, role=f"Security Engineer {i}", company="Catenactio Inc",
+            location="Los Angeles, CA", period="May 2024 – Present",
+            highlights=["Tuned SIEM rules (Wazuh) to reduce false positives across enterprise clients"] * 5,
+            skills=["SIEM", "Wazuh", "IAM", "Okta", "Linux Hardening", "Incident Response"], order=i,
+        )
+        for i in range(4)
+    ]
+    project_docs = [
+        Project(
+            portfolioId=pid, title=f"Project {i}", status="Completed", icon="shield",
+            description="Automated alert triage pipeline combining LLM classification with SOAR playbooks. " * 3,
+            tech=["Python", "Wazuh", "Elastic", "Docker", "Terraform"], github=True,
+            githubUrl="https://github.com/example/project", order=i,
+        )
+        for i in range(projects)
+    ]
+    skills = [
+        Skill(portfolioId=pid, category=f"Category {i}", icon="lock", skills=["Nmap", "Burp Suite", "Splunk", "Okta"] * 2, order=i)
+        for i in range(6)
+    ]
+    education = [
+        Education(portfolioId=pid, degree="MS Cybersecurity", school="University at Buffalo", location="Buffalo, NY",
+                  period="2023 – 2025", coursework=["Network Security", "Applied Cryptography"] * 3, order=i)
+        for i in range(2)
+    ]
+    certs = [
+        Certification(portfolioId=pid, name=f"Certification {i}", issuer="Issuer", credentialId=str(ObjectId()), order=i)
+        for i in range(certifications)
+    ]
+
+    def docs(models):
+        return [m.model_dump(by_alias=True) for m in models]
+
+    return {
+        "portfolio": portfolio.model_dump(by_alias=True),
+        "experience": docs(experience),
+        "projects": docs(project_docs),
+        "skills": docs(skills),
+        "education": docs(education),
+        "certifications": docs(certs),
+    }
+
+
+def legacy_path(data) -> bytes:
+    """parse_json, then FastAPI's jsonable_encoder, then JSONResponse.render"""
+    parsed = json.loads(json.dumps(data, default=str))
+    return JSONResponse(jsonable_encoder(parsed)).body
+
+
+def measure(fn, data, iterations: int):
+    body = fn(data)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(data)
+    elapsed = time.perf_counter() - started
+    return {
+        "bytes": len(body),
+        "per_call_us": round(elapsed / iterations * 1e6, 2),
+        "mb_per_sec": round(len(body) * iterations / elapsed / 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    data = realistic_portfolio()
+    legacy = measure(legacy_path, data, args.iterations)
+    fast = measure(dumps_bytes, data, args.iterations)
+    print(json.dumps({
+        "backend": "orjson" if orjson is not None else "json",
+        "legacy": legacy,
+        "dumps_bytes": fast,
+        "speedup": round(legacy["per_call_us"] / fast["per_call_us"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
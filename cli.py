@@ -0,0 +1,154 @@
+"""Portfolio export/import and maintenance from the command line.
+
+    python cli.py export akshaj -o akshaj.ndjson
+    python cli.py import akshaj.ndjson --user-id akshaj-copy
+    python cli.py rebuild-facets [--user-id akshaj]
+    python cli.py rebuild-counters [--user-id akshaj]
+
+Uses STORAGE_BACKEND (and MONGO_URL / DB_NAME) like the server; imports
+need the mongo backend. A failed import prints its importId; run the same
+command with --import-id to resume it. With SNAPSHOT_DIR set, an import
+drops the portfolio's snapshot so the server re-renders it. rebuild-facets
+recounts the facet tag counts (services/facets.py) and reports drift; run it
+from cron to reconcile counts that missed an increment. rebuild-counters does
+the same for the counters behind derived stats (services/counters.py), on any
+backend; run it once after upgrading, as older portfolios have none.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import settings
+from services.counters import rebuild_counters, reconcile_counters
+from services.facets import FacetStore
+from services.invalidation import build_invalidation_bus
+from services.serialization import dumps_bytes
+from services.snapshots import snapshots
+from services.storage import build_storage
+from services.transfer import TransferError, export_portfolio, import_portfolio
+
+
+def open_storage():
+    """The STORAGE_BACKEND storage; for mongo, connects with MONGO_URL / DB_NAME"""
+    if settings.STORAGE_BACKEND != "mongo":
+        return build_storage(settings.STORAGE_BACKEND)
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tlsAllowInvalidCertificates=True)
+    return build_storage("mongo", client[os.environ.get('DB_NAME', 'portfolio_db')])
+
+
+async def read_lines(path: str):
+    with (sys.stdin.buffer if path == "-" else open(path, "rb")) as source:
+        for line in source:
+            yield line
+
+
+async def run_export(args):
+    lines = await export_portfolio(open_storage(), args.user_id, args.batch_size)
+    if lines is None:
+        print(f"Portfolio not found: {args.user_id}", file=sys.stderr)
+        return 1
+    with (sys.stdout.buffer if args.output == "-" else open(args.output, "wb")) as target:
+        async for line in lines:
+            target.write(line)
+    return 0
+
+
+async def run_import(args):
+    storage = open_storage()
+    if storage.db is None:
+        print("Import requires the mongo storage backend", file=sys.stderr)
+        return 1
+    try:
+        report = await import_portfolio(
+            storage.db, read_lines(args.file), args.user_id, args.import_id, args.batch_size, args.concurrency
+        )
+    except TransferError as e:
+        print(f"Import failed: {e}", file=sys.stderr)
+        print(dumps_bytes(e.report).decode("utf-8"))
+        return 1
+    # Counts the imported items; bumps the version like any write
+    version = (await rebuild_counters(storage, report["portfolioId"]))["version"]
+    bus = build_invalidation_bus(storage.db, lambda *change: None)
+    if bus is not None:
+        # Running servers evict the imported portfolio (poll mode reads this write)
+        await bus.publish(report["userId"], report["portfolioId"], version)
+    if snapshots is not None:
+        # The server re-renders it on the next read
+        snapshots.discard(report["userId"])
+    await FacetStore(storage.db).discard(report["portfolioId"])
+    print(dumps_bytes(report).decode("utf-8"))
+    return 0
+
+
+async def run_rebuild_facets(args):
+    storage = open_storage()
+    if storage.db is None:
+        print("Facets require the mongo storage backend", file=sys.stderr)
+        return 1
+    portfolio_ids = None
+    if args.user_id:
+        portfolio = await storage.portfolios.find_by_user(args.user_id, ("_id",))
+        if portfolio is None:
+            print(f"Portfolio not found: {args.user_id}", file=sys.stderr)
+            return 1
+        portfolio_ids = [portfolio["_id"]]
+    print(json.dumps(await FacetStore(storage.db).reconcile(portfolio_ids)))
+    return 0
+
+
+async def run_rebuild_counters(args):
+    storage = open_storage()
+    if args.user_id and not await storage.portfolios.exists(args.user_id):
+        print(f"Portfolio not found: {args.user_id}", file=sys.stderr)
+        return 1
+    bus = build_invalidation_bus(storage.db, lambda *change: None)
+    report = {"portfolios": 0, "drifted": 0}
+    async for user_id, portfolio_id, result in reconcile_counters(storage, args.user_id):
+        report["portfolios"] += 1
+        report["drifted"] += result["drifted"]
+        if bus is not None:
+            await bus.publish(user_id, portfolio_id, result["version"])
+        if snapshots is not None:
+            snapshots.discard(user_id)
+    print(json.dumps(report))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export, import and maintain portfolios")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write a portfolio and its sections as NDJSON")
+    export_parser.add_argument("user_id")
+    export_parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    export_parser.add_argument("--batch-size", type=int, default=settings.EXPORT_BATCH_SIZE)
+
+    import_parser = commands.add_parser("import", help="Load an NDJSON export")
+    import_parser.add_argument("file", help="NDJSON file ('-' for stdin)")
+    import_parser.add_argument("--user-id", help="Import under a different userId")
+    import_parser.add_argument("--import-id", help="Resume a previous import")
+    import_parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE)
+    import_parser.add_argument("--concurrency", type=int, default=settings.IMPORT_CONCURRENCY)
+
+    facets_parser = commands.add_parser("rebuild-facets", help="Recount facet tags and report drift")
+    facets_parser.add_argument("--user-id", help="Only this portfolio (default: all)")
+
+    counters_parser = commands.add_parser("rebuild-counters", help="Recount the counters behind derived stats")
+    counters_parser.add_argument("--user-id", help="Only this portfolio (default: all)")
+
+    args = parser.parse_args(argv)
+    runner = {
+        "export": run_export,
+        "import": run_import,
+        "rebuild-facets": run_rebuild_facets,
+        "rebuild-counters": run_rebuild_counters,
+    }[args.command]
+    return asyncio.run(runner(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+from typing import Generic, List, Optional, TypeVar
+
+import settings
+
+ItemT = TypeVar("ItemT")
+
+# Batch create request: POST /api/portfolio/{user_id}/{section}:batch
+class BatchCreate(BaseModel, Generic[ItemT]):
+    items: List[ItemT] = Field(max_length=settings.SECTION_BATCH_MAX_ITEMS)
+    ordered: bool = True
+
+# Bulk reorder request: PATCH /api/portfolio/{user_id}/{section}/order
+class ReorderRequest(BaseModel):
+    ids: List[str] = Field(max_length=settings.SECTION_REORDER_MAX_IDS)
+
+# Multi-portfolio read: POST /api/portfolios:batchGet
+class BatchGetRequest(BaseModel):
+    userIds: List[str]
+    include: Optional[str] = None  # as ?include= on GET /api/portfolio/{user_id}
+    fields: Optional[str] = None  # as ?fields=
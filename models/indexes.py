@@ -0,0 +1,39 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from .sections import SECTIONS
+import settings
+
+# Index Model
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    name: str
+    unique: bool = False
+    expire_after: Optional[int] = None  # seconds, for a TTL index
+
+# Indexes backing the hot queries: portfolio lookup by userId, section reads
+# by portfolioId in (order, _id) keyset order, the invalidation poll over
+# portfolio_versions (covered: it only reads versionAt, userId and version) and
+# delta sync by (portfolioId, updatedAt) plus its expiring delete tombstones
+INDEXES = (
+    IndexSpec("portfolios", (("userId", 1),), "userId_unique", unique=True),
+    IndexSpec("portfolio_versions", (("versionAt", 1), ("userId", 1), ("version", 1)), "versionAt_userId_version"),
+    IndexSpec("portfolio_tombstones", (("portfolioId", 1), ("deletedAt", 1)), "portfolioId_deletedAt"),
+    IndexSpec("portfolio_tombstones", (("deletedAt", 1),), "deletedAt_ttl", expire_after=settings.TOMBSTONE_TTL_SECONDS),
+    *(
+        IndexSpec(section.collection, (("portfolioId", 1), ("order", 1), ("_id", 1)), "portfolioId_order_id")
+        for section in SECTIONS
+    ),
+    *(
+        IndexSpec(section.collection, (("portfolioId", 1), ("updatedAt", 1)), "portfolioId_updatedAt")
+        for section in SECTIONS
+    ),
+)
+
+# Registry indexes superseded by the ones above, dropped by ensure_indexes
+RETIRED_INDEXES = tuple(
+    IndexSpec(section.collection, (("portfolioId", 1), ("order", 1)), "portfolioId_order")
+    for section in SECTIONS
+)
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field, GetCoreSchemaHandler
-from typing import List, Optional, Any
+import string
+from pydantic import BaseModel, Field, GetCoreSchemaHandler, field_validator
+from typing import Dict, List, Literal, Optional, Any
 from datetime import datetime
 from bson import ObjectId
 from pydantic_core import core_schema
@@ -19,11 +20,51 @@ class PyObjectId(ObjectId):
     def __get_pydantic_json_schema__(cls, _core_schema: core_schema.CoreSchema, handler) -> dict[str, Any]:
         return {"type": "string"}
 
-# Stats Model
+# Counters a stat can be derived from (services/counters.py): item counts per
+# section, and summed experience in years
+StatSource = Literal["experience", "projects", "skills", "education", "certifications", "experienceYears"]
+
+# Helper function to split a stat format into literal text and None where the value
+# goes. Only a bare {value} is allowed (no format spec, conversion, attribute or
+# index access), so rendering one never runs str.format on client input.
+def parse_stat_format(template: str) -> list:
+    pieces = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if literal:
+            pieces.append(literal)
+        if field is None:
+            continue
+        if field != "value" or spec or conversion:
+            raise ValueError("only a bare {value} placeholder is allowed")
+        pieces.append(None)
+    return pieces
+
+# Stats Model: a stat with a source is derived, its value rendered on read
+# from the portfolio's counters; without one, value is free text
 class Stat(BaseModel):
-    value: str
+    value: str = ""
     label: str
     order: int = 0
+    source: Optional[StatSource] = None
+    format: Optional[str] = Field(None, max_length=64)  # e.g. "{value}+"; defaults to STAT_FORMATS for the source
+    step: Optional[float] = None  # round down to a multiple of this first (default 1)
+
+    @field_validator("format")
+    @classmethod
+    def check_format(cls, value):
+        if value is not None:
+            try:
+                parse_stat_format(value)
+            except ValueError as e:
+                raise ValueError(f"Invalid stat format {value!r}: {e}")
+        return value
+
+    @field_validator("step")
+    @classmethod
+    def check_step(cls, value):
+        if value is not None and value <= 0:
+            raise ValueError("step must be positive")
+        return value
 
 # Personal Info Model
 class PersonalInfo(BaseModel):
@@ -42,6 +83,8 @@ class Portfolio(BaseModel):
     userId: str
     personalInfo: PersonalInfo
     stats: List[Stat] = []
+    counters: Dict[str, int] = {}  # maintained by section writes, never set by clients
+    version: int = 0
     createdAt: datetime = Field(default_factory=datetime.utcnow)
     updatedAt: datetime = Field(default_factory=datetime.utcnow)
 
@@ -0,0 +1,30 @@
+from dataclasses import dataclass
+from typing import Type
+from pydantic import BaseModel
+
+from .experience import Experience, ExperienceCreate, ExperienceUpdate
+from .project import Project, ProjectCreate, ProjectUpdate
+from .skill import Skill, SkillCreate, SkillUpdate
+from .education import Education, EducationCreate, EducationUpdate
+from .certification import Certification, CertificationCreate, CertificationUpdate
+
+# Section Model
+@dataclass(frozen=True)
+class Section:
+    name: str
+    collection: str
+    label: str
+    model: Type[BaseModel]
+    create_model: Type[BaseModel]
+    update_model: Type[BaseModel]
+
+# Child collections of a portfolio, in the order they appear in responses
+SECTIONS = (
+    Section("experience", "experience", "Experience", Experience, ExperienceCreate, ExperienceUpdate),
+    Section("projects", "projects", "Project", Project, ProjectCreate, ProjectUpdate),
+    Section("skills", "skills", "Skill", Skill, SkillCreate, SkillUpdate),
+    Section("education", "education", "Education", Education, EducationCreate, EducationUpdate),
+    Section("certifications", "certifications", "Certification", Certification, CertificationCreate, CertificationUpdate),
+)
+
+SECTIONS_BY_NAME = {section.name: section for section in SECTIONS}
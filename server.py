@@ -1,44 +1,110 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Response, Header, Query, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
+import asyncio
 import os
 import logging
 from pathlib import Path
 from datetime import datetime
 from bson import ObjectId
 from typing import List, Optional
-import json
 
 # Import models
 from models.portfolio import Portfolio, PortfolioCreate, PortfolioUpdate, PersonalInfo, Stat
-from models.experience import Experience, ExperienceCreate, ExperienceUpdate
-from models.project import Project, ProjectCreate, ProjectUpdate
-from models.skill import Skill, SkillCreate, SkillUpdate
-from models.education import Education, EducationCreate, EducationUpdate
-from models.certification import Certification, CertificationCreate, CertificationUpdate
+from models.experience import ExperienceCreate
+from models.batch import BatchCreate, BatchGetRequest, ReorderRequest
+from models.sections import Section, SECTIONS
+from services.counters import (
+    counter_deltas, counter_fields, rebuild_counters, reconcile_counters, render_day, render_stats,
+)
+from services.compression import VARY, encoded_etag, etag_variants, negotiate, response_compressor
+from services.admission import AdmissionMiddleware, admission_controller
+from services.metrics import METRICS_CONTENT_TYPE, MetricsMiddleware, mongo_event_listeners, render_metrics
+from services.delta import InvalidSyncToken, decode_sync_token, fetch_changes, record_tombstone
+from services.events import change, portfolio_events
+from services.facets import build_facet_store, facet_fields, render_facets
+from services.fieldsets import InvalidFieldset, parse_fieldset
+from services.invalidation import build_invalidation_bus
+from services.index_manager import ensure_indexes, log_index_report, explain_hot_queries
+from services.portfolio_fetch import fetch_portfolio, fetch_portfolios, fetch_section
+from services.pagination import InvalidCursor, decode_cursor
+from services.portfolio_ids import portfolio_ids
+from services.response_cache import response_cache, CachedResponse, FULL_PORTFOLIO
+from services.search import InvalidSearch, parse_sections, search_index
+from services.single_flight import SingleFlightTimeout, single_flight
+from services.serialization import MongoJSONResponse, NDJSON_MEDIA_TYPE, dumps_bytes
+from services.snapshots import Snapshot, snapshots
+from services.stats import collect_stats
+from services.storage import build_storage
+from services.transfer import (
+    TransferConflict, TransferError, TransferStorageError, export_portfolio, import_portfolio, iter_lines,
+)
+from services.versioning import PortfolioRef, pop_ref, portfolio_ref, get_portfolio_ref, bump_version, make_etag, etag_matches
+import settings
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection with SSL fix for Railway deployment
-mongo_url = os.environ['MONGO_URL']
-
-# Configure MongoDB client with SSL settings for Railway compatibility
-client = AsyncIOMotorClient(
-    mongo_url,
-    tlsAllowInvalidCertificates=True,  # Fix for Railway SSL issues
-    serverSelectionTimeoutMS=5000,    # Shorter timeout
-    connectTimeoutMS=5000,            # Connection timeout
-    socketTimeoutMS=5000,             # Socket timeout
-    maxPoolSize=10,                   # Connection pool size
-    retryWrites=True                  # Enable retry writes
-)
-db = client[os.environ.get('DB_NAME', 'portfolio_db')]
+client = db = None
+if settings.STORAGE_BACKEND == "mongo":
+    # MongoDB connection with SSL fix for Railway deployment
+    mongo_url = os.environ['MONGO_URL']
+
+    # Configure MongoDB client with SSL settings for Railway compatibility
+    client = AsyncIOMotorClient(
+        mongo_url,
+        tlsAllowInvalidCertificates=True,  # Fix for Railway SSL issues
+        serverSelectionTimeoutMS=5000,    # Shorter timeout
+        connectTimeoutMS=5000,            # Connection timeout
+        socketTimeoutMS=5000,             # Socket timeout
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,  # Connection pool size
+        retryWrites=True,                 # Enable retry writes
+        # Command and pool timings for /metrics; command latency for admission control
+        event_listeners=[*mongo_event_listeners(), admission_controller.command_listener()],
+    )
+    db = client[os.environ.get('DB_NAME', 'portfolio_db')]
+
+# Storage backend (services/storage.py): the portfolio store and one store per section
+storage = build_storage(settings.STORAGE_BACKEND, db)
+portfolios = storage.portfolios
+section_repositories = storage.sections
+
+# Evict in-process state made stale by another worker's write (services/invalidation.py)
+def apply_remote_write(user_id: Optional[str], version: Optional[int], sections: tuple):
+    if user_id is None:
+        # Snapshot files are left alone: the worker that wrote a portfolio re-renders its
+        # snapshot, and they are shared with other workers and kept serving while MongoDB is down
+        response_cache.clear()
+        search_index.clear()
+        portfolio_events.refresh()
+        return
+    response_cache.invalidate(user_id, *sections)
+    search_index.discard(user_id)
+    found, portfolio_id = portfolio_ids.cached(user_id)
+    if found and portfolio_id is None:
+        # Created by another worker while cached here as missing
+        portfolio_ids.forget(user_id)
+    if version is not None:
+        if snapshots is not None:
+            snapshots.discard_older(user_id, version)
+        # The patch itself is only known to the worker that wrote it
+        portfolio_events.refresh(user_id, version)
+
+invalidation_bus = build_invalidation_bus(db, apply_remote_write)
+
+# Tag counts for GET /api/portfolio/{user_id}/facets, kept current on write (MongoDB only)
+facet_store = build_facet_store(db)
 
 # Create the main app
 app = FastAPI(title="Cybersecurity Portfolio API", version="1.0.0")
 
+# Per-class concurrency limits on /api, shedding load with 503 + Retry-After (added
+# first so it runs inside CORS and the metrics middleware, which see the 503s)
+app.add_middleware(AdmissionMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -46,21 +112,39 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After"],
 )
 
+# Request latency and in-flight metrics, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Test database connection on startup
 @app.on_event("startup")
 async def startup_event():
+    if db is None:
+        logger.info(f"Using {storage.name} storage backend")
+        return
+    if invalidation_bus is not None:
+        invalidation_bus.start()
+    if snapshots is not None:
+        # Serve snapshots right away instead of waiting out the server selection timeout
+        app.state.database_check = asyncio.create_task(check_database())
+        return
+    await check_database()
+
+async def check_database():
     try:
         # Test database connection
         await client.admin.command('ping')
         logger.info("✅ Successfully connected to MongoDB!")
+        if settings.ENSURE_INDEXES:
+            log_index_report(await ensure_indexes(db))
     except Exception as e:
         logger.error(f"❌ Failed to connect to MongoDB: {str(e)}")
         logger.error("App will continue but database operations will fail")
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", default_response_class=MongoJSONResponse)
 
 # Configure logging
 logging.basicConfig(
@@ -74,6 +158,11 @@ logger = logging.getLogger(__name__)
 async def root():
     return {"message": "Cybersecurity Portfolio API is running", "status": "healthy", "version": "1.0.0"}
 
+# Prometheus metrics (request, MongoDB command and connection pool timings)
+@app.get("/metrics")
+async def metrics():
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 # Add health check endpoint
 @app.get("/health")
 async def health_check():
@@ -102,6 +191,8 @@ async def test_database():
 # Add simple database connection test
 @app.get("/test-db-connection")
 async def test_db_connection():
+    if db is None:
+        return {"status": "not_applicable", "storage": storage.name}
     try:
         # Test basic database connection
         result = await db.command('ping')
@@ -116,16 +207,208 @@ async def test_db_connection():
     except Exception as e:
         return {"status": "database_error", "error": str(e), "error_type": type(e).__name__}
 
-# Utility function to convert ObjectId to string in responses
-def parse_json(data):
-    return json.loads(json.dumps(data, default=str))
+# Section lists also come as NDJSON (Accept: application/x-ndjson), under their own ETags
+SECTION_VARY = f"{VARY}, Accept"
+
+# Build a JSON response carrying the ETag and Cache-Control headers
+def cached_response(
+    cached: CachedResponse, if_none_match: Optional[str], accept_encoding: Optional[str] = None, vary: str = VARY
+):
+    encoding = response_compressor.select(len(cached.body), accept_encoding)
+    etag = encoded_etag(cached.etag, encoding)
+    headers = {"ETag": etag, "Cache-Control": settings.PORTFOLIO_CACHE_CONTROL, "Vary": vary}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=response_compressor.encode(cached, encoding), media_type="application/json", headers=headers)
+
+# Run a read through the single-flight layer (services/single_flight.py): concurrent
+# calls with the same key share one fetch. Keys carry the user's response cache
+# generation, so a read never joins a fetch that started before a write.
+async def coalesced(key: tuple, fn):
+    try:
+        return await single_flight.do(key, fn)
+    except SingleFlightTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+# Serve a cached response, or build it with load() and cache it. Concurrent
+# misses for the same response share one load() and its serialized body.
+# load(ref) returns (data, ref); ref is the already looked-up PortfolioRef or None.
+# Conditional requests are answered from the version alone, before load() runs.
+async def conditional_json_response(
+    user_id: str, section: str, if_none_match: Optional[str], load, variant: str = "",
+    accept_encoding: Optional[str] = None, vary: str = VARY,
+):
+    cached = response_cache.get(user_id, section, variant)
+    if cached is None:
+        generation = response_cache.generation(user_id)
+        ref = None
+        if if_none_match:
+            ref = await get_portfolio_version(user_id)
+            # The body size (and so the coding) is unknown yet: accept any coding's ETag
+            for etag in etag_variants(make_etag(ref, section, variant)):
+                if etag_matches(if_none_match, etag):
+                    headers = {"ETag": etag, "Cache-Control": settings.PORTFOLIO_CACHE_CONTROL, "Vary": vary}
+                    return Response(status_code=304, headers=headers)
+
+        async def build():
+            data, loaded_ref = await load(ref)
+            response = CachedResponse(dumps_bytes(data), make_etag(loaded_ref, section, variant), {})
+            response_cache.set(user_id, section, response, generation, variant)
+            return response
+
+        cached = await coalesced(("response", user_id, section, variant, generation), build)
+    return cached_response(cached, if_none_match, accept_encoding, vary)
+
+# Response cache and ETag variant of a full portfolio: its derived stats are rendered
+# as of today (services/counters.py), so a cached body or ETag only holds for that day
+def portfolio_variant(fieldset=None) -> str:
+    return f"{fieldset.key if fieldset else ''}@{render_day()}"
+
+# Build a JSON response straight from a portfolio's on-disk snapshot
+def snapshot_response(snapshot: Snapshot, if_none_match: Optional[str], accept_encoding: Optional[str]):
+    encoding = negotiate(accept_encoding)
+    if encoding not in snapshot.parts:
+        encoding = None
+    etag = encoded_etag(snapshot.etag, encoding)
+    headers = {"ETag": etag, "Cache-Control": settings.PORTFOLIO_CACHE_CONTROL, "Vary": VARY}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=snapshot.body(encoding), media_type="application/json", headers=headers)
+
+# Re-render a portfolio's snapshot from storage; returns it, or None if there is no portfolio.
+# A snapshot that cannot be refreshed is removed so it is never served stale.
+async def refresh_snapshot(user_id: str) -> Optional[Snapshot]:
+    if snapshots is None:
+        return None
+    try:
+        data = await fetch_portfolio(storage, user_id)
+        if data is None:
+            snapshots.discard(user_id)
+            return None
+        ref = pop_ref(data["portfolio"])
+        await asyncio.to_thread(
+            snapshots.write, user_id, dumps_bytes(data), make_etag(ref, FULL_PORTFOLIO, portfolio_variant()),
+            ref.version, render_day(),
+        )
+        return snapshots.get(user_id)
+    except Exception as e:
+        logger.error(f"Error writing snapshot for {user_id}: {str(e)}")
+        snapshots.discard(user_id)
+        return None
+
+# Tell other workers about a committed write (no-op with INVALIDATION_MODE=off)
+async def publish_write(user_id: str, portfolio_id: ObjectId, version: int):
+    if invalidation_bus is not None:
+        await invalidation_bus.publish(user_id, portfolio_id, version)
+
+# Record a committed write to a portfolio section: bump the version (adding the
+# write's counter deltas), drop cached responses, update the search index, then
+# push the changes (services/events.change) to SSE subscribers
+async def after_section_write(user_id: str, portfolio_id: ObjectId, section: str, *changes, counters=None):
+    version = await bump_version(portfolios, portfolio_id, counters)
+    await publish_write(user_id, portfolio_id, version)
+    response_cache.invalidate(user_id, FULL_PORTFOLIO, section)
+    search_index.apply(user_id, changes)
+    await refresh_snapshot(user_id)
+    portfolio_events.publish(user_id, version, changes)
+
+# Record a portfolio's rebuilt counters (services/counters.py): its derived stats
+# may render differently, and the rebuild bumped its version
+async def after_counters_rebuild(user_id: str, portfolio_id: ObjectId, version: int):
+    await publish_write(user_id, portfolio_id, version)
+    response_cache.invalidate(user_id, FULL_PORTFOLIO)
+    await refresh_snapshot(user_id)
+    portfolio_events.refresh(user_id, version)
+
+# Helper function to read an item before an update or delete changes it, in one query:
+# (before for the facets, before for the counters), each None if the write leaves
+# its fields alone. Each only ever sees a before with all of its own fields, since
+# a partial one would count the missing fields again from the item after the write.
+async def item_before_write(section: str, portfolio_id: ObjectId, item_id: ObjectId, update_data=None):
+    tag_fields = facet_fields(section, update_data) if facet_store is not None else ()
+    date_fields = counter_fields(section, update_data)
+    if not tag_fields and not date_fields:
+        return None, None
+    before = await section_repositories[section].get(portfolio_id, item_id, tag_fields + date_fields)
+    return (before if tag_fields else None), (before if date_fields else None)
+
+# Helper function to apply a committed write's (before, after) items to the facet counts
+async def record_facets(portfolio_id: ObjectId, section: str, *changes):
+    if facet_store is not None:
+        await facet_store.record(portfolio_id, section, changes)
+
+# Helper function to get a portfolio's _id and version by userId
+async def get_portfolio_version(user_id: str) -> PortfolioRef:
+    ref = await get_portfolio_ref(portfolios, user_id)
+    if ref is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    portfolio_ids.prime(user_id, ref.id)
+    return ref
 
-# Helper function to get portfolio by userId
-async def get_portfolio_by_user_id(user_id: str):
-    portfolio = await db.portfolios.find_one({"userId": user_id})
-    if not portfolio:
+# Helper function to get a portfolio's _id by userId (cached)
+async def get_portfolio_id(user_id: str) -> ObjectId:
+    portfolio_id = await portfolio_ids.resolve(portfolios, user_id)
+    if portfolio_id is None:
         raise HTTPException(status_code=404, detail="Portfolio not found")
-    return portfolio
+    return portfolio_id
+
+# Loader for all of one section's items, for conditional_json_response
+def section_loader(user_id: str, section: str):
+    async def load(ref):
+        if ref is not None:
+            items = await section_repositories[section].list(ref.id)
+            return items, ref
+        result = await fetch_section(storage, user_id, section)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Portfolio not found")
+        portfolio, items = result
+        portfolio_ids.prime(user_id, portfolio["_id"])
+        return items, portfolio_ref(portfolio)
+    return load
+
+# Loader for one keyset page of a section: {"items": [...], "nextCursor": ...}
+def section_page_loader(user_id: str, section: str, after, limit: Optional[int]):
+    async def load(ref):
+        ref = ref or await get_portfolio_version(user_id)
+        items, next_cursor = await section_repositories[section].page(ref.id, limit or settings.SECTION_PAGE_DEFAULT_LIMIT, after)
+        return {"items": items, "nextCursor": next_cursor}, ref
+    return load
+
+# Stream a section as NDJSON straight from the Motor cursor
+async def stream_section(
+    user_id: str, section: str, cursor: Optional[str], limit: Optional[int], if_none_match: Optional[str]
+):
+    after = decode_cursor(cursor) if cursor else None
+    ref = await get_portfolio_version(user_id)
+    # Not the JSON list's ETag, and one per page
+    etag = make_etag(ref, section, f"ndjson:limit={limit}&cursor={cursor or ''}")
+    headers = {"ETag": etag, "Cache-Control": settings.PORTFOLIO_CACHE_CONTROL, "Vary": SECTION_VARY}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    cursor = section_repositories[section].iterate(ref.id, after, limit, settings.SECTION_STREAM_BATCH_SIZE)
+
+    async def lines():
+        async for document in cursor:
+            yield dumps_bytes(document) + b"\n"
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+# Helper function to reject MongoDB-only features on other storage backends
+def require_mongo(feature: str):
+    if db is None:
+        raise HTTPException(
+            status_code=501, detail=f"{feature} is only available with the mongo storage backend (using {storage.name})"
+        )
+
+# Helper function to parse a path id, treating malformed ids as not found
+def parse_object_id(value: str, label: str) -> ObjectId:
+    if not ObjectId.is_valid(value):
+        raise HTTPException(status_code=404, detail=f"{label} not found")
+    return ObjectId(value)
 
 # ROOT ENDPOINT
 @api_router.get("/")
@@ -137,349 +420,448 @@ async def root():
 async def api_test():
     return {"message": "API router is working", "status": "success", "endpoint": "/api/test"}
 
-# PORTFOLIO ENDPOINTS
-@api_router.get("/portfolio/{user_id}")
-async def get_portfolio(user_id: str):
-    """Get complete portfolio data for a user"""
-    try:
-        # Get main portfolio
-        portfolio = await get_portfolio_by_user_id(user_id)
-        portfolio_id = portfolio["_id"]
-        
-        # Get all related data
-        experience = await db.experience.find({"portfolioId": portfolio_id}).sort("order", 1).to_list(100)
-        projects = await db.projects.find({"portfolioId": portfolio_id}).sort("order", 1).to_list(100)
-        skills = await db.skills.find({"portfolioId": portfolio_id}).sort("order", 1).to_list(100)
-        education = await db.education.find({"portfolioId": portfolio_id}).sort("order", 1).to_list(100)
-        certifications = await db.certifications.find({"portfolioId": portfolio_id}).sort("order", 1).to_list(100)
-        
-        result = {
-            "portfolio": parse_json(portfolio),
-            "experience": parse_json(experience),
-            "projects": parse_json(projects),
-            "skills": parse_json(skills),
-            "education": parse_json(education),
-            "certifications": parse_json(certifications)
-        }
-        
-        return result
-    except HTTPException:
-        # Re-raise HTTPException to preserve status code
-        raise
-    except Exception as e:
-        logger.error(f"Error getting portfolio: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.post("/portfolio")
-async def create_portfolio(portfolio_data: PortfolioCreate):
-    """Create a new portfolio"""
-    try:
-        # Check if portfolio already exists
-        existing = await db.portfolios.find_one({"userId": portfolio_data.userId})
-        if existing:
-            raise HTTPException(status_code=400, detail="Portfolio already exists for this user")
-        
-        portfolio = Portfolio(**portfolio_data.dict())
-        result = await db.portfolios.insert_one(portfolio.dict(by_alias=True))
-        
-        created_portfolio = await db.portfolios.find_one({"_id": result.inserted_id})
-        return parse_json(created_portfolio)
-    except Exception as e:
-        logger.error(f"Error creating portfolio: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.put("/portfolio/{user_id}")
-async def update_portfolio(user_id: str, update_data: PortfolioUpdate):
-    """Update portfolio basic info"""
-    try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        
-        update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
-        update_dict["updatedAt"] = datetime.utcnow()
-        
-        await db.portfolios.update_one(
-            {"_id": portfolio["_id"]}, 
-            {"$set": update_dict}
-        )
-        
-        updated_portfolio = await db.portfolios.find_one({"_id": portfolio["_id"]})
-        return parse_json(updated_portfolio)
-    except Exception as e:
-        logger.error(f"Error updating portfolio: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+# Runtime stats (fetch latency per mode, ...)
+@api_router.get("/stats")
+async def get_stats():
+    return collect_stats()
 
-# EXPERIENCE ENDPOINTS
-@api_router.get("/portfolio/{user_id}/experience")
-async def get_experience(user_id: str):
-    """Get all experience for a user"""
+# Index self-check: registry drift plus explain() of the hot queries
+@api_router.get("/admin/indexes")
+async def check_indexes(user_id: Optional[str] = None):
+    require_mongo("Index checks")
     try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        experience = await db.experience.find({"portfolioId": portfolio["_id"]}).sort("order", 1).to_list(100)
-        return parse_json(experience)
+        drift = await ensure_indexes(db, dry_run=True)
+        ref = await get_portfolio_ref(portfolios, user_id) if user_id else None
+        queries = await explain_hot_queries(db, **({"user_id": user_id, "portfolio_id": ref.id} if ref else {}))
+        healthy = not (drift["missing"] or drift["conflicts"]) and all(check["ok"] for check in queries)
+        return {"ok": healthy, "indexes": drift, "queries": queries}
     except Exception as e:
-        logger.error(f"Error getting experience: {str(e)}")
+        logger.error(f"Error checking indexes: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.post("/portfolio/{user_id}/experience")
-async def create_experience(user_id: str, experience_data: ExperienceCreate):
-    """Add new experience"""
+@api_router.post("/admin/facets:rebuild")
+async def rebuild_facets(user_id: Optional[str] = None):
+    """Recount facet tags from the section items (one portfolio, or all) and report drift"""
+    require_mongo("Facets")
     try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        
-        experience = Experience(
-            portfolioId=portfolio["_id"],
-            **experience_data.dict()
-        )
-        
-        result = await db.experience.insert_one(experience.dict(by_alias=True))
-        created_experience = await db.experience.find_one({"_id": result.inserted_id})
-        return parse_json(created_experience)
-    except Exception as e:
-        logger.error(f"Error creating experience: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.put("/portfolio/{user_id}/experience/{experience_id}")
-async def update_experience(user_id: str, experience_id: str, update_data: ExperienceUpdate):
-    """Update experience"""
-    try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        
-        update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
-        update_dict["updatedAt"] = datetime.utcnow()
-        
-        result = await db.experience.update_one(
-            {"_id": ObjectId(experience_id), "portfolioId": portfolio["_id"]},
-            {"$set": update_dict}
-        )
-        
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Experience not found")
-        
-        updated_experience = await db.experience.find_one({"_id": ObjectId(experience_id)})
-        return parse_json(updated_experience)
-    except Exception as e:
-        logger.error(f"Error updating experience: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.delete("/portfolio/{user_id}/experience/{experience_id}")
-async def delete_experience(user_id: str, experience_id: str):
-    """Delete experience"""
-    try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        
-        result = await db.experience.delete_one(
-            {"_id": ObjectId(experience_id), "portfolioId": portfolio["_id"]}
-        )
-        
-        if result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail="Experience not found")
-        
-        return {"message": "Experience deleted successfully"}
+        ids = [await get_portfolio_id(user_id)] if user_id else None
+        return await facet_store.reconcile(ids)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error deleting experience: {str(e)}")
+        logger.error(f"Error rebuilding facets: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# PROJECT ENDPOINTS
-@api_router.get("/portfolio/{user_id}/projects")
-async def get_projects(user_id: str):
-    """Get all projects for a user"""
+@api_router.post("/admin/counters:rebuild")
+async def rebuild_stat_counters(user_id: Optional[str] = None):
+    """Recount the counters behind derived stats (one portfolio, or all) and report drift"""
     try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        projects = await db.projects.find({"portfolioId": portfolio["_id"]}).sort("order", 1).to_list(100)
-        return parse_json(projects)
+        if user_id:
+            await get_portfolio_id(user_id)
+        report = {"portfolios": 0, "drifted": 0}
+        async for owner, portfolio_id, result in reconcile_counters(storage, user_id):
+            report["portfolios"] += 1
+            report["drifted"] += result["drifted"]
+            await after_counters_rebuild(owner, portfolio_id, result["version"])
+        return report
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting projects: {str(e)}")
+        logger.error(f"Error rebuilding counters: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.post("/portfolio/{user_id}/projects")
-async def create_project(user_id: str, project_data: ProjectCreate):
-    """Add new project"""
+# PORTFOLIO ENDPOINTS
+@api_router.get("/portfolio/{user_id}")
+async def get_portfolio(
+    user_id: str,
+    include: Optional[str] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """Get complete portfolio data for a user (or a sparse fieldset: ?include=projects&fields=projects.title)"""
     try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        
-        project = Project(
-            portfolioId=portfolio["_id"],
-            **project_data.dict()
+        fieldset = parse_fieldset(include, fields)
+        if snapshots is not None and fieldset is None:
+            # Snapshot mode: no storage or model work once the file exists
+            snapshot = snapshots.get(user_id)
+            if snapshot is None or snapshot.rendered_on != render_day():
+                snapshot = await coalesced(
+                    ("snapshot", user_id, response_cache.generation(user_id), render_day()),
+                    lambda: refresh_snapshot(user_id),
+                )
+            if snapshot is not None:
+                return snapshot_response(snapshot, if_none_match, accept_encoding)
+
+        async def load(ref):
+            # Get main portfolio and all related data
+            data = await fetch_portfolio(storage, user_id, fieldset=fieldset)
+            if data is None:
+                raise HTTPException(status_code=404, detail="Portfolio not found")
+            portfolio_ids.prime(user_id, data["portfolio"]["_id"])
+            return data, pop_ref(data["portfolio"])
+        
+        return await conditional_json_response(
+            user_id, FULL_PORTFOLIO, if_none_match, load, variant=portfolio_variant(fieldset),
+            accept_encoding=accept_encoding,
         )
-        
-        result = await db.projects.insert_one(project.dict(by_alias=True))
-        created_project = await db.projects.find_one({"_id": result.inserted_id})
-        return parse_json(created_project)
+    except InvalidFieldset as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        # Re-raise HTTPException to preserve status code
+        raise
     except Exception as e:
-        logger.error(f"Error creating project: {str(e)}")
+        logger.error(f"Error getting portfolio: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.put("/portfolio/{user_id}/projects/{project_id}")
-async def update_project(user_id: str, project_id: str, update_data: ProjectUpdate):
-    """Update project"""
+@api_router.post("/portfolios:batchGet")
+async def batch_get_portfolios(request: BatchGetRequest):
+    """Get many portfolios at once: one query for the portfolios, then one per section"""
     try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        
-        update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
-        update_dict["updatedAt"] = datetime.utcnow()
-        
-        result = await db.projects.update_one(
-            {"_id": ObjectId(project_id), "portfolioId": portfolio["_id"]},
-            {"$set": update_dict}
-        )
-        
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        updated_project = await db.projects.find_one({"_id": ObjectId(project_id)})
-        return parse_json(updated_project)
+        user_ids = list(dict.fromkeys(request.userIds))
+        if len(user_ids) > settings.PORTFOLIO_BATCH_MAX_SIZE:
+            raise HTTPException(
+                status_code=400, detail=f"At most {settings.PORTFOLIO_BATCH_MAX_SIZE} userIds per batchGet"
+            )
+        fieldset = parse_fieldset(request.include, request.fields)
+        found = await fetch_portfolios(storage, user_ids, fieldset=fieldset)
+        for found_user_id, data in found.items():
+            portfolio_ids.prime(found_user_id, data["portfolio"]["_id"])
+            pop_ref(data["portfolio"])
+        return MongoJSONResponse({
+            "portfolios": [found[user_id] for user_id in user_ids if user_id in found],
+            "notFound": [user_id for user_id in user_ids if user_id not in found],
+        })
+    except InvalidFieldset as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error updating project: {str(e)}")
+        logger.error(f"Error batch getting portfolios: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.delete("/portfolio/{user_id}/projects/{project_id}")
-async def delete_project(user_id: str, project_id: str):
-    """Delete project"""
+@api_router.post("/portfolio")
+async def create_portfolio(portfolio_data: PortfolioCreate):
+    """Create a new portfolio"""
     try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        
-        result = await db.projects.delete_one(
-            {"_id": ObjectId(project_id), "portfolioId": portfolio["_id"]}
-        )
-        
-        if result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail="Project not found")
+        # Check if portfolio already exists
+        if await portfolios.exists(portfolio_data.userId):
+            raise HTTPException(status_code=400, detail="Portfolio already exists for this user")
         
-        return {"message": "Project deleted successfully"}
+        portfolio = await portfolios.insert(portfolio_data)
+        await publish_write(portfolio_data.userId, portfolio.id, portfolio.version)
+        response_cache.invalidate(portfolio_data.userId)
+        portfolio_ids.prime(portfolio_data.userId, portfolio.id)
+        await refresh_snapshot(portfolio_data.userId)
+        created = render_stats(portfolio.dict(by_alias=True))
+        pop_ref(created)
+        return MongoJSONResponse(created)
+    except HTTPException:
+        raise
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Portfolio already exists for this user")
     except Exception as e:
-        logger.error(f"Error deleting project: {str(e)}")
+        logger.error(f"Error creating portfolio: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# SKILL ENDPOINTS
-@api_router.get("/portfolio/{user_id}/skills")
-async def get_skills(user_id: str):
-    """Get all skills for a user"""
+@api_router.put("/portfolio/{user_id}")
+async def update_portfolio(user_id: str, update_data: PortfolioUpdate):
+    """Update portfolio basic info"""
     try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        skills = await db.skills.find({"portfolioId": portfolio["_id"]}).sort("order", 1).to_list(100)
-        return parse_json(skills)
+        updated_portfolio = render_stats(await portfolios.update(user_id, update_data))
+        if updated_portfolio is None:
+            raise HTTPException(status_code=404, detail="Portfolio not found")
+        ref = pop_ref(updated_portfolio)
+        await publish_write(user_id, ref.id, ref.version)
+        response_cache.invalidate(user_id, FULL_PORTFOLIO)
+        await refresh_snapshot(user_id)
+        portfolio_events.publish(user_id, ref.version, [change("portfolio", "update", ref.id, updated_portfolio)])
+        return MongoJSONResponse(updated_portfolio)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting skills: {str(e)}")
+        logger.error(f"Error updating portfolio: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.post("/portfolio/{user_id}/skills")
-async def create_skill(user_id: str, skill_data: SkillCreate):
-    """Add new skill category"""
+@api_router.get("/portfolio/{user_id}/events")
+async def portfolio_event_stream(user_id: str, last_event_id: Optional[str] = Header(None)):
+    """Stream committed changes to a portfolio as Server-Sent Events"""
     try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        
-        skill = Skill(
-            portfolioId=portfolio["_id"],
-            **skill_data.dict()
+        await get_portfolio_id(user_id)
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        return StreamingResponse(
+            portfolio_events.subscribe(user_id, last_event_id), media_type="text/event-stream", headers=headers
         )
-        
-        result = await db.skills.insert_one(skill.dict(by_alias=True))
-        created_skill = await db.skills.find_one({"_id": result.inserted_id})
-        return parse_json(created_skill)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error creating skill: {str(e)}")
+        logger.error(f"Error opening event stream: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.put("/portfolio/{user_id}/skills/{skill_id}")
-async def update_skill(user_id: str, skill_id: str, update_data: SkillUpdate):
-    """Update skill category"""
+@api_router.get("/portfolio/{user_id}/changes")
+async def get_portfolio_changes(user_id: str, since: Optional[str] = None):
+    """Portfolio data created, updated or deleted since a sync token (everything without one)"""
+    require_mongo("Delta sync")
     try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        
-        update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
-        update_dict["updatedAt"] = datetime.utcnow()
-        
-        result = await db.skills.update_one(
-            {"_id": ObjectId(skill_id), "portfolioId": portfolio["_id"]},
-            {"$set": update_dict}
-        )
-        
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Skill not found")
-        
-        updated_skill = await db.skills.find_one({"_id": ObjectId(skill_id)})
-        return parse_json(updated_skill)
+        token = decode_sync_token(since) if since else None
+        ref = await get_portfolio_version(user_id)
+        return MongoJSONResponse(await fetch_changes(db, ref, token), headers={"Cache-Control": "no-store"})
+    except InvalidSyncToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error updating skill: {str(e)}")
+        logger.error(f"Error getting portfolio changes: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.delete("/portfolio/{user_id}/skills/{skill_id}")
-async def delete_skill(user_id: str, skill_id: str):
-    """Delete skill category"""
+@api_router.get("/portfolio/{user_id}/facets")
+async def get_portfolio_facets(user_id: str, limit: int = Query(50, ge=1, le=500)):
+    """Tag counts and co-occurring tag pairs for project tech, experience skills and skills"""
+    require_mongo("Facets")
     try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        
-        result = await db.skills.delete_one(
-            {"_id": ObjectId(skill_id), "portfolioId": portfolio["_id"]}
-        )
-        
-        if result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail="Skill not found")
-        
-        return {"message": "Skill deleted successfully"}
+        portfolio_id = await get_portfolio_id(user_id)
+        return MongoJSONResponse(render_facets(await facet_store.get(portfolio_id), limit))
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error deleting skill: {str(e)}")
+        logger.error(f"Error getting facets: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# EDUCATION ENDPOINTS
-@api_router.get("/portfolio/{user_id}/education")
-async def get_education(user_id: str):
-    """Get all education for a user"""
+@api_router.get("/portfolio/{user_id}/search")
+async def search_portfolio(
+    user_id: str,
+    q: str = Query(..., min_length=1, max_length=200),
+    sections: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Ranked full-text search over a portfolio's projects, experience and skills"""
     try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        education = await db.education.find({"portfolioId": portfolio["_id"]}).sort("order", 1).to_list(100)
-        return parse_json(education)
+        names = parse_sections(sections)
+        portfolio_id = await get_portfolio_id(user_id)
+        result = await search_index.search(storage, user_id, portfolio_id, q, names, limit)
+        return MongoJSONResponse({"query": q, **result})
+    except InvalidSearch as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting education: {str(e)}")
+        logger.error(f"Error searching portfolio: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.post("/portfolio/{user_id}/education")
-async def create_education(user_id: str, education_data: EducationCreate):
-    """Add new education"""
+# EXPORT / IMPORT ENDPOINTS (NDJSON, see services/transfer.py)
+@api_router.get("/portfolio/{user_id}/export")
+async def export_portfolio_ndjson(user_id: str):
+    """Stream a portfolio and all its sections as NDJSON"""
     try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        
-        education = Education(
-            portfolioId=portfolio["_id"],
-            **education_data.dict()
-        )
-        
-        result = await db.education.insert_one(education.dict(by_alias=True))
-        created_education = await db.education.find_one({"_id": result.inserted_id})
-        return parse_json(created_education)
+        lines = await export_portfolio(storage, user_id, settings.EXPORT_BATCH_SIZE)
+        if lines is None:
+            raise HTTPException(status_code=404, detail="Portfolio not found")
+        headers = {"Content-Disposition": f'attachment; filename="{user_id}.ndjson"'}
+        return StreamingResponse(lines, media_type=NDJSON_MEDIA_TYPE, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error creating education: {str(e)}")
+        logger.error(f"Error exporting portfolio: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# CERTIFICATION ENDPOINTS
-@api_router.get("/portfolio/{user_id}/certifications")
-async def get_certifications(user_id: str):
-    """Get all certifications for a user"""
+@api_router.post("/portfolio:import")
+async def import_portfolio_ndjson(
+    request: Request,
+    user_id: Optional[str] = None,
+    import_id: Optional[str] = None,
+    batch_size: int = Query(settings.IMPORT_BATCH_SIZE, ge=1, le=10000),
+    concurrency: int = Query(settings.IMPORT_CONCURRENCY, ge=1, le=32),
+):
+    """Load an NDJSON export; pass the returned importId again to resume a failed import"""
+    require_mongo("Import")
     try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        certifications = await db.certifications.find({"portfolioId": portfolio["_id"]}).sort("order", 1).to_list(100)
-        return parse_json(certifications)
+        report = await import_portfolio(db, iter_lines(request.stream()), user_id, import_id, batch_size, concurrency)
+        portfolio_ids.prime(report["userId"], report["portfolioId"])
+        # Counts the imported items; bumps the version like any write
+        version = (await rebuild_counters(storage, report["portfolioId"]))["version"]
+        await publish_write(report["userId"], report["portfolioId"], version)
+        response_cache.invalidate(report["userId"])
+        search_index.discard(report["userId"])
+        await facet_store.discard(report["portfolioId"])
+        await refresh_snapshot(report["userId"])
+        portfolio_events.refresh(report["userId"], version)
+        return MongoJSONResponse(report)
+    except TransferConflict as e:
+        # Nothing was written: the other import owns the portfolio
+        return MongoJSONResponse({"detail": str(e), "report": e.report}, status_code=409)
+    except TransferError as e:
+        if e.report.get("userId"):
+            response_cache.invalidate(e.report["userId"])
+            search_index.discard(e.report["userId"])
+            await refresh_snapshot(e.report["userId"])
+        # Malformed input is the client's to fix; a database failure is ours (the report's importId resumes it)
+        status_code = 400
+        if isinstance(e, TransferStorageError):
+            logger.error(f"Error importing portfolio: {str(e)}")
+            status_code = 503 if e.transient else 500
+        return MongoJSONResponse({"detail": str(e), "report": e.report}, status_code=status_code)
     except Exception as e:
-        logger.error(f"Error getting certifications: {str(e)}")
+        logger.error(f"Error importing portfolio: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.post("/portfolio/{user_id}/certifications")
-async def create_certification(user_id: str, certification_data: CertificationCreate):
-    """Add new certification"""
-    try:
-        portfolio = await get_portfolio_by_user_id(user_id)
-        
-        certification = Certification(
-            portfolioId=portfolio["_id"],
-            **certification_data.dict()
-        )
-        
-        result = await db.certifications.insert_one(certification.dict(by_alias=True))
-        created_certification = await db.certifications.find_one({"_id": result.inserted_id})
-        return parse_json(created_certification)
-    except Exception as e:
-        logger.error(f"Error creating certification: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+# SECTION ENDPOINTS (experience, projects, skills, education, certifications)
+# Every section gets the same list/create/update/delete handlers, generated
+# from its entry in models/sections.py.
+def register_section_routes(section: Section):
+    noun = section.label.lower()
+
+    async def list_items(
+        user_id: str,
+        limit: Optional[int] = Query(None, ge=1, le=settings.SECTION_PAGE_MAX_LIMIT),
+        cursor: Optional[str] = None,
+        accept: Optional[str] = Header(None),
+        if_none_match: Optional[str] = Header(None),
+        accept_encoding: Optional[str] = Header(None),
+    ):
+        try:
+            if accept and NDJSON_MEDIA_TYPE in accept:
+                return await stream_section(user_id, section.name, cursor, limit, if_none_match)
+            after = decode_cursor(cursor) if cursor else None
+            if limit is None and after is None:
+                return await conditional_json_response(
+                    user_id, section.name, if_none_match, section_loader(user_id, section.name),
+                    accept_encoding=accept_encoding, vary=SECTION_VARY,
+                )
+            return await conditional_json_response(
+                user_id, section.name, if_none_match, section_page_loader(user_id, section.name, after, limit),
+                variant=f"limit={limit}&cursor={cursor or ''}", accept_encoding=accept_encoding, vary=SECTION_VARY,
+            )
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting {section.name}: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def create_item(user_id: str, item_data: section.create_model):
+        try:
+            portfolio_id = await get_portfolio_id(user_id)
+            item = await section_repositories[section.name].insert(portfolio_id, item_data)
+            await record_facets(portfolio_id, section.name, (None, item))
+            await after_section_write(
+                user_id, portfolio_id, section.name, change(section.name, "create", item.id, item),
+                counters=counter_deltas(section.name, [(None, item)]),
+            )
+            return MongoJSONResponse(item)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error creating {noun}: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def update_item(user_id: str, item_id: str, update_data: section.update_model):
+        try:
+            portfolio_id = await get_portfolio_id(user_id)
+            object_id = parse_object_id(item_id, section.label)
+            facets_before, counters_before = await item_before_write(section.name, portfolio_id, object_id, update_data)
+            updated_item = await section_repositories[section.name].update(portfolio_id, object_id, update_data)
+            if updated_item is None:
+                raise HTTPException(status_code=404, detail=f"{section.label} not found")
+            if facets_before is not None:
+                await record_facets(portfolio_id, section.name, (facets_before, updated_item))
+            counters = None
+            if counters_before is not None:
+                counters = counter_deltas(section.name, [(counters_before, updated_item)])
+            await after_section_write(
+                user_id, portfolio_id, section.name, change(section.name, "update", updated_item["_id"], updated_item),
+                counters=counters,
+            )
+            return MongoJSONResponse(updated_item)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error updating {noun}: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def delete_item(user_id: str, item_id: str):
+        try:
+            portfolio_id = await get_portfolio_id(user_id)
+            object_id = parse_object_id(item_id, section.label)
+            facets_before, counters_before = await item_before_write(section.name, portfolio_id, object_id)
+            deleted = await section_repositories[section.name].delete(portfolio_id, object_id)
+            if not deleted:
+                raise HTTPException(status_code=404, detail=f"{section.label} not found")
+            if facets_before is not None:
+                await record_facets(portfolio_id, section.name, (facets_before, None))
+            if db is not None:
+                # Before the version bump, so delta sync never skips the deletion
+                await record_tombstone(db, portfolio_id, section.name, object_id)
+            await after_section_write(
+                user_id, portfolio_id, section.name, change(section.name, "delete", object_id),
+                # No fields needed still means an item was removed
+                counters=counter_deltas(section.name, [(counters_before if counters_before is not None else {}, None)]),
+            )
+            return {"message": f"{section.label} deleted successfully"}
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error deleting {noun}: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def batch_create_items(user_id: str, batch: BatchCreate[section.create_model]):
+        try:
+            portfolio_id = await get_portfolio_id(user_id)
+            results = await section_repositories[section.name].insert_many(portfolio_id, batch.items, batch.ordered)
+            created = sum(1 for result in results if result["status"] == "created")
+            if created:
+                items = [result["item"] for result in results if result["status"] == "created"]
+                await record_facets(portfolio_id, section.name, *((None, item) for item in items))
+                await after_section_write(
+                    user_id, portfolio_id, section.name, *(change(section.name, "create", item.id, item) for item in items),
+                    counters=counter_deltas(section.name, [(None, item) for item in items]),
+                )
+            return MongoJSONResponse({
+                "ordered": batch.ordered,
+                "created": created,
+                "failed": len(results) - created,
+                "results": results,
+            })
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error batch creating {section.name}: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def reorder_items(user_id: str, reorder: ReorderRequest):
+        try:
+            if len(set(reorder.ids)) != len(reorder.ids):
+                raise HTTPException(status_code=400, detail="Duplicate ids in ordering")
+            portfolio_id = await get_portfolio_id(user_id)
+            results = await section_repositories[section.name].reorder(portfolio_id, reorder.ids)
+            updated = sum(1 for result in results if result["status"] == "updated")
+            if updated:
+                order = [{"_id": result["id"], "order": result["order"]} for result in results if result["status"] == "updated"]
+                await after_section_write(user_id, portfolio_id, section.name, change(section.name, "reorder", document=order))
+            return MongoJSONResponse({"updated": updated, "notFound": len(results) - updated, "results": results})
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error reordering {section.name}: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    collection_path = f"/portfolio/{{user_id}}/{section.name}"
+    item_path = f"{collection_path}/{{item_id}}"
+    routes = [
+        (collection_path, list_items, "GET", f"get_{section.name}", f"Get all {section.name} for a user"),
+        (collection_path, create_item, "POST", f"create_{noun}", f"Add new {noun}"),
+        (f"{collection_path}:batch", batch_create_items, "POST", f"batch_create_{section.name}", f"Add many {section.name} items in one insert"),
+        (f"{collection_path}/order", reorder_items, "PATCH", f"reorder_{section.name}", f"Apply a new ordering to {section.name}"),
+        (item_path, update_item, "PUT", f"update_{noun}", f"Update {noun}"),
+        (item_path, delete_item, "DELETE", f"delete_{noun}", f"Delete {noun}"),
+    ]
+    for path, endpoint, method, name, summary in routes:
+        endpoint.__name__ = endpoint.__qualname__ = name
+        endpoint.__doc__ = summary
+        api_router.add_api_route(path, endpoint, methods=[method], name=name)
+
+for section in SECTIONS:
+    register_section_routes(section)
 
 # SEED DATA ENDPOINT (for initial setup)
 @api_router.post("/seed-data")
@@ -496,7 +878,7 @@ async def _seed_data_logic():
     """Common logic for seeding data"""
     try:
         # Check if data already exists
-        existing_portfolio = await db.portfolios.find_one({"userId": "akshaj"})
+        existing_portfolio = await portfolios.find_by_user("akshaj", ("_id",))
         if existing_portfolio:
             return {"message": "Data already exists", "portfolioId": str(existing_portfolio["_id"])}
         
@@ -511,21 +893,20 @@ async def _seed_data_logic():
             github="https://github.com/akshaj"
         )
         
+        # Derived from the portfolio's counters; research papers have no section to count
         stats = [
-            Stat(value="3+", label="Years Experience", order=1),
-            Stat(value="15+", label="Security Projects", order=2),
-            Stat(value="8+", label="Certifications", order=3),
+            Stat(label="Years Experience", order=1, source="experienceYears"),
+            Stat(label="Security Projects", order=2, source="projects"),
+            Stat(label="Certifications", order=3, source="certifications"),
             Stat(value="2", label="Research Papers", order=4)
         ]
         
-        portfolio = Portfolio(
+        portfolio = await portfolios.insert(PortfolioCreate(
             userId="akshaj",
             personalInfo=personal_info,
             stats=stats
-        )
-        
-        portfolio_result = await db.portfolios.insert_one(portfolio.dict(by_alias=True))
-        portfolio_id = portfolio_result.inserted_id
+        ))
+        portfolio_id = portfolio.id
         
         # Add experience data
         experience_data = [
@@ -534,6 +915,7 @@ async def _seed_data_logic():
                 "company": "Catenactio Inc",
                 "location": "Los Angeles, CA",
                 "period": "May 2024 – Present",
+                "startDate": datetime(2024, 5, 1),
                 "current": True,
                 "highlights": [
                     "Tuned SIEM rules (Wazuh) to reduce false positives and improve threat detection across enterprise clients",
@@ -550,6 +932,8 @@ async def _seed_data_logic():
                 "company": "University at Buffalo",
                 "location": "Buffalo, NY",
                 "period": "Aug 2024 – Dec 2024",
+                "startDate": datetime(2024, 8, 1),
+                "endDate": datetime(2024, 12, 31),
                 "current": False,
                 "highlights": [
                     "Fine-tuned LLMs to detect adversarial prompts, hate speech, and toxic content",
@@ -565,6 +949,8 @@ async def _seed_data_logic():
                 "company": "Bosch Global Software Technologies",
                 "location": "Bengaluru, IN",
                 "period": "Jan 2023 – Jun 2023",
+                "startDate": datetime(2023, 1, 1),
+                "endDate": datetime(2023, 6, 30),
                 "current": False,
                 "highlights": [
                     "Developed and tested embedded automotive software in compliance with MISRA C standards",
@@ -577,9 +963,17 @@ async def _seed_data_logic():
             }
         ]
         
-        for exp_data in experience_data:
-            experience = Experience(portfolioId=portfolio_id, **exp_data)
-            await db.experience.insert_one(experience.dict(by_alias=True))
+        await section_repositories["experience"].insert_many(
+            portfolio_id, [ExperienceCreate(**exp_data) for exp_data in experience_data]
+        )
+        version = (await rebuild_counters(storage, portfolio_id))["version"]
+        await publish_write("akshaj", portfolio_id, version)
+        response_cache.invalidate("akshaj")
+        search_index.discard("akshaj")
+        if facet_store is not None:
+            await facet_store.discard(portfolio_id)
+        portfolio_ids.prime("akshaj", portfolio_id)
+        await refresh_snapshot("akshaj")
         
         return {"message": "Database seeded successfully", "portfolioId": str(portfolio_id)}
         
@@ -592,7 +986,12 @@ app.include_router(api_router)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    if invalidation_bus is not None:
+        await invalidation_bus.stop()
+    await portfolio_events.stop()
+    if client is not None:
+        client.close()
+    storage.close()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,333 @@
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from pymongo import monitoring
+
+from services.stats import register_stats
+import settings
+
+# Admission control for the /api routes, sized to the MongoDB connection pool.
+#
+# Each request class has its own concurrency limit and a bounded FIFO wait
+# queue. A request that finds its queue full, or waits longer than
+# ADMISSION_QUEUE_TIMEOUT, is turned away at once with 503 + Retry-After
+# instead of queueing on the pool until the socket timeout turns it into a 500.
+#
+# The read and write limits adapt to observed MongoDB command latency (AIMD):
+# every ADMISSION_ADJUST_INTERVAL seconds, a p95 above
+# ADMISSION_LATENCY_TARGET_MS cuts them by ADMISSION_DECREASE_FACTOR; a p95 at
+# or under target adds 1 to each limit that was saturated or is below its
+# configured value, and an interval without commands restores that value. The
+# bulk limit is fixed. Commands that wait for data by design (change streams,
+# tailable cursors) are not latency and are left out.
+READ = "read"
+WRITE = "write"
+BULK = "bulk"  # seeding, imports and admin jobs
+
+# Served without a limit: no database work, or long-lived SSE streams that would hold a slot
+EXEMPT_PATHS = frozenset({"/api/", "/api/test", "/api/stats"})
+BULK_PATHS = frozenset({"/api/seed-data", "/api/portfolio:import"})
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """The admission class of a request, or None if it is not limited"""
+    if not path.startswith("/api/") or path in EXEMPT_PATHS or path.endswith("/events"):
+        return None
+    if path in BULK_PATHS or path.startswith("/api/admin/"):
+        return BULK
+    if method in ("GET", "HEAD") or path.endswith(":batchGet"):
+        return READ
+    return WRITE
+
+
+class Limiter:
+    """A concurrency limit with a bounded FIFO queue of waiters"""
+
+    def __init__(self, name: str, limit: int, min_limit: int, max_limit: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.initial_limit = limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.saturated = False  # hit the limit since the last adjustment
+        self._waiters = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting in the queue if needed; False if the request should be shed"""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        self.saturated = True
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended
+                self.release()
+            else:
+                self._discard(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            return False
+        self.admitted += 1
+        return True
+
+    def _discard(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self):
+        self.in_flight -= 1
+        self.wake()
+
+    def wake(self):
+        """Hand free slots to waiters in arrival order"""
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def resize(self, limit: int):
+        self.limit = max(self.min_limit, min(self.max_limit, limit))
+        self.saturated = False
+        self.wake()
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+class AdmissionController:
+    """Per-class limiters whose read and write limits follow MongoDB command latency"""
+
+    def __init__(self, limiters: Dict[str, Limiter], latency_target: float, adjust_interval: float,
+                 decrease_factor: float, retry_after: int, clock=time.monotonic):
+        self.limiters = limiters
+        self.latency_target = latency_target
+        self.adjust_interval = adjust_interval
+        self.decrease_factor = decrease_factor
+        self.retry_after = retry_after
+        self.clock = clock
+        # Appended from pymongo's threads, drained on the event loop
+        self._samples = deque(maxlen=10000)
+        self._adjusted_at = clock()
+        self.last_p95 = None
+        self.increases = 0
+        self.decreases = 0
+
+    def limiter_for(self, method: str, path: str) -> Optional[Limiter]:
+        name = route_class(method, path)
+        return self.limiters.get(name) if name else None
+
+    def observe(self, seconds: float):
+        """Record one MongoDB command's latency"""
+        self._samples.append(seconds)
+
+    def command_listener(self) -> monitoring.CommandListener:
+        """Listener to pass in AsyncIOMotorClient(event_listeners=...)"""
+        return _LatencyListener(self)
+
+    def maybe_adjust(self):
+        """Resize the adaptive limits if an interval has passed"""
+        now = self.clock()
+        if now - self._adjusted_at < self.adjust_interval:
+            return
+        self._adjusted_at = now
+        samples = []
+        while self._samples:
+            samples.append(self._samples.popleft())
+        if samples:
+            samples.sort()
+            self.last_p95 = samples[min(len(samples) - 1, int(math.ceil(0.95 * len(samples))) - 1)]
+        for limiter in self.limiters.values():
+            if limiter.min_limit == limiter.max_limit:
+                continue
+            if not samples:
+                # No commands, so no sign of overload: back to the configured limit
+                if limiter.limit < limiter.initial_limit:
+                    self.increases += 1
+                limiter.resize(max(limiter.limit, limiter.initial_limit))
+            elif self.last_p95 > self.latency_target:
+                if limiter.limit > limiter.min_limit:
+                    self.decreases += 1
+                limiter.resize(int(limiter.limit * self.decrease_factor))
+            elif limiter.saturated or limiter.limit < limiter.initial_limit:
+                if limiter.limit < limiter.max_limit:
+                    self.increases += 1
+                limiter.resize(limiter.limit + 1)
+
+    def stats(self):
+        return {
+            "enabled": settings.ADMISSION_CONTROL,
+            "latency_target_ms": round(self.latency_target * 1000, 3),
+            "last_p95_ms": None if self.last_p95 is None else round(self.last_p95 * 1000, 3),
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "classes": {name: limiter.stats() for name, limiter in self.limiters.items()},
+        }
+
+
+def _awaits_data(event) -> bool:
+    """Whether a command opens a cursor that waits for new data (a change stream or tailable cursor)"""
+    command = event.command
+    if event.command_name == "aggregate":
+        return any("$changeStream" in stage for stage in command.get("pipeline", ()))
+    return event.command_name == "find" and bool(command.get("tailable") and command.get("awaitData"))
+
+
+class _LatencyListener(monitoring.CommandListener):
+    """Feeds command latency to the controller, leaving out commands that wait for data.
+
+    A change stream (services/invalidation.py) or tailable cursor blocks in
+    getMore until there is data or the server's await time (1 s by default)
+    passes; on a quiet worker those would make up the p95 and pin the limits
+    to their floor. Such cursors are remembered from the command that opened
+    them, and their getMores skipped.
+    """
+
+    def __init__(self, controller: AdmissionController):
+        self.controller = controller
+        self._lock = threading.Lock()
+        self._awaiting_cursors = set()  # (server address, cursor id)
+        # Commands in progress that are left out: (server address, request id) -> the cursor
+        # a getMore continues, or None for the command that opens one
+        self._skipped = {}
+
+    def started(self, event):
+        address = event.connection_id
+        with self._lock:
+            if event.command_name == "getMore":
+                cursor = (address, event.command.get("getMore"))
+                if cursor in self._awaiting_cursors:
+                    self._skipped[(address, event.request_id)] = cursor
+            elif event.command_name == "killCursors":
+                for cursor_id in event.command.get("cursors", ()):
+                    self._awaiting_cursors.discard((address, cursor_id))
+            elif _awaits_data(event):
+                self._skipped[(address, event.request_id)] = None
+
+    def succeeded(self, event):
+        with self._lock:
+            skipped = (event.connection_id, event.request_id) in self._skipped
+            if skipped:
+                cursor = self._skipped.pop((event.connection_id, event.request_id))
+                cursor_id = (event.reply.get("cursor") or {}).get("id")
+                if cursor is None and cursor_id:
+                    self._awaiting_cursors.add((event.connection_id, cursor_id))
+                elif cursor is not None and not cursor_id:
+                    # Exhausted or closed by the server
+                    self._awaiting_cursors.discard(cursor)
+        if not skipped:
+            self.controller.observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        with self._lock:
+            skipped = (event.connection_id, event.request_id) in self._skipped
+            if skipped:
+                cursor = self._skipped.pop((event.connection_id, event.request_id))
+                if cursor is not None:
+                    self._awaiting_cursors.discard(cursor)
+        if not skipped:
+            # A failure after a long wait (e.g. a socket timeout) is latency too
+            self.controller.observe(event.duration_micros / 1e6)
+
+
+class AdmissionMiddleware:
+    """ASGI middleware running /api requests through the admission controller.
+
+    Add it inside CORSMiddleware so a 503 still carries the CORS headers.
+    """
+
+    def __init__(self, app, controller: AdmissionController = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope, receive, send):
+        limiter = None
+        if scope["type"] == "http" and settings.ADMISSION_CONTROL:
+            limiter = self.controller.limiter_for(scope["method"], scope["path"])
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        if not await limiter.acquire():
+            await self._reject(send, limiter)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+            self.controller.maybe_adjust()
+
+    async def _reject(self, send, limiter: Limiter):
+        body = json.dumps({"detail": f"Server busy ({limiter.name} requests), retry later"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(self.controller.retry_after).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def build_admission_controller() -> AdmissionController:
+    adaptive = dict(
+        min_limit=settings.ADMISSION_MIN_LIMIT,
+        max_limit=settings.ADMISSION_MAX_LIMIT,
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    )
+    limiters = {
+        READ: Limiter(READ, settings.ADMISSION_READ_LIMIT, **adaptive),
+        WRITE: Limiter(WRITE, settings.ADMISSION_WRITE_LIMIT, **adaptive),
+        BULK: Limiter(
+            BULK, settings.ADMISSION_BULK_LIMIT, settings.ADMISSION_BULK_LIMIT, settings.ADMISSION_BULK_LIMIT,
+            settings.ADMISSION_BULK_QUEUE_SIZE, settings.ADMISSION_QUEUE_TIMEOUT,
+        ),
+    }
+    return AdmissionController(
+        limiters,
+        settings.ADMISSION_LATENCY_TARGET_MS / 1000,
+        settings.ADMISSION_ADJUST_INTERVAL,
+        settings.ADMISSION_DECREASE_FACTOR,
+        settings.ADMISSION_RETRY_AFTER,
+    )
+
+
+admission_controller = build_admission_controller()
+register_stats("admission", admission_controller.stats)
@@ -0,0 +1,142 @@
+import gzip
+import time
+from typing import Optional
+
+from services.stats import register_stats
+import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+VARY = "Accept-Encoding"
+
+
+def _gzip(body: bytes) -> bytes:
+    # mtime=0 keeps the output deterministic for a given body
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+
+# Supported content-codings in server preference order
+ENCODERS = {"br": _brotli, "gzip": _gzip} if brotli is not None else {"gzip": _gzip}
+
+
+def parse_accept_encoding(header: Optional[str]):
+    """Map each coding in an Accept-Encoding header to its q-value"""
+    accepted = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported coding the client accepts, or None for identity"""
+    accepted = parse_accept_encoding(accept_encoding)
+    best, best_q = None, 0.0
+    for coding in ENCODERS:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """Strong ETag of one content-coding of a representation"""
+    if not encoding:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def etag_variants(etag: str):
+    """The identity ETag and the ETag of every content-coding it can be sent in"""
+    return [etag] + [encoded_etag(etag, encoding) for encoding in ENCODERS]
+
+
+class ResponseCompressor:
+    """Compresses cached response bodies once per encoding and reuses the result.
+
+    Encoded bodies are stored on the CachedResponse itself, so they live and
+    die with the cache entry (i.e. with the portfolio version). Every reuse
+    is credited with the CPU time the original compression took.
+    """
+
+    def __init__(self, min_size: int):
+        self.min_size = min_size
+        self.below_threshold = 0
+        self.identity = 0
+        self.counters = {
+            encoding: {"compressions": 0, "reuses": 0, "bytes_in": 0, "bytes_out": 0,
+                       "cpu_seconds": 0.0, "cpu_seconds_saved": 0.0}
+            for encoding in ENCODERS
+        }
+
+    def select(self, size: int, accept_encoding: Optional[str]) -> Optional[str]:
+        """Coding to send a body of this size in, or None for identity"""
+        encoding = negotiate(accept_encoding)
+        if encoding is None:
+            self.identity += 1
+            return None
+        if size < self.min_size:
+            self.below_threshold += 1
+            return None
+        return encoding
+
+    def encode(self, cached, encoding: Optional[str]) -> bytes:
+        """Body of a CachedResponse in the given coding, compressing it at most once"""
+        if encoding is None:
+            return cached.body
+        counters = self.counters[encoding]
+        encoded = cached.encodings.get(encoding) if cached.encodings is not None else None
+        if encoded is not None:
+            body, seconds = encoded
+            counters["reuses"] += 1
+            counters["cpu_seconds_saved"] += seconds
+            return body
+        started = time.process_time()
+        body = ENCODERS[encoding](cached.body)
+        seconds = time.process_time() - started
+        counters["compressions"] += 1
+        counters["bytes_in"] += len(cached.body)
+        counters["bytes_out"] += len(body)
+        counters["cpu_seconds"] += seconds
+        if cached.encodings is not None:
+            cached.encodings[encoding] = (body, seconds)
+        return body
+
+    def stats(self):
+        encodings = {}
+        for encoding, counters in self.counters.items():
+            encodings[encoding] = {
+                "compressions": counters["compressions"],
+                "reuses": counters["reuses"],
+                "ratio": round(counters["bytes_in"] / counters["bytes_out"], 2) if counters["bytes_out"] else None,
+                "cpu_ms": round(counters["cpu_seconds"] * 1000, 3),
+                "cpu_ms_saved": round(counters["cpu_seconds_saved"] * 1000, 3),
+            }
+        return {
+            "min_size": self.min_size,
+            "identity": self.identity,
+            "below_threshold": self.below_threshold,
+            "encodings": encodings,
+        }
+
+
+response_compressor = ResponseCompressor(settings.COMPRESSION_MIN_SIZE)
+register_stats("compression", response_compressor.stats)
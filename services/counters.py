@@ -0,0 +1,165 @@
+import math
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Tuple
+from pydantic import BaseModel
+
+from models.portfolio import parse_stat_format
+from models.sections import SECTIONS
+import settings
+
+# Counters behind derived stats, stored on the portfolio document:
+#
+#     {counters: {experience: 3, projects: 15, ..., experienceDays: 273, currentRoles: 1, currentStartDays: 19844}}
+#
+# Section writes pass their deltas to bump_version, so the counters change in
+# the same atomic update as the version, and reading them costs nothing
+# beyond the portfolio document. A Stat with a source (models/portfolio.py)
+# renders its value from them on read; rebuild_counters() recounts from the
+# items and reconciles any drift.
+#
+# experienceYears sums the length of every experience item with a startDate:
+# a closed role adds its days to experienceDays; a current one adds 1 to
+# currentRoles and its start (days since 1970) to currentStartDays, so its
+# length up to today is computed when the stat is rendered.
+EXPERIENCE_DATE_FIELDS = ("startDate", "endDate", "current")
+COUNTER_NAMES = (*(section.name for section in SECTIONS), "experienceDays", "currentRoles", "currentStartDays")
+
+# Formats per source unless the stat has its own (STAT_FORMATS overrides these)
+DEFAULT_STAT_FORMATS = {"experienceYears": "{value}+"}
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _field(document, name: str):
+    return getattr(document, name, None) if isinstance(document, BaseModel) else document.get(name)
+
+
+def _naive(value: datetime) -> datetime:
+    """UTC without tzinfo, as MongoDB returns dates"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def item_counters(section: str, document) -> dict:
+    """What one item adds to the counters (document is a dict or a section model; None adds nothing)"""
+    if document is None:
+        return {}
+    counters = {section: 1}
+    if section == "experience":
+        start, end = _field(document, "startDate"), _field(document, "endDate")
+        if start is not None and end is not None:
+            counters["experienceDays"] = max(0, (_naive(end) - _naive(start)).days)
+        elif start is not None and _field(document, "current"):
+            counters["currentRoles"] = 1
+            counters["currentStartDays"] = (_naive(start) - _EPOCH).days
+    return counters
+
+
+def counter_deltas(section: str, changes: Iterable[Tuple[Optional[dict], Optional[dict]]]) -> dict:
+    """Counter increments for (before, after) item pairs; None is a missing item"""
+    deltas = Counter()
+    for before, after in changes:
+        deltas.update(item_counters(section, after))
+        deltas.subtract(item_counters(section, before))
+    return {name: delta for name, delta in deltas.items() if delta}
+
+
+def counter_fields(section: str, update_data=None) -> tuple:
+    """Item fields the counters need from before an update or delete (empty if none)"""
+    if section != "experience":
+        return ()
+    if update_data is not None and all(getattr(update_data, field, None) is None for field in EXPERIENCE_DATE_FIELDS):
+        return ()
+    return EXPERIENCE_DATE_FIELDS
+
+
+def source_value(counters: dict, source: str, today: datetime = None):
+    """A stat source's current number"""
+    if source != "experienceYears":
+        return counters.get(source, 0)
+    today_days = ((today or datetime.utcnow()) - _EPOCH).days
+    days = (
+        counters.get("experienceDays", 0)
+        + counters.get("currentRoles", 0) * today_days
+        - counters.get("currentStartDays", 0)
+    )
+    return max(0, days) / 365.25
+
+
+def render_stat(stat: dict, counters: dict, today: datetime = None) -> str:
+    """A derived stat's value: its source rounded down to a multiple of step, then formatted"""
+    source = stat["source"]
+    step = stat.get("step") or 1
+    number = math.floor(source_value(counters, source, today) / step + 1e-9) * step
+    if float(number).is_integer():
+        number = int(number)
+    template = stat.get("format") or settings.STAT_FORMATS.get(source) or DEFAULT_STAT_FORMATS.get(source, "{value}")
+    return "".join(str(number) if piece is None else piece for piece in parse_stat_format(template))
+
+
+def render_day(now: datetime = None) -> str:
+    """The UTC day stats are rendered for: experienceYears moves with it, so a stored
+    rendering (cached response, ETag, snapshot) only holds for that day"""
+    return (now or datetime.utcnow()).date().isoformat()
+
+
+def render_stats(portfolio: Optional[dict], today: datetime = None) -> Optional[dict]:
+    """Fill in the values of a portfolio document's derived stats and drop its counters (in place); returns the document"""
+    if not portfolio:
+        return portfolio
+    counters = portfolio.pop("counters", None) or {}
+    for stat in portfolio.get("stats") or ():
+        if isinstance(stat, dict) and stat.get("source"):
+            stat["value"] = render_stat(stat, counters, today)
+    return portfolio
+
+
+async def count_items(storage, portfolio_id) -> dict:
+    """Every counter, recounted from a portfolio's items"""
+    counters = Counter()
+    for section in SECTIONS:
+        fields = ("_id", *EXPERIENCE_DATE_FIELDS) if section.name == "experience" else ("_id",)
+        for document in await storage.sections[section.name].list(portfolio_id, fields=fields):
+            counters.update(item_counters(section.name, document))
+    return {name: counters.get(name, 0) for name in COUNTER_NAMES}
+
+
+def _nonzero(counters: dict) -> dict:
+    return {name: count for name, count in counters.items() if count}
+
+
+async def rebuild_counters(storage, portfolio_id) -> Optional[dict]:
+    """Recount a portfolio's counters and store them, bumping its version.
+
+    Returns {"version": new version, "drifted": whether the stored counters
+    differed}, or None if the portfolio does not exist.
+    """
+    counters = await count_items(storage, portfolio_id)
+    result = await storage.portfolios.set_counters(portfolio_id, counters)
+    if result is None:
+        return None
+    previous, version = result
+    return {"version": version, "drifted": _nonzero(previous) != _nonzero(counters)}
+
+
+async def reconcile_counters(storage, user_id: str = None):
+    """Rebuild the counters of one user's portfolio, or of every portfolio.
+
+    Async iterator of (user_id, portfolio_id, rebuild result).
+    """
+    if user_id is None:
+        owners = storage.portfolios.owners()
+    else:
+        portfolio = await storage.portfolios.find_by_user(user_id, ("_id",))
+        owners = _single(user_id, portfolio["_id"]) if portfolio else _single()
+    async for owner, portfolio_id in owners:
+        result = await rebuild_counters(storage, portfolio_id)
+        if result is not None:
+            yield owner, portfolio_id, result
+
+
+async def _single(*owner):
+    if owner:
+        yield owner
@@ -0,0 +1,126 @@
+import asyncio
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from models.sections import SECTIONS
+from services.counters import render_stats
+from services.pagination import SECTION_SORT
+from services.versioning import PortfolioRef
+import settings
+
+# Delta sync for GET /api/portfolio/{user_id}/changes?since=<token>.
+#
+# Items are matched on updatedAt through the (portfolioId, updatedAt) indexes;
+# deletions come from tombstones, one per deleted item, which expire through
+# a TTL index after TOMBSTONE_TTL_SECONDS. updatedAt is stamped by the app
+# before the write commits, so each query re-reads DELTA_SYNC_WINDOW seconds
+# before the token to catch writes that were still in flight (and clock skew
+# between workers). Clients apply results idempotently by _id.
+TOMBSTONES_COLLECTION = "portfolio_tombstones"
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+class SyncToken(NamedTuple):
+    portfolio_id: ObjectId
+    version: int  # portfolio version when the changes were read
+    read_at: datetime  # server time the changes were read at
+
+
+def encode_sync_token(token: SyncToken) -> str:
+    """Opaque token for the next ?since="""
+    millis = int((token.read_at - datetime(1970, 1, 1)).total_seconds() * 1000)
+    raw = json.dumps([str(token.portfolio_id), token.version, millis], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_sync_token(value: str) -> SyncToken:
+    try:
+        padded = value + "=" * (-len(value) % 4)
+        portfolio_id, version, millis = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return SyncToken(ObjectId(portfolio_id), int(version), datetime(1970, 1, 1) + timedelta(milliseconds=millis))
+    except (ValueError, TypeError, InvalidId, OverflowError) as e:
+        raise InvalidSyncToken(f"Invalid sync token: {value}") from e
+
+
+def _now() -> datetime:
+    # MongoDB dates have millisecond precision
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+async def record_tombstone(db, portfolio_id: ObjectId, section: str, item_id: ObjectId):
+    """Remember a deleted item so delta sync clients drop it"""
+    await db[TOMBSTONES_COLLECTION].insert_one(
+        {"portfolioId": portfolio_id, "section": section, "itemId": item_id, "deletedAt": datetime.utcnow()}
+    )
+
+
+async def _changed_items(db, section, portfolio_id: ObjectId, cutoff: Optional[datetime]):
+    if cutoff is None:
+        cursor = db[section.collection].find({"portfolioId": portfolio_id}).sort(SECTION_SORT)
+    else:
+        # Walks portfolioId_updatedAt: nothing changed means no document is read
+        cursor = db[section.collection].find({"portfolioId": portfolio_id, "updatedAt": {"$gt": cutoff}}).sort("updatedAt", 1)
+    return await cursor.to_list(None)
+
+
+async def _deleted_items(db, portfolio_id: ObjectId, cutoff: datetime):
+    cursor = db[TOMBSTONES_COLLECTION].find(
+        {"portfolioId": portfolio_id, "deletedAt": {"$gt": cutoff}}, {"_id": 0, "section": 1, "itemId": 1}
+    ).sort("deletedAt", 1)
+    deleted = {section.name: [] for section in SECTIONS}
+    for tombstone in await cursor.to_list(None):
+        deleted.setdefault(tombstone["section"], []).append(tombstone["itemId"])
+    return deleted
+
+
+async def fetch_changes(db, ref: PortfolioRef, since: Optional[SyncToken], window: float = None, ttl: float = None):
+    """What changed in a portfolio since a sync token, and the token to pass next.
+
+    ref must be read before calling, so a write that bumps the version while
+    this runs is fetched again next time. Returns {"full": true} with every
+    item when there is no usable token: none given, a portfolio that was
+    recreated, or one older than the tombstones (so deletions may be gone);
+    the client then replaces its copy. An unchanged version costs no further
+    query.
+    """
+    window = timedelta(seconds=settings.DELTA_SYNC_WINDOW if window is None else window)
+    ttl = timedelta(seconds=settings.TOMBSTONE_TTL_SECONDS if ttl is None else ttl)
+    read_at = _now()
+    full = since is None or since.portfolio_id != ref.id or since.read_at - window < read_at - ttl
+    result = {
+        "full": full,
+        "portfolio": None,
+        "changed": {section.name: [] for section in SECTIONS},
+        "deleted": {section.name: [] for section in SECTIONS},
+        "next": encode_sync_token(SyncToken(ref.id, ref.version, read_at)),
+    }
+    # Derived stats render as of today (services/counters.py): resend the portfolio on a new day
+    new_day = not full and since.read_at.date() != read_at.date()
+    if not full and since.version == ref.version and not new_day:
+        # Nothing was committed since the token (bar in-flight writes, which the window covers)
+        return result
+
+    cutoff = None if full else since.read_at - window
+    queries = [
+        db.portfolios.find_one({"_id": ref.id} if full or new_day else {"_id": ref.id, "updatedAt": {"$gt": cutoff}}),
+        *[_changed_items(db, section, ref.id, cutoff) for section in SECTIONS],
+    ]
+    if not full:
+        queries.append(_deleted_items(db, ref.id, cutoff))
+    portfolio, *lists = await asyncio.gather(*queries)
+    result["portfolio"] = render_stats(portfolio)
+    if portfolio is not None:
+        # The version is in the token; clients get the portfolio's only through ETags
+        portfolio.pop("version", None)
+    result["changed"] = {section.name: items for section, items in zip(SECTIONS, lists)}
+    if not full:
+        result["deleted"] = lists[-1]
+    return result
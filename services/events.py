@@ -0,0 +1,206 @@
+import asyncio
+import time
+import uuid
+from collections import deque
+from typing import Optional
+
+from services.serialization import dumps_bytes
+from services.stats import register_stats
+import settings
+
+# Server-Sent Events for GET /api/portfolio/{user_id}/events.
+#
+# "change" events carry a patch: {section, op, id, document, version}.
+# "refresh" events tell the client to re-fetch the portfolio: it missed
+# events (resumed past the replay buffer, or from another worker/process) or
+# another worker wrote the portfolio.
+HEARTBEAT = b": heartbeat\n\n"
+
+
+def change(section: str, op: str, item_id=None, document=None) -> dict:
+    """A patch for one committed write; op is create, update, delete or reorder"""
+    return {"section": section, "op": op, "id": item_id, "document": document}
+
+
+def _frame(event_id: str, event: str, data) -> bytes:
+    return f"id: {event_id}\nevent: {event}\ndata: ".encode("utf-8") + dumps_bytes(data) + b"\n\n"
+
+
+class Channel:
+    """One user's events: a bounded replay buffer and a wakeup for its subscribers"""
+
+    __slots__ = ("events", "sequence", "floor", "wakeup", "subscribers", "idle_since")
+
+    def __init__(self, replay_size: int, sequence: int):
+        self.events = deque(maxlen=replay_size)  # (sequence, frame)
+        # Latest sequence appended here; every event after floor is still buffered
+        self.sequence = self.floor = sequence
+        self.wakeup = asyncio.Event()
+        self.subscribers = 0
+        self.idle_since = time.monotonic()
+
+    def notify(self):
+        # Swap the event so waiters that wake up and wait again get a fresh one
+        wakeup, self.wakeup = self.wakeup, asyncio.Event()
+        wakeup.set()
+
+
+class EventHub:
+    """Fans out portfolio changes to SSE subscribers.
+
+    Idle connections cost one suspended generator each: they wait on their
+    channel's wakeup event, and a single ticker wakes every channel with
+    subscribers for heartbeats instead of a timer per connection. Event ids
+    are "<process epoch>-<sequence>" with one sequence per process, so a
+    Last-Event-ID from another worker, an earlier process or a dropped replay
+    buffer is recognised and answered with a refresh.
+
+    Streams end after max_stream_seconds (at the next heartbeat) and the
+    client resumes with Last-Event-ID, so open streams never hold up a
+    graceful shutdown for long.
+    """
+
+    def __init__(
+        self, replay_size: int, heartbeat_seconds: float, retry_ms: int, idle_ttl: float, max_stream_seconds: float
+    ):
+        self.replay_size = replay_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.retry_ms = retry_ms
+        self.idle_ttl = idle_ttl
+        self.max_stream_seconds = max_stream_seconds
+        self.epoch = uuid.uuid4().hex[:8]
+        self._channels = {}
+        self._sequence = 0
+        self._beat = 0
+        self._ticker = None
+        self.published = 0
+        self.refreshes = 0
+        self.resumes = 0
+        self.connections = 0
+
+    def _channel(self, user_id: str) -> Channel:
+        channel = self._channels.get(user_id)
+        if channel is None:
+            channel = self._channels[user_id] = Channel(self.replay_size, self._sequence)
+        return channel
+
+    def _append(self, channel: Channel, event: str, data):
+        if len(channel.events) == channel.events.maxlen:
+            channel.floor = channel.events[0][0]
+        self._sequence += 1
+        channel.sequence = self._sequence
+        channel.events.append((channel.sequence, _frame(f"{self.epoch}-{channel.sequence}", event, data)))
+        channel.notify()
+        self.published += 1
+
+    def publish(self, user_id: str, version: int, changes):
+        """Push committed changes; only users with a channel here (someone subscribed) are buffered"""
+        channel = self._channels.get(user_id)
+        if channel is None:
+            return
+        for patch in changes:
+            self._append(channel, "change", {**patch, "version": version})
+
+    def refresh(self, user_id: Optional[str] = None, version: Optional[int] = None):
+        """Tell subscribers to re-fetch (every user's when user_id is None)"""
+        channels = self._channels.values() if user_id is None else filter(None, [self._channels.get(user_id)])
+        for channel in list(channels):
+            self._append(channel, "refresh", {"version": version})
+
+    def _resume_position(self, channel: Channel, last_event_id: Optional[str]) -> Optional[int]:
+        """Sequence to resume after, or None if the events since last_event_id are not all buffered"""
+        if last_event_id is None:
+            return channel.sequence
+        epoch, _, sequence = last_event_id.partition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        position = int(sequence)
+        return position if channel.floor <= position <= channel.sequence else None
+
+    async def subscribe(self, user_id: str, last_event_id: Optional[str] = None):
+        """Async generator of SSE frames for one connection"""
+        self._start_ticker()
+        deadline = time.monotonic() + self.max_stream_seconds
+        channel = self._channel(user_id)
+        channel.subscribers += 1
+        self.connections += 1
+        # Taken before the first yield: events published while it is being sent are not skipped
+        position = self._resume_position(channel, last_event_id)
+        try:
+            yield f"retry: {self.retry_ms}\n\n".encode("utf-8")
+            if position is None:
+                self.refreshes += 1
+                position = channel.sequence
+                yield _frame(f"{self.epoch}-{position}", "refresh", {"version": None})
+            elif last_event_id is not None:
+                self.resumes += 1
+            beat = self._beat
+            while True:
+                if channel.sequence == position and self._beat == beat:
+                    await channel.wakeup.wait()
+                    continue
+                if channel.sequence == position:
+                    if time.monotonic() >= deadline:
+                        return
+                    beat = self._beat
+                    yield HEARTBEAT
+                    continue
+                if position < channel.floor:
+                    # This connection fell further behind than the replay buffer
+                    self.refreshes += 1
+                    position = channel.sequence
+                    yield _frame(f"{self.epoch}-{position}", "refresh", {"version": None})
+                    continue
+                frames = [frame for sequence, frame in channel.events if sequence > position]
+                position, beat = channel.sequence, self._beat
+                for frame in frames:
+                    yield frame
+        finally:
+            channel.subscribers -= 1
+            channel.idle_since = time.monotonic()
+            self.connections -= 1
+
+    def _start_ticker(self):
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.create_task(self._tick())
+
+    async def _tick(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            self._beat += 1
+            now = time.monotonic()
+            for user_id, channel in list(self._channels.items()):
+                if channel.subscribers:
+                    channel.notify()
+                elif now - channel.idle_since > self.idle_ttl:
+                    # Nobody resumed in time: drop the replay buffer
+                    del self._channels[user_id]
+
+    async def stop(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+            try:
+                await self._ticker
+            except asyncio.CancelledError:
+                pass
+            self._ticker = None
+
+    def stats(self):
+        return {
+            "connections": self.connections,
+            "channels": len(self._channels),
+            "published": self.published,
+            "resumes": self.resumes,
+            "refreshes": self.refreshes,
+            "heartbeats": self._beat,
+        }
+
+
+portfolio_events = EventHub(
+    settings.EVENTS_REPLAY_SIZE,
+    settings.EVENTS_HEARTBEAT_SECONDS,
+    settings.EVENTS_RETRY_MS,
+    settings.EVENTS_IDLE_TTL,
+    settings.EVENTS_MAX_STREAM_SECONDS,
+)
+register_stats("events", portfolio_events.stats)
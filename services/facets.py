@@ -0,0 +1,253 @@
+import logging
+from collections import Counter
+from datetime import datetime
+from itertools import combinations
+from typing import Iterable, NamedTuple, Optional, Tuple
+from bson import ObjectId
+from pydantic import BaseModel
+
+from models.sections import SECTIONS_BY_NAME
+from services.stats import register_stats
+import settings
+
+logger = logging.getLogger(__name__)
+
+# Precomputed tag counts for GET /api/portfolio/{user_id}/facets, one document
+# per portfolio in portfolio_facets:
+#
+#     {_id: portfolioId, facets: {tech: {counts: {"Wazuh": 3}, pairs: {"Elastic|Wazuh": 2}}, ...}}
+#
+# Section writes $inc the counts of the tags they add or remove; rebuild()
+# recounts with $unwind/$group and reconciles any drift. Pairs grow with the
+# square of an item's tags, so an item with more than FACET_PAIR_MAX_TAGS
+# distinct tags counts towards the tags but not the pairs, which keeps the
+# document well under MongoDB's 16 MB limit.
+FACETS_COLLECTION = "portfolio_facets"
+
+# Tags are stored as field names: escape what MongoDB does not allow there
+# (".", a leading "$") plus "%" itself and the "|" joining a pair
+_ESCAPES = {"%": "%25", ".": "%2E", "$": "%24", "|": "%7C"}
+
+
+class Facet(NamedTuple):
+    name: str
+    section: str
+    field: str  # a list of strings on the section's items
+
+
+FACETS = (
+    Facet("tech", "projects", "tech"),
+    Facet("experienceSkills", "experience", "skills"),
+    Facet("skills", "skills", "skills"),
+)
+FACETS_BY_SECTION = {facet.section: facet for facet in FACETS}
+
+
+def escape_tag(tag: str) -> str:
+    return "".join(_ESCAPES.get(character, character) for character in tag)
+
+
+def unescape_tag(key: str) -> str:
+    for character, escaped in _ESCAPES.items():
+        if character != "%":
+            key = key.replace(escaped, character)
+    return key.replace("%25", "%")
+
+
+def pair_key(first: str, second: str) -> str:
+    return f"{escape_tag(first)}|{escape_tag(second)}"
+
+
+def item_tags(document, field: str) -> frozenset:
+    """An item's distinct, stripped tags (document is a dict or a section model)"""
+    if document is None:
+        return frozenset()
+    values = getattr(document, field, None) if isinstance(document, BaseModel) else document.get(field)
+    return frozenset(value.strip() for value in values or () if isinstance(value, str) and value.strip())
+
+
+def facet_fields(section: str, update_data=None) -> tuple:
+    """Item fields the facets need from before an update or delete (empty if the write leaves them alone)"""
+    facet = FACETS_BY_SECTION.get(section)
+    if facet is None or (update_data is not None and getattr(update_data, facet.field, None) is None):
+        return ()
+    return (facet.field,)
+
+
+def pair_tags(tags: frozenset) -> list:
+    """The tags an item contributes pairs for: all of them, or none past FACET_PAIR_MAX_TAGS"""
+    return sorted(tags) if len(tags) <= settings.FACET_PAIR_MAX_TAGS else []
+
+
+def tag_deltas(facet: Facet, changes: Iterable[Tuple[Optional[dict], Optional[dict]]]) -> dict:
+    """$inc document for (before, after) item pairs; None is a missing item"""
+    deltas = Counter()
+    for before, after in changes:
+        for tags, sign in ((item_tags(before, facet.field), -1), (item_tags(after, facet.field), 1)):
+            for tag in tags:
+                deltas[f"facets.{facet.name}.counts.{escape_tag(tag)}"] += sign
+            for first, second in combinations(pair_tags(tags), 2):
+                deltas[f"facets.{facet.name}.pairs.{pair_key(first, second)}"] += sign
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def facet_pipeline(facet: Facet, portfolio_id: ObjectId):
+    """Recount one facet: distinct stripped tags per item, unwound and grouped into counts and pairs (see pair_tags)"""
+    tags = {"$filter": {
+        "input": {"$setUnion": [{"$map": {"input": {"$ifNull": [f"${facet.field}", []]}, "in": {"$trim": {"input": "$$this"}}}}, []]},
+        "cond": {"$ne": ["$$this", ""]},
+    }}
+    return [
+        {"$match": {"portfolioId": portfolio_id}},
+        {"$project": {"_id": 0, "tags": tags}},
+        {"$facet": {
+            "counts": [
+                {"$unwind": "$tags"},
+                {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+            ],
+            "pairs": [
+                {"$match": {"$expr": {"$lte": [{"$size": "$tags"}, settings.FACET_PAIR_MAX_TAGS]}}},
+                {"$project": {"first": "$tags", "second": "$tags"}},
+                {"$unwind": "$first"},
+                {"$unwind": "$second"},
+                {"$match": {"$expr": {"$lt": ["$first", "$second"]}}},
+                {"$group": {"_id": {"first": "$first", "second": "$second"}, "count": {"$sum": 1}}},
+            ],
+        }},
+    ]
+
+
+def _ranked(counts: dict, limit: int):
+    entries = [(key, count) for key, count in counts.items() if count > 0]
+    entries.sort(key=lambda entry: (-entry[1], entry[0]))
+    return entries[:limit]
+
+
+def render_facets(document: dict, limit: int) -> dict:
+    """API form of a facets document: the top `limit` tags and pairs per facet"""
+    facets = {}
+    for facet in FACETS:
+        stored = document.get("facets", {}).get(facet.name, {})
+        facets[facet.name] = {
+            "section": facet.section,
+            "field": facet.field,
+            "counts": [{"tag": unescape_tag(key), "count": count} for key, count in _ranked(stored.get("counts", {}), limit)],
+            "cooccurrence": [
+                {"tags": [unescape_tag(part) for part in key.split("|")], "count": count}
+                for key, count in _ranked(stored.get("pairs", {}), limit)
+            ],
+        }
+    return {"facets": facets, "updatedAt": document.get("updatedAt"), "rebuiltAt": document.get("rebuiltAt")}
+
+
+def drift(stored: dict, recounted: dict) -> int:
+    """Number of counts (tags and pairs) that differ, ignoring zeroed entries"""
+    differing = 0
+    for facet in FACETS:
+        for kind in ("counts", "pairs"):
+            old = {key: count for key, count in stored.get(facet.name, {}).get(kind, {}).items() if count}
+            new = recounted.get(facet.name, {}).get(kind, {})
+            differing += sum(1 for key in old.keys() | new.keys() if old.get(key) != new.get(key))
+    return differing
+
+
+async def _aiter(values):
+    for value in values:
+        yield value
+
+
+class FacetStore:
+    """Per-portfolio facet documents, maintained with $inc on every tagged write.
+
+    A missing document is rebuilt on first read. Writes never create one, so a
+    partial document of deltas is never mistaken for full counts. Failed
+    increments are logged and counted: the write itself has committed, and the
+    next rebuild corrects the counts.
+    """
+
+    def __init__(self, db):
+        self.collection = db[FACETS_COLLECTION]
+        self.db = db
+        self.increments = 0
+        self.failures = 0
+        self.rebuilds = 0
+        self.drifted = 0
+
+    async def record(self, portfolio_id: ObjectId, section: str, changes):
+        """Apply (before, after) item pairs of a committed write to the portfolio's counts"""
+        facet = FACETS_BY_SECTION.get(section)
+        if facet is None:
+            return
+        deltas = tag_deltas(facet, changes)
+        if not deltas:
+            return
+        try:
+            await self.collection.update_one(
+                {"_id": portfolio_id}, {"$inc": deltas, "$currentDate": {"updatedAt": True}}
+            )
+            self.increments += 1
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Error updating facets for {portfolio_id}: {str(e)}")
+
+    async def get(self, portfolio_id: ObjectId) -> dict:
+        document = await self.collection.find_one({"_id": portfolio_id})
+        if document is None:
+            document = await self.rebuild(portfolio_id)
+        return document
+
+    async def _count(self, facet: Facet, portfolio_id: ObjectId):
+        collection = self.db[SECTIONS_BY_NAME[facet.section].collection]
+        results = await collection.aggregate(facet_pipeline(facet, portfolio_id)).to_list(1)
+        result = results[0] if results else {"counts": [], "pairs": []}
+        return {
+            "counts": {escape_tag(entry["_id"]): entry["count"] for entry in result["counts"]},
+            "pairs": {pair_key(entry["_id"]["first"], entry["_id"]["second"]): entry["count"] for entry in result["pairs"]},
+        }
+
+    async def rebuild(self, portfolio_id: ObjectId) -> dict:
+        """Recount a portfolio's facets from its items and replace the stored document"""
+        facets = {facet.name: await self._count(facet, portfolio_id) for facet in FACETS}
+        now = datetime.utcnow()
+        previous = await self.collection.find_one_and_replace(
+            {"_id": portfolio_id}, {"facets": facets, "updatedAt": now, "rebuiltAt": now}, upsert=True
+        )
+        self.rebuilds += 1
+        if previous is not None and drift(previous.get("facets", {}), facets):
+            self.drifted += 1
+            logger.warning(f"Facet counts for {portfolio_id} had drifted; rebuilt")
+        return {"_id": portfolio_id, "facets": facets, "updatedAt": now, "rebuiltAt": now}
+
+    async def reconcile(self, portfolio_ids=None) -> dict:
+        """Rebuild the given portfolios' facets (all of them by default); reports how many had drifted"""
+        if portfolio_ids is None:
+            portfolio_ids = (portfolio["_id"] async for portfolio in self.db.portfolios.find({}, {"_id": 1}))
+        else:
+            portfolio_ids = _aiter(portfolio_ids)
+        drifted = self.drifted
+        portfolios = 0
+        async for portfolio_id in portfolio_ids:
+            await self.rebuild(portfolio_id)
+            portfolios += 1
+        return {"portfolios": portfolios, "drifted": self.drifted - drifted}
+
+    async def discard(self, portfolio_id: ObjectId):
+        """Drop a portfolio's document after a bulk load; the next read rebuilds it"""
+        await self.collection.delete_one({"_id": portfolio_id})
+
+    def stats(self):
+        return {
+            "increments": self.increments,
+            "failures": self.failures,
+            "rebuilds": self.rebuilds,
+            "drifted": self.drifted,
+        }
+
+
+def build_facet_store(db) -> Optional[FacetStore]:
+    """The facet store, or None without MongoDB"""
+    if db is None:
+        return None
+    store = FacetStore(db)
+    register_stats("facets", store.stats)
+    return store
@@ -0,0 +1,121 @@
+import typing
+from typing import Dict, NamedTuple, Optional, Tuple
+from pydantic import BaseModel
+
+from models.portfolio import Portfolio
+from models.sections import SECTIONS, SECTIONS_BY_NAME
+from services.storage import REF_FIELDS
+
+# Sparse fieldsets for GET /api/portfolio/{user_id}:
+#
+#     ?include=projects,skills                  only these sections (the portfolio is always returned)
+#     &fields=portfolio.personalInfo,projects.title,projects.tech
+#
+# Field paths are checked against the models and become MongoDB projections;
+# sections left out are never queried.
+PORTFOLIO = "portfolio"
+
+
+class InvalidFieldset(ValueError):
+    pass
+
+
+def _nested_model(annotation):
+    """The BaseModel inside an annotation like Optional[List[Stat]], if any"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for argument in typing.get_args(annotation):
+        model = _nested_model(argument)
+        if model is not None:
+            return model
+    return None
+
+
+def model_paths(model, prefix: str = "") -> frozenset:
+    """Every field path of a model as stored (aliases, e.g. _id), including nested ones"""
+    paths = set()
+    for name, field in model.model_fields.items():
+        path = prefix + (field.alias or name)
+        paths.add(path)
+        nested = _nested_model(field.annotation)
+        if nested is not None:
+            paths |= model_paths(nested, path + ".")
+    return frozenset(paths)
+
+
+# Valid field paths per fieldset name ("portfolio" and each section)
+FIELD_PATHS = {
+    PORTFOLIO: model_paths(Portfolio),
+    **{section.name: model_paths(section.model) for section in SECTIONS},
+}
+
+# Always projected: the portfolio's _id and version (for the ETag) and each item's _id
+REQUIRED_FIELDS = {PORTFOLIO: REF_FIELDS, **{section.name: ("_id",) for section in SECTIONS}}
+
+# Projected along with any path under a key: derived stats render from these
+DEPENDENT_FIELDS = {PORTFOLIO: {"stats": ("stats.source", "stats.format", "stats.step", "counters")}}
+
+
+def _minimal(paths):
+    """Drop paths covered by a shorter one ("stats" covers "stats.value"); MongoDB rejects the overlap"""
+    result = []
+    for path in sorted(set(paths), key=lambda path: (path.count("."), path)):
+        if not any(path == kept or path.startswith(kept + ".") for kept in result):
+            result.append(path)
+    return tuple(sorted(result))
+
+
+class Fieldset(NamedTuple):
+    sections: Tuple[str, ...]  # included sections, in response order
+    fields: Dict[str, Tuple[str, ...]]  # "portfolio" or section name -> projected paths; absent means all
+
+    def projection(self, name: str) -> Optional[Tuple[str, ...]]:
+        """Paths to fetch for the portfolio or a section, or None for whole documents"""
+        return self.fields.get(name)
+
+    @property
+    def key(self) -> str:
+        """Canonical form, the same for equivalent query strings"""
+        fields = ",".join(f"{name}.{path}" for name in sorted(self.fields) for path in self.fields[name])
+        return f"include={','.join(self.sections)}&fields={fields}"
+
+
+def _split(value: Optional[str]):
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def parse_fieldset(include: Optional[str], fields: Optional[str]) -> Optional[Fieldset]:
+    """Parse ?include= and ?fields=; None means the full portfolio. Raises InvalidFieldset."""
+    if not _split(include) and not _split(fields):
+        return None
+
+    names = _split(include)
+    unknown = [name for name in names if name != PORTFOLIO and name not in SECTIONS_BY_NAME]
+    if unknown:
+        raise InvalidFieldset(f"Unknown section in include: {', '.join(unknown)}")
+    if names:
+        sections = tuple(section.name for section in SECTIONS if section.name in names)
+    else:
+        sections = tuple(section.name for section in SECTIONS)
+
+    requested = {}
+    for entry in _split(fields):
+        name, _, path = entry.partition(".")
+        if name not in FIELD_PATHS or not path:
+            raise InvalidFieldset(f"Field must be <portfolio|section>.<path>: {entry}")
+        if path not in FIELD_PATHS[name]:
+            raise InvalidFieldset(f"Unknown field for {name}: {path}")
+        if name != PORTFOLIO and name not in sections:
+            raise InvalidFieldset(f"Field {entry} is for a section that is not included")
+        requested.setdefault(name, []).append(path)
+
+    projected = {}
+    for name, paths in requested.items():
+        dependencies = [
+            dependency
+            for root, dependent in DEPENDENT_FIELDS.get(name, {}).items()
+            if any(path == root or path.startswith(root + ".") for path in paths)
+            for dependency in dependent
+        ]
+        projected[name] = _minimal([*paths, *dependencies, *REQUIRED_FIELDS[name]])
+    return Fieldset(sections, projected)
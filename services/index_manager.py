@@ -0,0 +1,172 @@
+import logging
+from datetime import datetime
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from models.indexes import INDEXES, RETIRED_INDEXES
+from models.sections import SECTIONS
+from services.delta import TOMBSTONES_COLLECTION
+from services.invalidation import VERSIONS_COLLECTION, VERSIONS_PROJECTION
+from services.pagination import MULTI_PORTFOLIO_SORT, SECTION_SORT
+
+logger = logging.getLogger(__name__)
+
+
+def _key_list(keys):
+    return [(field, direction) for field, direction in keys]
+
+
+def _options(spec):
+    """Options compared between a spec and an existing index"""
+    return {"unique": spec.unique, "expireAfterSeconds": spec.expire_after}
+
+
+def _existing_options(info):
+    return {"unique": bool(info.get("unique")), "expireAfterSeconds": info.get("expireAfterSeconds")}
+
+
+async def ensure_indexes(db, specs=INDEXES, retired=RETIRED_INDEXES, dry_run: bool = False):
+    """Create every registry index that is missing and report drift.
+
+    Idempotent: an index with the same key pattern, uniqueness and TTL counts
+    as present whatever its name. Indexes with a registry name but different
+    options are reported as conflicts and left alone, as are indexes the
+    registry does not know about. Retired registry indexes are dropped.
+    """
+    report = {"created": [], "present": [], "missing": [], "conflicts": [], "unmanaged": [],
+              "retired": [], "dropped": [], "errors": []}
+    existing_by_collection = {}
+    for collection in sorted({spec.collection for spec in specs}):
+        existing_by_collection[collection] = await db[collection].index_information()
+
+    matched = set()
+    for spec in specs:
+        existing = existing_by_collection[spec.collection]
+        label = f"{spec.collection}.{spec.name}"
+        same_keys = [
+            name for name, info in existing.items()
+            if _key_list(info["key"]) == _key_list(spec.keys) and _existing_options(info) == _options(spec)
+        ]
+        if same_keys:
+            matched.update((spec.collection, name) for name in same_keys)
+            report["present"].append(label)
+            continue
+        if spec.name in existing:
+            matched.add((spec.collection, spec.name))
+            report["conflicts"].append({
+                "index": label,
+                "expected": {"key": _key_list(spec.keys), **_options(spec)},
+                "actual": {"key": _key_list(existing[spec.name]["key"]), **_existing_options(existing[spec.name])},
+            })
+            continue
+        if dry_run:
+            report["missing"].append(label)
+            continue
+        try:
+            options = {"expireAfterSeconds": spec.expire_after} if spec.expire_after is not None else {}
+            await db[spec.collection].create_index(_key_list(spec.keys), name=spec.name, unique=spec.unique, **options)
+            report["created"].append(label)
+        except OperationFailure as e:
+            report["errors"].append({"index": label, "error": str(e)})
+
+    # Retired indexes go last, once their replacements exist
+    for spec in retired:
+        existing = existing_by_collection.get(spec.collection, {})
+        info = existing.get(spec.name)
+        if info is None or _key_list(info["key"]) != _key_list(spec.keys):
+            continue
+        label = f"{spec.collection}.{spec.name}"
+        matched.add((spec.collection, spec.name))
+        if dry_run:
+            report["retired"].append(label)
+            continue
+        try:
+            await db[spec.collection].drop_index(spec.name)
+            report["dropped"].append(label)
+        except OperationFailure as e:
+            report["errors"].append({"index": label, "error": str(e)})
+
+    for collection, existing in existing_by_collection.items():
+        for name in existing:
+            if name != "_id_" and (collection, name) not in matched:
+                report["unmanaged"].append(f"{collection}.{name}")
+    return report
+
+
+def log_index_report(report):
+    for label in report["created"]:
+        logger.info(f"Created index {label}")
+    for label in report["missing"]:
+        logger.warning(f"Missing index {label}")
+    for conflict in report["conflicts"]:
+        logger.warning(f"Index drift on {conflict['index']}: expected {conflict['expected']}, found {conflict['actual']}")
+    for label in report["unmanaged"]:
+        logger.info(f"Unmanaged index {label}")
+    for label in report["retired"]:
+        logger.warning(f"Retired index {label} still present")
+    for label in report["dropped"]:
+        logger.info(f"Dropped retired index {label}")
+    for error in report["errors"]:
+        logger.error(f"Failed to update index {error['index']}: {error['error']}")
+
+
+def _plan_stages(plan):
+    """Flatten the stage names of an explain() plan tree"""
+    if not isinstance(plan, dict):
+        return []
+    stages = [plan["stage"]] if "stage" in plan else []
+    if "queryPlan" in plan:  # slot-based execution engine
+        stages += _plan_stages(plan["queryPlan"])
+    if "inputStage" in plan:
+        stages += _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+def _plan_indexes(plan):
+    if not isinstance(plan, dict):
+        return []
+    names = [plan["indexName"]] if "indexName" in plan else []
+    for key in ("queryPlan", "inputStage"):
+        names += _plan_indexes(plan.get(key))
+    for child in plan.get("inputStages", []):
+        names += _plan_indexes(child)
+    return names
+
+
+async def _check_query(name, cursor):
+    explained = await cursor.explain()
+    plan = explained.get("queryPlanner", {}).get("winningPlan", {})
+    stages = _plan_stages(plan)
+    return {
+        "query": name,
+        "stages": stages,
+        "indexes": _plan_indexes(plan),
+        # SORT_MERGE only merges index scans already in order (an $in); SORT is in memory
+        "ok": "IXSCAN" in stages and not any(stage.startswith("SORT") and stage != "SORT_MERGE" for stage in stages),
+    }
+
+
+async def explain_hot_queries(db, user_id: str = "__index_check__", portfolio_id: ObjectId = None):
+    """Explain the hot queries and confirm they are IXSCAN with no SORT stage"""
+    portfolio_id = portfolio_id or ObjectId()
+    checks = [
+        await _check_query("portfolios.find(userId)", db.portfolios.find({"userId": user_id})),
+        await _check_query("portfolios.find(userId $in)", db.portfolios.find({"userId": {"$in": [user_id, "__other__"]}})),
+    ]
+    for section in SECTIONS:
+        cursor = db[section.collection].find({"portfolioId": portfolio_id}).sort(SECTION_SORT)
+        checks.append(await _check_query(f"{section.collection}.find(portfolioId).sort(order, _id)", cursor))
+    for section in SECTIONS:
+        cursor = db[section.collection].find({"portfolioId": {"$in": [portfolio_id, ObjectId()]}}).sort(MULTI_PORTFOLIO_SORT)
+        checks.append(await _check_query(f"{section.collection}.find(portfolioId $in).sort(portfolioId, order, _id)", cursor))
+    cursor = db[VERSIONS_COLLECTION].find({"versionAt": {"$gte": datetime.utcnow()}}, VERSIONS_PROJECTION).sort("versionAt", 1)
+    checks.append(await _check_query(f"{VERSIONS_COLLECTION}.find(versionAt).sort(versionAt)", cursor))
+    now = datetime.utcnow()
+    for section in SECTIONS:
+        cursor = db[section.collection].find({"portfolioId": portfolio_id, "updatedAt": {"$gt": now}}).sort("updatedAt", 1)
+        checks.append(await _check_query(f"{section.collection}.find(portfolioId, updatedAt).sort(updatedAt)", cursor))
+    cursor = db[TOMBSTONES_COLLECTION].find({"portfolioId": portfolio_id, "deletedAt": {"$gt": now}}).sort("deletedAt", 1)
+    checks.append(await _check_query(f"{TOMBSTONES_COLLECTION}.find(portfolioId, deletedAt).sort(deletedAt)", cursor))
+    return checks
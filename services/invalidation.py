@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from models.sections import SECTIONS
+from services.metrics import CACHE_INVALIDATION_LAG
+from services.response_cache import FULL_PORTFOLIO
+from services.stats import LatencyWindow, register_stats
+import settings
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_MODES = ("off", "changestream", "poll")
+
+# Poll mode: one small document per portfolio, {_id: portfolioId, userId, version, versionAt}
+VERSIONS_COLLECTION = "portfolio_versions"
+VERSIONS_PROJECTION = {"_id": 0, "versionAt": 1, "userId": 1, "version": 1}
+
+# ChangeStreamHistoryLost: the resume token fell off the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+MAX_BACKOFF_SECONDS = 30.0
+
+# listener(user_id, version, sections): evict a user's in-process state.
+# version is None when the event does not carry one; sections is empty for
+# "everything"; user_id is None after a gap in the event stream (evict all in-process state).
+Listener = Callable[[Optional[str], Optional[int], tuple], None]
+
+
+def _remember(entries: OrderedDict, key, value, max_entries: int):
+    """Set an entry of a bounded map, dropping the least recently set ones past max_entries"""
+    entries[key] = value
+    entries.move_to_end(key)
+    while len(entries) > max_entries:
+        entries.popitem(last=False)
+
+
+def _age_seconds(moment: datetime) -> float:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (datetime.now(timezone.utc) - moment).total_seconds())
+
+
+class InvalidationBus:
+    """Evicts in-process state when another worker writes a portfolio.
+
+    Two modes:
+    - changestream: watches the portfolios and section collections (needs a
+      replica set). Portfolio events carry userId and version; section events
+      are attributed to a user through the portfolios seen so far, and the
+      version bump that follows every section write covers the rest.
+    - poll: every write also upserts {userId, version, versionAt} into
+      portfolio_versions, stamped with the server's clock; workers poll it
+      through a covered index, re-reading an overlap window so a write that
+      commits late is still seen.
+
+    Versions a worker already knows (including its own writes) are skipped,
+    so each remote write evicts once. Lag is measured from the write's
+    server-side time to the eviction. Both maps keep the max_tracked most
+    recently seen users: a forgotten version only means a repeated eviction,
+    and a forgotten portfolio's section events are covered by its next
+    version bump.
+    """
+
+    def __init__(self, db, mode: str, listener: Listener, poll_interval: float = 1.0, overlap: float = 5.0,
+                 max_tracked: int = 10000):
+        if mode not in ("changestream", "poll"):
+            raise ValueError(f"Unknown invalidation mode: {mode}")
+        self.db = db
+        self.mode = mode
+        self.listener = listener
+        self.poll_interval = poll_interval
+        self.overlap = timedelta(seconds=overlap)
+        self._sections = {section.collection: section.name for section in SECTIONS}
+        self.max_tracked = max_tracked
+        self._versions = OrderedDict()  # user_id -> highest version seen
+        self._users = OrderedDict()  # portfolio _id -> user_id
+        self._resume_token = None
+        self._since = None
+        self._task = None
+        self.lag = LatencyWindow()
+        self.delivered = 0
+        self.duplicates = 0
+        self.unattributed = 0
+        self.resets = 0
+        self.polls = 0
+        self.errors = 0
+        self.publish_errors = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self, user_id: str, portfolio_id: ObjectId, version: int):
+        """Record a committed local write; in poll mode, also make it visible to other workers.
+
+        Call after the version bump. A failure is logged, not raised: the
+        write itself has committed, and other workers still expire the data
+        after RESPONSE_CACHE_TTL.
+        """
+        _remember(self._versions, user_id, max(version, self._versions.get(user_id, -1)), self.max_tracked)
+        _remember(self._users, portfolio_id, user_id, self.max_tracked)
+        if self.mode != "poll":
+            return
+        try:
+            await self.db[VERSIONS_COLLECTION].update_one(
+                {"_id": portfolio_id},
+                {"$set": {"userId": user_id}, "$max": {"version": version}, "$currentDate": {"versionAt": True}},
+                upsert=True,
+            )
+        except Exception as e:
+            self.publish_errors += 1
+            logger.error(f"Error publishing version for {user_id}: {str(e)}")
+
+    def _deliver(self, user_id: Optional[str], version: Optional[int], sections: tuple, event_time: Optional[datetime]):
+        if user_id is not None and version is not None:
+            if self._versions.get(user_id, -1) >= version:
+                self.duplicates += 1
+                return
+            _remember(self._versions, user_id, version, self.max_tracked)
+        self.listener(user_id, version, sections)
+        self.delivered += 1
+        if event_time is not None:
+            lag = _age_seconds(event_time)
+            self.lag.record(lag)
+            CACHE_INVALIDATION_LAG.labels(self.mode).observe(lag)
+
+    def _reset(self):
+        """Events may have been missed: evict everything"""
+        self.resets += 1
+        self._versions.clear()
+        self.listener(None, None, ())
+
+    async def _run(self):
+        delay = 0.5
+        while True:
+            started = time.monotonic()
+            try:
+                if self.mode == "changestream":
+                    await self._watch()
+                else:
+                    await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                if time.monotonic() - started > MAX_BACKOFF_SECONDS:
+                    delay = 0.5
+                logger.error(f"Invalidation {self.mode} failed, retrying in {delay}s: {str(e)}")
+                if self.mode == "changestream" and (
+                    self._resume_token is None
+                    or isinstance(e, OperationFailure) and e.code == CHANGE_STREAM_HISTORY_LOST
+                ):
+                    # Without a usable resume token the new stream starts from now
+                    self._resume_token = None
+                    self._reset()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_BACKOFF_SECONDS)
+
+    async def _watch(self):
+        collections = ["portfolios", *self._sections]
+        pipeline = [
+            {"$match": {
+                "ns.coll": {"$in": collections},
+                "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+            }},
+            # Keep _id: it is the resume token
+            {"$project": {
+                "ns.coll": 1, "operationType": 1, "documentKey": 1, "clusterTime": 1, "wallTime": 1,
+                "fullDocument.userId": 1, "fullDocument.version": 1, "fullDocument.portfolioId": 1,
+            }},
+        ]
+        async with self.db.watch(pipeline, full_document="updateLookup", resume_after=self._resume_token) as stream:
+            # The token advances with every getMore, events or not (postBatchResumeToken), so a
+            # stream that fails before its first event, or after a quiet spell, still resumes
+            self._resume_token = stream.resume_token
+            while stream.alive:
+                change = await stream.try_next()
+                self._resume_token = stream.resume_token
+                if change is not None:
+                    self._apply_change(change)
+
+    def _apply_change(self, change):
+        document = change.get("fullDocument") or {}
+        event_time = change.get("wallTime") or change["clusterTime"].as_datetime()
+        collection = change["ns"]["coll"]
+        if collection == "portfolios":
+            portfolio_id = change["documentKey"]["_id"]
+            user_id = document.get("userId") or self._users.get(portfolio_id)
+            if user_id is None:
+                self.unattributed += 1
+                return
+            if change["operationType"] == "delete":
+                self._users.pop(portfolio_id, None)
+            else:
+                _remember(self._users, portfolio_id, user_id, self.max_tracked)
+            self._deliver(user_id, document.get("version"), (), event_time)
+            return
+        user_id = self._users.get(document.get("portfolioId"))
+        if user_id is None:
+            # Deletes carry only the item _id; the version bump that follows covers them
+            self.unattributed += 1
+            return
+        self._deliver(user_id, None, (FULL_PORTFOLIO, self._sections[collection]), event_time)
+
+    async def _poll(self):
+        collection = self.db[VERSIONS_COLLECTION]
+        if self._since is None:
+            # Start from the newest version: older writes predate this worker's caches
+            latest = await collection.find_one({}, VERSIONS_PROJECTION, sort=[("versionAt", -1)])
+            self._since = latest["versionAt"] if latest else None
+        while True:
+            query = {"versionAt": {"$gte": self._since - self.overlap}} if self._since else {}
+            async for document in collection.find(query, VERSIONS_PROJECTION).sort("versionAt", 1):
+                self._since = max(self._since, document["versionAt"]) if self._since else document["versionAt"]
+                self._deliver(document["userId"], document["version"], (), document["versionAt"])
+            self.polls += 1
+            await asyncio.sleep(self.poll_interval)
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "tracked_users": len(self._versions),
+            "tracked_portfolios": len(self._users),
+            "running": self._task is not None and not self._task.done(),
+            "delivered": self.delivered,
+            "duplicates": self.duplicates,
+            "unattributed": self.unattributed,
+            "resets": self.resets,
+            "polls": self.polls,
+            "errors": self.errors,
+            "publish_errors": self.publish_errors,
+            "lag": self.lag.summary(),
+        }
+
+
+def build_invalidation_bus(db, listener: Listener, mode: str = None) -> Optional[InvalidationBus]:
+    """The INVALIDATION_MODE bus for db, or None when it is off (or there is no MongoDB)"""
+    mode = mode or settings.INVALIDATION_MODE
+    if mode == "off":
+        return None
+    if db is None:
+        logger.warning(f"INVALIDATION_MODE={mode} needs the mongo storage backend; cross-worker invalidation is off")
+        return None
+    bus = InvalidationBus(
+        db, mode, listener, settings.INVALIDATION_POLL_INTERVAL, settings.INVALIDATION_POLL_OVERLAP,
+        settings.INVALIDATION_MAX_TRACKED,
+    )
+    register_stats("invalidation", bus.stats)
+    return bus
@@ -0,0 +1,186 @@
+import threading
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Requests that matched no route share one label value, so scanners and typos
+# cannot blow up the label cardinality
+UNMATCHED_ROUTE = "<unmatched>"
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status",
+    ["method", "route", "status"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being handled",
+    ["method"],
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency by command and collection",
+    ["command", "collection"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total",
+    "MongoDB commands that returned an error",
+    ["command", "collection"],
+)
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    "mongodb_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    ["address"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+MONGO_POOL_CHECKED_OUT = Gauge(
+    "mongodb_pool_checked_out_connections",
+    "Connections currently checked out of the pool",
+    ["address"],
+)
+MONGO_POOL_CHECKOUT_FAILURES = Counter(
+    "mongodb_pool_checkout_failures_total",
+    "Connection checkouts that failed (e.g. wait queue timeout)",
+    ["address", "reason"],
+)
+
+CACHE_INVALIDATION_LAG = Histogram(
+    "cache_invalidation_lag_seconds",
+    "Time from another worker's write to the local cache eviction",
+    ["mode"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+def render_metrics() -> bytes:
+    return generate_latest()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and in-flight requests.
+
+    The route label is the matched path template (e.g.
+    /api/portfolio/{user_id}), which the router stores in the scope.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                method, getattr(route, "path", UNMATCHED_ROUTE), str(status)
+            ).observe(time.perf_counter() - started)
+
+
+def _collection(event) -> str:
+    """Collection a command targets: the command's value (find: "experience"), or getMore's collection"""
+    target = event.command.get(event.command_name)
+    if event.command_name == "getMore":
+        target = event.command.get("collection")
+    return target if isinstance(target, str) else ""
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command by command name and collection"""
+
+    def __init__(self):
+        # started events carry the command, finished ones only its duration
+        self._collections = {}
+
+    def started(self, event):
+        self._collections[(event.request_id, event.connection_id)] = _collection(event)
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.request_id, event.connection_id), "")
+        MONGO_COMMAND_DURATION.labels(event.command_name, collection).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.request_id, event.connection_id), "")
+        MONGO_COMMAND_DURATION.labels(event.command_name, collection).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(event.command_name, collection).inc()
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Measures how long operations wait to check a connection out of the pool.
+
+    pymongo publishes check-out started and checked-out on the thread doing
+    the check-out, so the start time is kept thread-local.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @staticmethod
+    def _address(event):
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            MONGO_POOL_CHECKOUT_WAIT.labels(self._address(event)).observe(time.perf_counter() - started)
+            self._local.started = None
+        MONGO_POOL_CHECKED_OUT.labels(self._address(event)).inc()
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        MONGO_POOL_CHECKOUT_FAILURES.labels(self._address(event), str(event.reason)).inc()
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CHECKED_OUT.labels(self._address(event)).dec()
+
+    # Remaining pool events carry nothing we measure
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+
+def mongo_event_listeners():
+    """Listeners to pass as event_listeners= to AsyncIOMotorClient"""
+    return [CommandMetrics(), PoolMetrics()]
@@ -0,0 +1,43 @@
+import base64
+import json
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Sections are listed in (order, _id) order; _id breaks ties between equal orders
+SECTION_SORT = [("order", 1), ("_id", 1)]
+
+# Items of several portfolios read at once, grouped by portfolio
+MULTI_PORTFOLIO_SORT = [("portfolioId", 1), *SECTION_SORT]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(document) -> str:
+    """Opaque continuation token pointing just after the given document"""
+    raw = json.dumps([document.get("order", 0), str(document["_id"])], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str):
+    """Return the (order, _id) position encoded in a continuation token"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        order, object_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        position = order, ObjectId(object_id)
+    except (ValueError, TypeError, InvalidId) as e:
+        raise InvalidCursor(f"Invalid cursor: {token}") from e
+    # Both values end up in a query filter: anything else (e.g. {"$gt": 0}) is tampering
+    if not isinstance(order, int) or isinstance(order, bool) or not isinstance(object_id, str):
+        raise InvalidCursor(f"Invalid cursor: {token}")
+    return position
+
+
+def keyset_filter(portfolio_id: ObjectId, after=None):
+    """Filter for the items of a portfolio positioned after (order, _id)"""
+    query = {"portfolioId": portfolio_id}
+    if after is not None:
+        order, object_id = after
+        query["$or"] = [{"order": {"$gt": order}}, {"order": order, "_id": {"$gt": object_id}}]
+    return query
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+from pymongo.errors import OperationFailure
+
+from models.sections import SECTIONS, SECTIONS_BY_NAME
+from services.counters import render_stats
+from services.fieldsets import PORTFOLIO, Fieldset
+from services.pagination import SECTION_SORT
+from services.stats import LatencyWindow, register_stats
+from services.storage import REF_FIELDS
+import settings
+
+logger = logging.getLogger(__name__)
+
+FETCH_MODES = ("aggregate", "fanout", "sequential")
+
+# Latency per fetch mode, so the paths can be compared under real traffic
+fetch_latency = {mode: LatencyWindow(settings.LATENCY_WINDOW_SIZE) for mode in FETCH_MODES}
+
+# Latency of multi-portfolio fetches (fetch_portfolios)
+batch_latency = LatencyWindow(settings.LATENCY_WINDOW_SIZE)
+
+# Flipped to False the first time the server rejects the $lookup pipeline as unsupported
+_aggregate_supported = True
+_aggregate_fallbacks = 0
+
+# Server error codes meaning the pipeline itself is unsupported: an unrecognized
+# stage, an unknown operator, or $lookup with both localField and pipeline (before 5.0).
+# Any other failure (a stepdown, a timeout, a result over 16 MB) only falls back once.
+UNSUPPORTED_PIPELINE_CODES = frozenset({40324, 168, 51047})
+
+
+def _aggregate_failed(e: Exception):
+    """Fall back to fanout for this request, and for good if the server cannot run the pipeline"""
+    global _aggregate_supported, _aggregate_fallbacks
+
+    _aggregate_fallbacks += 1
+    if isinstance(e, NotImplementedError) or e.code in UNSUPPORTED_PIPELINE_CODES:
+        logger.warning(f"$lookup aggregation unsupported, using fanout from now on: {str(e)}")
+        _aggregate_supported = False
+    else:
+        logger.warning(f"$lookup aggregation failed, falling back to fanout for this request: {str(e)}")
+
+
+def _section_lookup(section, limit: int, as_field: str, fields=None):
+    """$lookup stage embedding a section's items sorted by (order, _id)"""
+    pipeline = [{"$sort": dict(SECTION_SORT)}]
+    if limit:
+        pipeline.append({"$limit": limit})
+    if fields:
+        pipeline.append({"$project": {field: 1 for field in fields}})
+    return {
+        "$lookup": {
+            "from": section.collection,
+            "localField": "_id",
+            "foreignField": "portfolioId",
+            "pipeline": pipeline,
+            "as": as_field,
+        }
+    }
+
+
+def _included(fieldset: Optional[Fieldset]):
+    """Sections to fetch: all of them, or those the fieldset includes"""
+    return SECTIONS if fieldset is None else [SECTIONS_BY_NAME[name] for name in fieldset.sections]
+
+
+def _fields(fieldset: Optional[Fieldset], name: str):
+    return fieldset.projection(name) if fieldset is not None else None
+
+
+def build_portfolio_pipeline(user_id: str, limit: int, fieldset: Fieldset = None):
+    """Aggregation pipeline returning a portfolio with its sections (all, or the fieldset's) embedded"""
+    pipeline = [{"$match": {"userId": user_id}}, {"$limit": 1}]
+    fields = _fields(fieldset, PORTFOLIO)
+    if fields:
+        pipeline.append({"$project": {field: 1 for field in fields}})
+    for section in _included(fieldset):
+        pipeline.append(_section_lookup(section, limit, section.name, _fields(fieldset, section.name)))
+    return pipeline
+
+
+def build_section_pipeline(user_id: str, section, limit: int):
+    """Aggregation pipeline returning a portfolio's _id/version with one section embedded"""
+    return [
+        {"$match": {"userId": user_id}},
+        {"$limit": 1},
+        {"$project": {"_id": 1, "version": 1}},
+        _section_lookup(section, limit, "items"),
+    ]
+
+
+def _split_sections(document, fieldset: Fieldset = None):
+    """Pull embedded section arrays out of an aggregated portfolio document"""
+    result = {section.name: document.pop(section.name, []) for section in _included(fieldset)}
+    return {"portfolio": document, **result}
+
+
+async def fetch_portfolio_aggregate(db, user_id: str, limit: int, fieldset: Fieldset = None):
+    """Fetch the portfolio in a single aggregation round trip (MongoDB only)"""
+    documents = await db.portfolios.aggregate(build_portfolio_pipeline(user_id, limit, fieldset)).to_list(1)
+    if not documents:
+        return None
+    return _split_sections(documents[0], fieldset)
+
+
+async def fetch_portfolio_fanout(storage, user_id: str, limit: int, fieldset: Fieldset = None):
+    """Fetch the portfolio, then its sections concurrently"""
+    portfolio = await storage.portfolios.find_by_user(user_id, _fields(fieldset, PORTFOLIO))
+    if not portfolio:
+        return None
+    sections = _included(fieldset)
+    lists = await asyncio.gather(*[
+        storage.sections[section.name].list(portfolio["_id"], limit, _fields(fieldset, section.name))
+        for section in sections
+    ])
+    return {"portfolio": portfolio, **{section.name: items for section, items in zip(sections, lists)}}
+
+
+async def fetch_portfolio_sequential(storage, user_id: str, limit: int, fieldset: Fieldset = None):
+    """Fetch the portfolio and each section one query at a time"""
+    portfolio = await storage.portfolios.find_by_user(user_id, _fields(fieldset, PORTFOLIO))
+    if not portfolio:
+        return None
+    result = {"portfolio": portfolio}
+    for section in _included(fieldset):
+        result[section.name] = await storage.sections[section.name].list(
+            portfolio["_id"], limit, _fields(fieldset, section.name)
+        )
+    return result
+
+
+async def fetch_portfolio(storage, user_id: str, mode: str = None, limit: int = None, fieldset: Fieldset = None):
+    """Fetch a portfolio and its sections using the configured fetch mode.
+
+    Returns a dict keyed by "portfolio" and section name, or None when the
+    user has no portfolio. With a fieldset (services/fieldsets.py) only its
+    sections are queried, each projected to its fields. Backends other than
+    MongoDB use fanout in place of aggregate. Derived stats are rendered from
+    the portfolio's counters (services/counters.py).
+    """
+    mode = mode or settings.PORTFOLIO_FETCH_MODE
+    limit = limit or settings.PORTFOLIO_SECTION_LIMIT
+    if mode not in FETCH_MODES:
+        raise ValueError(f"Unknown portfolio fetch mode: {mode}")
+    if mode == "aggregate" and (storage.db is None or not _aggregate_supported):
+        mode = "fanout"
+
+    started = time.perf_counter()
+    if mode == "aggregate":
+        try:
+            result = await fetch_portfolio_aggregate(storage.db, user_id, limit, fieldset)
+        except (OperationFailure, NotImplementedError) as e:
+            _aggregate_failed(e)
+            mode = "fanout"
+            started = time.perf_counter()
+            result = await fetch_portfolio_fanout(storage, user_id, limit, fieldset)
+    elif mode == "fanout":
+        result = await fetch_portfolio_fanout(storage, user_id, limit, fieldset)
+    else:
+        result = await fetch_portfolio_sequential(storage, user_id, limit, fieldset)
+
+    fetch_latency[mode].record(time.perf_counter() - started)
+    if result is not None:
+        render_stats(result["portfolio"])
+    return result
+
+
+async def fetch_portfolios(storage, user_ids, limit: int = None, fieldset: Fieldset = None):
+    """Fetch several portfolios and their sections in a constant number of queries.
+
+    One query finds every user's portfolio (userId $in), then one query per
+    included section reads all of their items (portfolioId $in), concurrently;
+    items are grouped in memory, at most `limit` per portfolio and section.
+    Returns {user_id: {"portfolio": ..., section: [...]}} for the users that
+    have a portfolio.
+    """
+    limit = limit or settings.PORTFOLIO_SECTION_LIMIT
+    started = time.perf_counter()
+    portfolios = await storage.portfolios.find_by_users(user_ids, _fields(fieldset, PORTFOLIO))
+    portfolio_ids = [portfolio["_id"] for portfolio in portfolios]
+    sections = _included(fieldset)
+    groups = await asyncio.gather(*[
+        storage.sections[section.name].list_many(portfolio_ids, limit, _fields(fieldset, section.name))
+        for section in sections
+    ]) if portfolio_ids else []
+    results = {
+        portfolio["userId"]: {
+            "portfolio": render_stats(portfolio),
+            **{section.name: items[portfolio["_id"]] for section, items in zip(sections, groups)},
+        }
+        for portfolio in portfolios
+    }
+    batch_latency.record(time.perf_counter() - started)
+    return results
+
+
+async def fetch_section(storage, user_id: str, section_name: str, mode: str = None, limit: int = None):
+    """Fetch one section together with its portfolio's _id and version.
+
+    Returns (portfolio, items), where portfolio only holds _id and version,
+    or None when the user has no portfolio. In aggregate mode this is a
+    single round trip. Without a limit every item is returned.
+    """
+    section = SECTIONS_BY_NAME[section_name]
+    mode = mode or settings.PORTFOLIO_FETCH_MODE
+    if mode == "aggregate" and storage.db is not None and _aggregate_supported:
+        try:
+            documents = await storage.db.portfolios.aggregate(build_section_pipeline(user_id, section, limit)).to_list(1)
+            if not documents:
+                return None
+            portfolio = documents[0]
+            return portfolio, portfolio.pop("items")
+        except (OperationFailure, NotImplementedError) as e:
+            _aggregate_failed(e)
+
+    portfolio = await storage.portfolios.find_by_user(user_id, REF_FIELDS)
+    if not portfolio:
+        return None
+    items = await storage.sections[section_name].list(portfolio["_id"], limit)
+    return portfolio, items
+
+
+register_stats("portfolio_fetch", lambda: {
+    "configured_mode": settings.PORTFOLIO_FETCH_MODE,
+    "aggregate_supported": _aggregate_supported,
+    "aggregate_fallbacks": _aggregate_fallbacks,
+    "latency": {mode: window.summary() for mode, window in fetch_latency.items()},
+    "batch_latency": batch_latency.summary(),
+})
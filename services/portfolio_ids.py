@@ -0,0 +1,93 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+from bson import ObjectId
+
+from services.stats import register_stats
+import settings
+
+
+class PortfolioIdResolver:
+    """In-process userId -> portfolio _id mapping with negative caching.
+
+    The mapping never changes once a portfolio exists, so positive entries
+    live long. Unknown users are cached briefly so a burst of requests for a
+    missing portfolio costs one query; create_portfolio forgets them.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, negative_ttl_seconds: float, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.lookups = 0
+        self.evictions = 0
+
+    def _store(self, user_id: str, portfolio_id: Optional[ObjectId]):
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl_seconds if portfolio_id is not None else self.negative_ttl_seconds
+        if ttl <= 0:
+            return
+        self._entries[user_id] = (self.clock() + ttl, portfolio_id)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def cached(self, user_id: str):
+        """Return (found, portfolio_id) from the cache without querying"""
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] <= self.clock():
+            self._entries.pop(user_id, None)
+            return False, None
+        self._entries.move_to_end(user_id)
+        return True, entry[1]
+
+    async def resolve(self, portfolios, user_id: str) -> Optional[ObjectId]:
+        """Return the portfolio _id for a user, or None if there is no portfolio"""
+        found, portfolio_id = self.cached(user_id)
+        if found:
+            if portfolio_id is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return portfolio_id
+        self.misses += 1
+        self.lookups += 1
+        document = await portfolios.find_by_user(user_id, ("_id",))
+        portfolio_id = document["_id"] if document else None
+        self._store(user_id, portfolio_id)
+        return portfolio_id
+
+    def prime(self, user_id: str, portfolio_id: ObjectId):
+        """Record a mapping learned from another query"""
+        self._store(user_id, portfolio_id)
+
+    def forget(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def stats(self):
+        requests = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.negative_hits) / requests, 4) if requests else None,
+            "lookups": self.lookups,
+            "evictions": self.evictions,
+        }
+
+
+portfolio_ids = PortfolioIdResolver(
+    settings.PORTFOLIO_ID_CACHE_MAX_ENTRIES,
+    settings.PORTFOLIO_ID_CACHE_TTL,
+    settings.PORTFOLIO_ID_NEGATIVE_TTL,
+)
+register_stats("portfolio_ids", portfolio_ids.stats)
@@ -0,0 +1,160 @@
+from typing import List, Sequence
+from bson import ObjectId
+from datetime import datetime
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from models.portfolio import Portfolio, PortfolioCreate, PortfolioUpdate
+from models.sections import Section, SECTIONS
+from services.pagination import MULTI_PORTFOLIO_SORT, SECTION_SORT, encode_cursor, keyset_filter
+from services.storage import (
+    PortfolioStore, SectionStore, group_by_portfolio, insert_results, reorder_positions, reorder_results,
+    update_fields,
+)
+
+# MongoDB (Motor) implementation of the stores in services/storage.py
+
+
+class PortfolioRepository(PortfolioStore):
+    """Data access for the portfolios collection"""
+
+    def __init__(self, db):
+        self.collection = db.portfolios
+
+    async def find_by_user(self, user_id: str, fields: Sequence[str] = None):
+        projection = {field: 1 for field in fields} if fields else None
+        return await self.collection.find_one({"userId": user_id}, projection)
+
+    async def find_by_users(self, user_ids: Sequence[str], fields: Sequence[str] = None):
+        projection = {field: 1 for field in (*fields, "userId")} if fields else None
+        return await self.collection.find({"userId": {"$in": list(user_ids)}}, projection).to_list(None)
+
+    async def insert(self, portfolio_data: PortfolioCreate) -> Portfolio:
+        portfolio = Portfolio(**portfolio_data.dict())
+        await self.collection.insert_one(portfolio.dict(by_alias=True))
+        return portfolio
+
+    async def update(self, user_id: str, update_data: PortfolioUpdate):
+        """Apply a partial update and bump the version; returns the new document or None"""
+        return await self.collection.find_one_and_update(
+            {"userId": user_id},
+            {"$set": update_fields(update_data), "$inc": {"version": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def bump_version(self, portfolio_id: ObjectId, counters=None) -> int:
+        update = {"$inc": {"version": 1, **{f"counters.{name}": delta for name, delta in (counters or {}).items()}}}
+        if counters:
+            update["$set"] = {"updatedAt": datetime.utcnow()}
+        document = await self.collection.find_one_and_update(
+            {"_id": portfolio_id},
+            update,
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        return document["version"] if document else 0
+
+    async def set_counters(self, portfolio_id: ObjectId, counters):
+        document = await self.collection.find_one_and_update(
+            {"_id": portfolio_id},
+            {"$set": {"counters": counters, "updatedAt": datetime.utcnow()}, "$inc": {"version": 1}},
+            projection={"counters": 1, "version": 1},
+        )
+        return (document.get("counters", {}), document.get("version", 0) + 1) if document else None
+
+    async def owners(self):
+        async for document in self.collection.find({}, {"userId": 1}):
+            yield document["userId"], document["_id"]
+
+
+class SectionRepository(SectionStore):
+    """Data access for one portfolio section collection (experience, projects, ...)"""
+
+    def __init__(self, db, section: Section):
+        super().__init__(section)
+        self.collection = db[section.collection]
+
+    async def list(self, portfolio_id: ObjectId, limit: int = None, fields: Sequence[str] = None):
+        projection = {field: 1 for field in fields} if fields else None
+        cursor = self.collection.find({"portfolioId": portfolio_id}, projection).sort(SECTION_SORT)
+        # limit() lets the server stop early; to_list(limit) alone only truncates client-side
+        return await (cursor.limit(limit) if limit else cursor).to_list(limit)
+
+    async def list_many(self, portfolio_ids: Sequence[ObjectId], limit: int = None, fields: Sequence[str] = None):
+        """One $in query walking (portfolioId, order, _id); `limit` is applied per portfolio while grouping"""
+        projection = {field: 1 for field in (*fields, "portfolioId")} if fields else None
+        cursor = self.collection.find({"portfolioId": {"$in": list(portfolio_ids)}}, projection).sort(MULTI_PORTFOLIO_SORT)
+        return group_by_portfolio(await cursor.to_list(None), portfolio_ids, limit, fields)
+
+    async def page(self, portfolio_id: ObjectId, limit: int, after=None):
+        """One keyset page: (items, next cursor or None)"""
+        cursor = self.collection.find(keyset_filter(portfolio_id, after)).sort(SECTION_SORT).limit(limit + 1)
+        items = await cursor.to_list(limit + 1)
+        if len(items) > limit:
+            return items[:limit], encode_cursor(items[limit - 1])
+        return items, None
+
+    def iterate(self, portfolio_id: ObjectId, after=None, limit: int = None, batch_size: int = 100):
+        """Motor cursor over a portfolio's items in (order, _id) order"""
+        cursor = self.collection.find(keyset_filter(portfolio_id, after)).sort(SECTION_SORT).batch_size(batch_size)
+        return cursor.limit(limit) if limit else cursor
+
+    async def get(self, portfolio_id: ObjectId, item_id: ObjectId, fields: Sequence[str] = None):
+        projection = {field: 1 for field in fields} if fields else None
+        return await self.collection.find_one({"_id": item_id, "portfolioId": portfolio_id}, projection)
+
+    async def insert(self, portfolio_id: ObjectId, item_data):
+        """Insert a validated item and return the model that was written"""
+        item = self.section.model(portfolioId=portfolio_id, **item_data.dict())
+        await self.collection.insert_one(item.dict(by_alias=True))
+        return item
+
+    async def insert_many(self, portfolio_id: ObjectId, items_data: list, ordered: bool = True):
+        """Insert a batch with one insert_many and return a result per item.
+
+        With ordered=True the server stops at the first failure, so every
+        later item is reported as skipped; with ordered=False every item is
+        attempted.
+        """
+        items = [self.section.model(portfolioId=portfolio_id, **item_data.dict()) for item_data in items_data]
+        errors = {}
+        if items:
+            try:
+                await self.collection.insert_many([item.dict(by_alias=True) for item in items], ordered=ordered)
+            except BulkWriteError as e:
+                errors = {error["index"]: error.get("errmsg", "write error") for error in e.details.get("writeErrors", [])}
+        return insert_results(items, errors, ordered)
+
+    async def reorder(self, portfolio_id: ObjectId, item_ids: List[str]):
+        """Set order = position (from 1) for each id with one bulk_write and return a result per id"""
+        now = datetime.utcnow()
+        valid = reorder_positions(item_ids)
+        operations = [
+            UpdateOne({"_id": object_id, "portfolioId": portfolio_id}, {"$set": {"order": order, "updatedAt": now}})
+            for order, object_id in valid
+        ]
+        found = {object_id for _, object_id in valid}
+        if operations:
+            result = await self.collection.bulk_write(operations, ordered=False)
+            if result.matched_count != len(operations):
+                # Only on a partial match: find out which ids were missing
+                found = set(await self.collection.distinct(
+                    "_id", {"_id": {"$in": list(found)}, "portfolioId": portfolio_id}
+                ))
+        return reorder_results(item_ids, found)
+
+    async def update(self, portfolio_id: ObjectId, item_id: ObjectId, update_data):
+        """Apply a partial update; returns the updated document or None if not found"""
+        return await self.collection.find_one_and_update(
+            {"_id": item_id, "portfolioId": portfolio_id},
+            {"$set": update_fields(update_data)},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def delete(self, portfolio_id: ObjectId, item_id: ObjectId) -> bool:
+        result = await self.collection.delete_one({"_id": item_id, "portfolioId": portfolio_id})
+        return result.deleted_count > 0
+
+
+def build_section_repositories(db):
+    return {section.name: SectionRepository(db, section) for section in SECTIONS}
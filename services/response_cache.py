@@ -0,0 +1,130 @@
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from services.stats import register_stats
+import settings
+
+# Cache section name for the full GET /api/portfolio/{user_id} response
+FULL_PORTFOLIO = "portfolio"
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    # Compressed bodies by content-coding, filled on demand by services/compression.py
+    encodings: Optional[dict] = None
+
+
+class ResponseCache:
+    """Bounded TTL + LRU cache of serialized responses keyed by (user_id, section, variant).
+
+    The variant distinguishes representations of the same section (e.g. a
+    page of a paginated list); invalidating a section drops all of them.
+
+    Every invalidation bumps a per-user generation. A reader captures the
+    generation before querying MongoDB and passes it back to set(), which
+    drops the response if a write landed in between, so a slow read can never
+    re-populate the cache with data older than the last write.
+
+    Generations come from one increasing counter and are kept for the
+    max_entries most recently invalidated users. Users without one share a
+    base generation, raised past every generation that is dropped (and by
+    clear()), so a user never goes back to a generation a reader may hold.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._generations = OrderedDict()
+        self._last_generation = 0  # the last generation handed out
+        self._base_generation = 0  # the generation of users without an entry
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_writes = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def generation(self, user_id: str) -> int:
+        return self._generations.get(user_id, self._base_generation)
+
+    def get(self, user_id: str, section: str, variant: str = "") -> Optional[CachedResponse]:
+        key = (user_id, section, variant)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, response = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return response
+
+    def set(self, user_id: str, section: str, response: CachedResponse, generation: int = None, variant: str = ""):
+        if not self.enabled:
+            return
+        if generation is not None and generation != self.generation(user_id):
+            self.stale_writes += 1
+            return
+        key = (user_id, section, variant)
+        self._entries[key] = (self.clock() + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str, *sections: str):
+        """Drop the given sections for a user, or every section if none are given"""
+        self._last_generation += 1
+        self._generations[user_id] = self._last_generation
+        self._generations.move_to_end(user_id)
+        while len(self._generations) > self.max_entries:
+            self._generations.popitem(last=False)
+            self._base_generation = self._last_generation
+        keys = [key for key in self._entries if key[0] == user_id and (not sections or key[1] in sections)]
+        for key in keys:
+            del self._entries[key]
+            self.invalidations += 1
+
+    def clear(self):
+        """Drop every response; reads already in flight will not cache theirs"""
+        self._entries.clear()
+        self._generations.clear()
+        self._last_generation += 1
+        self._base_generation = self._last_generation
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "generations": len(self._generations),
+            "ttl_seconds": self.ttl_seconds,
+            "bytes": sum(
+                len(response.body) + sum(len(body) for body, _ in (response.encodings or {}).values())
+                for _, response in self._entries.values()
+            ),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "stale_writes": self.stale_writes,
+        }
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_TTL)
+register_stats("response_cache", response_cache.stats)
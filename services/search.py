@@ -0,0 +1,308 @@
+import bisect
+import heapq
+import math
+import re
+import sys
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Sequence
+from pydantic import BaseModel
+
+from services.stats import LatencyWindow, register_stats
+import settings
+
+# Searchable fields per section with their BM25 weights: a term in a project
+# title counts as two occurrences, one in its description as one
+SEARCH_FIELDS = {
+    "projects": {"title": 2.0, "tech": 1.5, "description": 1.0},
+    "experience": {"role": 2.0, "company": 1.5, "skills": 1.5, "highlights": 1.0},
+    "skills": {"category": 2.0, "skills": 1.5},
+}
+
+# Words, keeping the + and # of C++ and C#
+TOKEN_PATTERN = re.compile(r"\w[\w+#]*")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Query terms also match longer terms they are a prefix of ("waz" -> "wazuh"),
+# scored lower than an exact match and capped at the most common expansions
+MIN_PREFIX_LENGTH = 2
+PREFIX_WEIGHT = 0.8
+MAX_PREFIX_EXPANSIONS = 50
+
+
+class InvalidSearch(ValueError):
+    pass
+
+
+def tokenize(text: str):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _texts(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for element in value:
+            if isinstance(element, str):
+                yield element
+
+
+def weighted_terms(section: str, document: dict) -> Counter:
+    """Weighted term frequencies of an item's searchable fields"""
+    terms = Counter()
+    for field, weight in SEARCH_FIELDS[section].items():
+        for text in _texts(document.get(field)):
+            for token in tokenize(text):
+                terms[token] += weight
+    return terms
+
+
+def deep_size(value, seen=None) -> int:
+    """Approximate memory held by a structure of dicts, lists and scalars (shared objects counted once)"""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(key, seen) + deep_size(element, seen) for key, element in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(deep_size(element, seen) for element in value)
+    return size
+
+
+def parse_sections(value: Optional[str]):
+    """Sections to search from ?sections=, or None for all of them"""
+    names = [name.strip() for name in (value or "").split(",") if name.strip()]
+    unknown = [name for name in names if name not in SEARCH_FIELDS]
+    if unknown:
+        raise InvalidSearch(f"Unknown search section: {', '.join(unknown)} (expected {', '.join(SEARCH_FIELDS)})")
+    return frozenset(names) or None
+
+
+class PortfolioIndex:
+    """Inverted index over one portfolio's searchable items.
+
+    Items are keyed by (section, item id). Postings hold weighted term
+    frequencies; the vocabulary is also kept sorted for prefix lookups. The
+    stored items are returned as results, and re-tokenized to remove them.
+    """
+
+    def __init__(self, portfolio_id):
+        self.portfolio_id = portfolio_id
+        self.documents = {}  # key -> item
+        self.lengths = {}  # key -> weighted term count
+        self.postings = {}  # term -> {key: weighted frequency}
+        self.terms = []  # sorted vocabulary
+        self.total_length = 0.0
+
+    def add(self, section: str, document: dict):
+        """Index an item, replacing any earlier version of it"""
+        key = (section, str(document["_id"]))
+        self.remove(section, key[1])
+        terms = weighted_terms(section, document)
+        for term, frequency in terms.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                bisect.insort(self.terms, term)
+            postings[key] = frequency
+        self.documents[key] = document
+        self.lengths[key] = length = sum(terms.values())
+        self.total_length += length
+
+    def remove(self, section: str, item_id) -> bool:
+        key = (section, str(item_id))
+        document = self.documents.pop(key, None)
+        if document is None:
+            return False
+        for term in weighted_terms(section, document):
+            postings = self.postings[term]
+            del postings[key]
+            if not postings:
+                del self.postings[term]
+                del self.terms[bisect.bisect_left(self.terms, term)]
+        self.total_length -= self.lengths.pop(key)
+        return True
+
+    def reorder(self, section: str, positions):
+        """Update stored items' order after a reorder ({_id, order} pairs)"""
+        for position in positions:
+            document = self.documents.get((section, str(position["_id"])))
+            if document is not None:
+                document["order"] = position["order"]
+
+    def _expand(self, token: str):
+        """(term, weight) pairs a query token matches: itself, then terms it prefixes"""
+        if token in self.postings:
+            yield token, 1.0
+        if len(token) < MIN_PREFIX_LENGTH:
+            return
+        start = bisect.bisect_left(self.terms, token)
+        expansions = []
+        for term in self.terms[start:]:
+            if not term.startswith(token):
+                break
+            if term != token:
+                expansions.append(term)
+        if len(expansions) > MAX_PREFIX_EXPANSIONS:
+            expansions = heapq.nlargest(MAX_PREFIX_EXPANSIONS, expansions, key=lambda term: len(self.postings[term]))
+        for term in expansions:
+            yield term, PREFIX_WEIGHT
+
+    def search(self, query: str, sections=None, limit: int = 20):
+        """BM25-ranked (key, score) pairs matching any query term, and the number of matches"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not self.documents:
+            return [], 0
+        count = len(self.documents)
+        lengths = self.lengths
+        # BM25 length normalization k1 * (1 - b + b * length / average), split into two constants
+        base = BM25_K1 * (1 - BM25_B)
+        per_length = BM25_K1 * BM25_B / (self.total_length / count or 1.0)
+        scores = {}
+        for token in tokens:
+            # A token scores its best-matching term, so many expansions do not add up
+            token_scores = {}
+            for term, weight in self._expand(token):
+                postings = self.postings[term]
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                boost = weight * idf * (BM25_K1 + 1)
+                for key, frequency in postings.items():
+                    if sections is not None and key[0] not in sections:
+                        continue
+                    score = boost * frequency / (frequency + base + per_length * lengths[key])
+                    if score > token_scores.get(key, 0.0):
+                        token_scores[key] = score
+            for key, score in token_scores.items():
+                scores[key] = scores.get(key, 0.0) + score
+        ranked = heapq.nlargest(limit, scores.items(), key=lambda entry: (entry[1], entry[0]))
+        return ranked, len(scores)
+
+
+class SearchIndex:
+    """Per-portfolio search indexes, LRU-bounded.
+
+    An index is built from storage on a portfolio's first query and then kept
+    current by apply(), which the write handlers call with their committed
+    changes (services/events.change). Like the response cache, every change
+    bumps a per-user generation, and a build that overlapped a write answers
+    its query but is not kept. Generations are LRU-bounded like the indexes:
+    forgetting one raises the base generation of every forgotten user, so an
+    overlapping build is still recognised.
+    """
+
+    def __init__(self, max_portfolios: int, latency_window: int = 1000):
+        self.max_portfolios = max_portfolios
+        self._indexes = OrderedDict()  # user_id -> PortfolioIndex
+        self._generations = OrderedDict()
+        self._last_generation = 0  # the last generation handed out
+        self._base_generation = 0  # the generation of users without an entry
+        self.query_latency = LatencyWindow(latency_window)
+        self.build_latency = LatencyWindow(latency_window)
+        self.stale_builds = 0
+        self.updates = 0
+
+    def generation(self, user_id: str) -> int:
+        return self._generations.get(user_id, self._base_generation)
+
+    def _bump(self, user_id: str):
+        self._last_generation += 1
+        self._generations[user_id] = self._last_generation
+        self._generations.move_to_end(user_id)
+        while len(self._generations) > self.max_portfolios:
+            self._generations.popitem(last=False)
+            self._base_generation = self._last_generation
+
+    async def _build(self, storage, user_id: str, portfolio_id) -> PortfolioIndex:
+        generation = self.generation(user_id)
+        started = time.perf_counter()
+        index = PortfolioIndex(portfolio_id)
+        for section in SEARCH_FIELDS:
+            for document in await storage.sections[section].list(portfolio_id):
+                index.add(section, document)
+        self.build_latency.record(time.perf_counter() - started)
+        if generation != self.generation(user_id):
+            self.stale_builds += 1
+            return index
+        if self.max_portfolios > 0:
+            self._indexes[user_id] = index
+            while len(self._indexes) > self.max_portfolios:
+                self._indexes.popitem(last=False)
+        return index
+
+    async def search(
+        self, storage, user_id: str, portfolio_id, query: str, sections: Optional[frozenset] = None, limit: int = 20
+    ):
+        """Ranked matches for a query: {"total": n, "results": [{section, score, item}]}"""
+        index = self._indexes.get(user_id)
+        if index is None or index.portfolio_id != portfolio_id:
+            index = await self._build(storage, user_id, portfolio_id)
+        else:
+            self._indexes.move_to_end(user_id)
+        started = time.perf_counter()
+        ranked, total = index.search(query, sections, limit)
+        self.query_latency.record(time.perf_counter() - started)
+        return {
+            "total": total,
+            "results": [
+                {"section": section, "score": round(score, 4), "item": index.documents[(section, item_id)]}
+                for (section, item_id), score in ranked
+            ],
+        }
+
+    def apply(self, user_id: str, changes: Sequence[dict]):
+        """Fold committed section changes into the user's index, if one is built"""
+        self._bump(user_id)
+        index = self._indexes.get(user_id)
+        if index is None:
+            return
+        for patch in changes:
+            section = patch["section"]
+            if section not in SEARCH_FIELDS:
+                continue
+            if patch["op"] == "delete":
+                index.remove(section, patch["id"])
+            elif patch["op"] == "reorder":
+                index.reorder(section, patch["document"])
+            else:
+                document = patch["document"]
+                if isinstance(document, BaseModel):
+                    document = document.dict(by_alias=True)
+                index.add(section, document)
+            self.updates += 1
+
+    def discard(self, user_id: str):
+        """Drop a user's index; the next query rebuilds it"""
+        self._bump(user_id)
+        self._indexes.pop(user_id, None)
+
+    def clear(self):
+        self._indexes.clear()
+        self._generations.clear()
+        self._last_generation += 1
+        self._base_generation = self._last_generation
+
+    def memory_bytes(self) -> int:
+        seen = set()
+        return sum(deep_size(vars(index), seen) for index in self._indexes.values())
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "portfolios": len(self._indexes),
+            "max_portfolios": self.max_portfolios,
+            "generations": len(self._generations),
+            "documents": sum(len(index.documents) for index in self._indexes.values()),
+            "terms": sum(len(index.terms) for index in self._indexes.values()),
+            "memory_bytes": self.memory_bytes(),
+            "updates": self.updates,
+            "stale_builds": self.stale_builds,
+            "query_latency": self.query_latency.summary(),
+            "build_latency": self.build_latency.summary(),
+        }
+
+
+search_index = SearchIndex(settings.SEARCH_MAX_PORTFOLIOS, settings.LATENCY_WINDOW_SIZE)
+register_stats("search", search_index.stats)
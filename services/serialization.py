@@ -0,0 +1,59 @@
+import json
+from datetime import date, datetime
+from bson import ObjectId
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _dump_model(model: BaseModel):
+    return model.model_dump(by_alias=True)
+
+
+# Encoders for the non-JSON types found in Mongo documents and our models.
+# Subclasses (e.g. PyObjectId) are resolved through the MRO once and then
+# cached here, so every later lookup is a single dict hit.
+_ENCODERS = {
+    ObjectId: str,
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    BaseModel: _dump_model,
+}
+
+
+def _default(obj):
+    encoder = _ENCODERS.get(type(obj))
+    if encoder is None:
+        for base in type(obj).__mro__[1:]:
+            encoder = _ENCODERS.get(base)
+            if encoder is not None:
+                _ENCODERS[type(obj)] = encoder
+                break
+        else:
+            raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return encoder(obj)
+
+
+_json_encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def dumps_bytes(data) -> bytes:
+    """Encode Mongo documents (ObjectId, datetime, models) straight to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return _json_encoder.encode(data).encode("utf-8")
+
+
+class MongoJSONResponse(Response):
+    """JSON response that encodes Mongo documents in a single pass"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps_bytes(content)
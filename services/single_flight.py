@@ -0,0 +1,92 @@
+import asyncio
+import functools
+import time
+from typing import Awaitable, Callable, Dict, Hashable
+
+from services.stats import register_stats
+import settings
+
+
+class SingleFlightTimeout(Exception):
+    pass
+
+
+class _Flight:
+    __slots__ = ("task", "deadline", "waiters")
+
+    def __init__(self, task: asyncio.Task, deadline: float):
+        self.task = task
+        self.deadline = deadline
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent identical reads into one.
+
+    The first caller for a key starts fn() as a task; callers arriving while it
+    runs await the same task and get the same result, or the same exception.
+    The task is shielded, so a caller that disconnects does not cancel it for
+    the others. The timeout belongs to the flight: every waiter gives up at the
+    deadline set when it started, and the task is then cancelled and forgotten
+    so the next caller starts afresh. Keys should change whenever a write must
+    be visible (e.g. carry the response cache generation), so a read never
+    joins a fetch that started before the write.
+    """
+
+    def __init__(self, timeout: float, clock=time.monotonic):
+        self.timeout = timeout
+        self.clock = clock
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.flights = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.max_waiters = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable], timeout: float = None):
+        """fn()'s result, shared with every concurrent call for the same key"""
+        flight = self._flights.get(key)
+        if flight is None:
+            timeout = self.timeout if timeout is None else timeout
+            flight = _Flight(asyncio.ensure_future(fn()), self.clock() + timeout)
+            self._flights[key] = flight
+            flight.task.add_done_callback(functools.partial(self._done, key, flight))
+            self.flights += 1
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        self.max_waiters = max(self.max_waiters, flight.waiters)
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), max(0.0, flight.deadline - self.clock()))
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._forget(key, flight)
+            flight.task.cancel()
+            raise SingleFlightTimeout("Timed out waiting for a shared read")
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _done(self, key: Hashable, flight: _Flight, task: asyncio.Task):
+        self._forget(key, flight)
+        # Retrieving the exception also keeps asyncio from logging it when no one was left waiting
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    def stats(self):
+        return {
+            "timeout_seconds": self.timeout,
+            "in_flight": len(self._flights),
+            "flights": self.flights,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "max_waiters": self.max_waiters,
+        }
+
+
+single_flight = SingleFlight(settings.SINGLE_FLIGHT_TIMEOUT)
+register_stats("single_flight", single_flight.stats)
@@ -0,0 +1,214 @@
+import base64
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from services.compression import ENCODERS
+from services.stats import register_stats
+import settings
+
+# One file per user: a JSON header line, then the response body in each
+# coding back to back:
+#
+#     {"etag": ..., "version": 3, "renderedOn": "2024-05-01", "parts": {"": [0, 5120], "gzip": [5120, 1630]}}\n
+#     <identity body><gzip body><br body>
+#
+# Offsets in "parts" are relative to the first byte after the header line.
+SUFFIX = ".snapshot"
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot(NamedTuple):
+    etag: str
+    version: int
+    parts: dict  # coding ("" for identity) -> (absolute offset, length)
+    mapping: mmap.mmap
+    rendered_on: Optional[str] = None  # the day its derived stats were rendered for
+
+    def body(self, encoding: Optional[str] = None) -> bytes:
+        offset, length = self.parts[encoding or ""]
+        return self.mapping[offset:offset + length]
+
+
+def _read_header(path: Path):
+    """A snapshot file's header, or None if it is missing or unreadable"""
+    try:
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+    except (FileNotFoundError, ValueError):
+        return None
+    if not isinstance(header, dict) or not isinstance(header.get("version"), int):
+        return None
+    return header
+
+
+class SnapshotStore:
+    """Prebuilt full-portfolio responses on disk, served from memory-mapped files.
+
+    Snapshots are rewritten after every committed write and swapped in with
+    os.replace, so readers (in this or any other worker) always map a
+    complete file. get() stats the file on each call and remaps it when it
+    was replaced; the mapping is shared page cache, so serving a snapshot
+    costs one copy of the body and no database or model work at all.
+    """
+
+    def __init__(self, directory: str, min_size: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.min_size = min_size
+        self._mapped = {}  # user_id -> (file identity, Snapshot)
+        self._write_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.remaps = 0
+        self.writes = 0
+        self.stale_writes = 0
+        self.discards = 0
+        self.corrupt = 0
+
+    def path(self, user_id: str) -> Path:
+        # Encoded, so a user_id can never escape the snapshot directory
+        name = base64.urlsafe_b64encode(user_id.encode("utf-8")).decode("ascii").rstrip("=")
+        return self.directory / f"{name}{SUFFIX}"
+
+    def get(self, user_id: str) -> Optional[Snapshot]:
+        path = self.path(user_id)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._mapped.pop(user_id, None)
+            self.misses += 1
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        entry = self._mapped.get(user_id)
+        if entry is not None and entry[0] == identity:
+            self.hits += 1
+            return entry[1]
+        snapshot = self._map(path)
+        if snapshot is None:
+            self.misses += 1
+            return None
+        # The previous mapping is closed when the last reference to it goes
+        self._mapped[user_id] = (identity, snapshot)
+        self.remaps += 1
+        self.hits += 1
+        return snapshot
+
+    def _map(self, path: Path) -> Optional[Snapshot]:
+        mapping = None
+        try:
+            with open(path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            header_end = mapping.find(b"\n")
+            if header_end < 0:
+                raise ValueError("no header line")
+            header = json.loads(mapping[:header_end])
+            base = header_end + 1
+            parts = {coding: (base + offset, length) for coding, (offset, length) in header["parts"].items()}
+            if "" not in parts or any(offset + length > len(mapping) for offset, length in parts.values()):
+                raise ValueError("truncated body")
+            if not isinstance(header["version"], int):
+                raise ValueError("no version")
+            return Snapshot(header["etag"], header["version"], parts, mapping, header.get("renderedOn"))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError, AttributeError, struct.error) as e:
+            # Empty, truncated or garbled: drop it so the request re-renders
+            if mapping is not None:
+                mapping.close()
+            self.corrupt += 1
+            logger.warning(f"Discarding corrupt snapshot {path.name}: {str(e)}")
+            self._unlink_if_same(path, inode)
+            return None
+
+    def _unlink_if_same(self, path: Path, inode: int):
+        """Remove a file unless another writer has swapped in a new one since it was opened"""
+        try:
+            if os.stat(path).st_ino == inode:
+                os.unlink(path)
+                self.discards += 1
+        except FileNotFoundError:
+            pass
+
+    def write(self, user_id: str, body: bytes, etag: str, version: int, rendered_on: str = None) -> bool:
+        """Render and atomically swap in a snapshot; blocking, run it in a thread.
+
+        Compressed codings are built here, once per version. A snapshot older
+        than the one on disk is dropped, so concurrent writers cannot roll a
+        portfolio back.
+        """
+        encoded = {"": body}
+        if len(body) >= self.min_size:
+            encoded.update({coding: encoder(body) for coding, encoder in ENCODERS.items()})
+        parts, offset = {}, 0
+        for coding, data in encoded.items():
+            parts[coding] = [offset, len(data)]
+            offset += len(data)
+        header = {"userId": user_id, "etag": etag, "version": version, "renderedOn": rendered_on, "parts": parts,
+                  "createdAt": datetime.utcnow().isoformat()}
+
+        path = self.path(user_id)
+        with self._write_lock:
+            existing = _read_header(path)
+            if existing is not None and existing["version"] > version:
+                self.stale_writes += 1
+                return False
+            temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(temporary, "wb") as f:
+                f.write(json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n")
+                for data in encoded.values():
+                    f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, path)
+            self.writes += 1
+        return True
+
+    def discard(self, user_id: str):
+        """Remove a user's snapshot, e.g. when it could not be refreshed after a write"""
+        try:
+            os.unlink(self.path(user_id))
+            self.discards += 1
+        except FileNotFoundError:
+            pass
+        self._mapped.pop(user_id, None)
+
+    def discard_older(self, user_id: str, version: int):
+        """Remove a user's snapshot if it predates version (written by another worker)"""
+        header = _read_header(self.path(user_id))
+        if header is not None and header["version"] < version:
+            self.discard(user_id)
+
+    def clear(self):
+        """Remove every snapshot; each is re-rendered on its next read"""
+        for path in self.directory.glob(f"*{SUFFIX}"):
+            path.unlink(missing_ok=True)
+            self.discards += 1
+        self._mapped.clear()
+
+    def stats(self):
+        return {
+            "directory": str(self.directory),
+            "mapped": len(self._mapped),
+            "hits": self.hits,
+            "misses": self.misses,
+            "remaps": self.remaps,
+            "writes": self.writes,
+            "stale_writes": self.stale_writes,
+            "discards": self.discards,
+            "corrupt": self.corrupt,
+        }
+
+
+# Snapshot mode is on when SNAPSHOT_DIR is set
+snapshots = SnapshotStore(settings.SNAPSHOT_DIR, settings.COMPRESSION_MIN_SIZE) if settings.SNAPSHOT_DIR else None
+if snapshots is not None:
+    register_stats("snapshots", snapshots.stats)
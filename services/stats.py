@@ -0,0 +1,46 @@
+from collections import deque
+from typing import Callable, Dict
+
+# Registry of stats providers exposed through GET /api/stats
+_providers: Dict[str, Callable[[], dict]] = {}
+
+
+def register_stats(name: str, provider: Callable[[], dict]):
+    """Register a callable returning a JSON-serializable stats dict"""
+    _providers[name] = provider
+
+
+def collect_stats():
+    """Snapshot every registered stats provider"""
+    return {name: provider() for name, provider in _providers.items()}
+
+
+class LatencyWindow:
+    """Sliding window of latency samples with percentile summaries"""
+
+    def __init__(self, size: int = 1000):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, p: float):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self):
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        return {
+            "count": self.count,
+            "window": len(self.samples),
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+        }
@@ -0,0 +1,235 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from bson import ObjectId
+
+from models.portfolio import Portfolio, PortfolioCreate, PortfolioUpdate
+from models.sections import Section
+from services.pagination import encode_cursor
+import settings
+
+# Backends selectable with STORAGE_BACKEND
+STORAGE_BACKENDS = ("mongo", "memory", "sqlite")
+
+# Fields needed to build a PortfolioRef (see services/versioning.py)
+REF_FIELDS = ("_id", "version")
+
+
+def update_fields(update_data):
+    """$set document for a partial update model: drop unset fields, stamp updatedAt"""
+    update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
+    update_dict["updatedAt"] = datetime.utcnow()
+    return update_dict
+
+
+def _project_paths(value, paths):
+    if isinstance(value, list):
+        # Like MongoDB: a sub-path projects each embedded document; other elements are dropped
+        return [_project_paths(element, paths) for element in value if isinstance(element, (dict, list))]
+    children = {}
+    for path in paths:
+        children.setdefault(path[0], []).append(path[1:])
+    result = {}
+    for key, field in value.items():
+        rests = children.get(key)
+        if rests is None:
+            continue
+        if any(not rest for rest in rests):
+            result[key] = field
+        elif isinstance(field, (dict, list)):
+            result[key] = _project_paths(field, rests)
+    return result
+
+
+def project(document: Optional[dict], fields: Optional[Sequence[str]]):
+    """Keep only the given fields of a document (all of them if fields is None).
+
+    Fields may be dotted paths into embedded documents and arrays of them
+    ("personalInfo.name", "stats.value"), with MongoDB inclusion-projection
+    semantics.
+    """
+    if document is None or fields is None:
+        return document
+    return _project_paths(document, [field.split(".") for field in fields])
+
+
+def add_counters(document: dict, counters: Optional[Dict[str, int]]):
+    """Apply counter deltas to a portfolio document in place, as bump_version does"""
+    if counters:
+        stored = document.setdefault("counters", {})
+        for name, delta in counters.items():
+            stored[name] = stored.get(name, 0) + delta
+        document["updatedAt"] = datetime.utcnow()
+
+
+def group_by_portfolio(documents, portfolio_ids, limit: int = None, fields: Sequence[str] = None):
+    """{portfolioId: items} from documents sorted by portfolio, keeping the first `limit` of each"""
+    groups = {portfolio_id: [] for portfolio_id in portfolio_ids}
+    for document in documents:
+        group = groups.get(document["portfolioId"])
+        if group is not None and (not limit or len(group) < limit):
+            group.append(project(document, fields))
+    return groups
+
+
+def sort_key(document: dict):
+    """Position of a section item in (order, _id) order"""
+    return document.get("order", 0), document["_id"]
+
+
+def insert_results(items: list, errors: Dict[int, str], ordered: bool):
+    """Per-item results of a batch insert; with ordered=True items after the first error are skipped"""
+    first_error = min(errors) if errors else None
+    results = []
+    for index, item in enumerate(items):
+        if index in errors:
+            results.append({"index": index, "status": "error", "error": errors[index]})
+        elif ordered and first_error is not None and index > first_error:
+            results.append({"index": index, "status": "skipped"})
+        else:
+            results.append({"index": index, "status": "created", "item": item})
+    return results
+
+
+def reorder_positions(item_ids: List[str]):
+    """(order, ObjectId) for every valid id, numbering positions from 1"""
+    return [(order, ObjectId(item_id)) for order, item_id in enumerate(item_ids, start=1) if ObjectId.is_valid(item_id)]
+
+
+def reorder_results(item_ids: List[str], found):
+    return [
+        {
+            "id": item_id,
+            "order": order,
+            "status": "updated" if ObjectId.is_valid(item_id) and ObjectId(item_id) in found else "not_found",
+        }
+        for order, item_id in enumerate(item_ids, start=1)
+    ]
+
+
+class PortfolioStore(ABC):
+    """Portfolio documents, unique by userId"""
+
+    @abstractmethod
+    async def find_by_user(self, user_id: str, fields: Sequence[str] = None) -> Optional[dict]:
+        """The user's portfolio document (only `fields` if given, dotted paths allowed), or None"""
+
+    @abstractmethod
+    async def find_by_users(self, user_ids: Sequence[str], fields: Sequence[str] = None) -> List[dict]:
+        """The portfolio documents of the users that have one, in any order (userId is always included)"""
+
+    async def exists(self, user_id: str) -> bool:
+        return await self.find_by_user(user_id, ("_id",)) is not None
+
+    @abstractmethod
+    async def insert(self, portfolio_data: PortfolioCreate) -> Portfolio:
+        """Insert a new portfolio; raises DuplicateKeyError if the user already has one"""
+
+    @abstractmethod
+    async def update(self, user_id: str, update_data: PortfolioUpdate) -> Optional[dict]:
+        """Apply a partial update and bump the version; returns the new document or None"""
+
+    @abstractmethod
+    async def bump_version(self, portfolio_id: ObjectId, counters: Dict[str, int] = None) -> int:
+        """Atomically increment a portfolio's version and return the new value (0 if not found).
+
+        counters ({name: delta}, see services/counters.py) are added to its
+        counters in the same update, which then also stamps updatedAt.
+        """
+
+    @abstractmethod
+    async def set_counters(self, portfolio_id: ObjectId, counters: Dict[str, int]) -> Optional[Tuple[dict, int]]:
+        """Replace a portfolio's counters and bump its version; (previous counters, new version) or None"""
+
+    @abstractmethod
+    def owners(self):
+        """Async iterator over (userId, _id) of every portfolio"""
+
+
+class SectionStore(ABC):
+    """Items of one portfolio section (experience, projects, ...), read in (order, _id) order"""
+
+    def __init__(self, section: Section):
+        self.section = section
+
+    @abstractmethod
+    async def list(self, portfolio_id: ObjectId, limit: int = None, fields: Sequence[str] = None) -> List[dict]:
+        """All of a portfolio's items, or the first `limit` (only `fields` if given)"""
+
+    @abstractmethod
+    async def list_many(
+        self, portfolio_ids: Sequence[ObjectId], limit: int = None, fields: Sequence[str] = None
+    ) -> Dict[ObjectId, List[dict]]:
+        """Items of several portfolios from one query, {portfolioId: items} with at most `limit` each"""
+
+    @abstractmethod
+    def iterate(self, portfolio_id: ObjectId, after=None, limit: int = None, batch_size: int = 100):
+        """Async iterator over a portfolio's items positioned after (order, _id)"""
+
+    async def page(self, portfolio_id: ObjectId, limit: int, after=None):
+        """One keyset page: (items, next cursor or None)"""
+        items = [item async for item in self.iterate(portfolio_id, after, limit + 1, batch_size=limit + 1)]
+        if len(items) > limit:
+            return items[:limit], encode_cursor(items[limit - 1])
+        return items, None
+
+    @abstractmethod
+    async def get(self, portfolio_id: ObjectId, item_id: ObjectId, fields: Sequence[str] = None) -> Optional[dict]:
+        """One item (only `fields` if given), or None if not found"""
+
+    @abstractmethod
+    async def insert(self, portfolio_id: ObjectId, item_data):
+        """Insert a validated item and return the model that was written"""
+
+    @abstractmethod
+    async def insert_many(self, portfolio_id: ObjectId, items_data: list, ordered: bool = True):
+        """Insert a batch and return a result per item (see insert_results)"""
+
+    @abstractmethod
+    async def reorder(self, portfolio_id: ObjectId, item_ids: List[str]):
+        """Set order = position (from 1) for each id and return a result per id"""
+
+    @abstractmethod
+    async def update(self, portfolio_id: ObjectId, item_id: ObjectId, update_data) -> Optional[dict]:
+        """Apply a partial update; returns the updated document or None if not found"""
+
+    @abstractmethod
+    async def delete(self, portfolio_id: ObjectId, item_id: ObjectId) -> bool:
+        """Delete an item; False if it was not found"""
+
+
+class Storage:
+    """A storage backend: the portfolio store plus one store per section.
+
+    `db` is the Motor database for the mongo backend and None otherwise;
+    MongoDB-only features ($lookup fetches, index admin, resumable imports)
+    check it before running.
+    """
+
+    def __init__(self, name: str, portfolios: PortfolioStore, sections: Dict[str, SectionStore], db=None, close=None):
+        self.name = name
+        self.portfolios = portfolios
+        self.sections = sections
+        self.db = db
+        self._close = close
+
+    def close(self):
+        if self._close is not None:
+            self._close()
+
+
+def build_storage(backend: str, db=None, sqlite_path: str = None) -> Storage:
+    """Storage for a STORAGE_BACKEND value; the mongo backend needs the Motor database"""
+    if backend == "mongo":
+        from services.repository import PortfolioRepository, build_section_repositories
+
+        return Storage("mongo", PortfolioRepository(db), build_section_repositories(db), db=db)
+    if backend == "memory":
+        from services.storage_memory import build_memory_storage
+
+        return build_memory_storage()
+    if backend == "sqlite":
+        from services.storage_sqlite import build_sqlite_storage
+
+        return build_sqlite_storage(sqlite_path or settings.SQLITE_PATH)
+    raise ValueError(f"Unknown storage backend: {backend} (expected one of {', '.join(STORAGE_BACKENDS)})")
@@ -0,0 +1,160 @@
+import bisect
+import copy
+from datetime import datetime
+from typing import List, Sequence
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from models.portfolio import Portfolio, PortfolioCreate, PortfolioUpdate
+from models.sections import Section, SECTIONS
+from services.storage import (
+    PortfolioStore, SectionStore, Storage, add_counters, insert_results, project, reorder_positions, reorder_results,
+    sort_key, update_fields,
+)
+
+# In-process implementation of the stores in services/storage.py. Documents
+# are copied in and out, so callers can never mutate stored state. Nothing
+# here awaits, so every operation is atomic on the event loop.
+
+
+class MemoryPortfolioStore(PortfolioStore):
+    def __init__(self):
+        self._documents = {}  # _id -> document
+        self._by_user = {}  # userId -> _id (the unique index)
+
+    async def find_by_user(self, user_id: str, fields: Sequence[str] = None):
+        portfolio_id = self._by_user.get(user_id)
+        if portfolio_id is None:
+            return None
+        return copy.deepcopy(project(self._documents[portfolio_id], fields))
+
+    async def find_by_users(self, user_ids: Sequence[str], fields: Sequence[str] = None):
+        fields = (*fields, "userId") if fields else None
+        return [document for document in [await self.find_by_user(user_id, fields) for user_id in user_ids] if document]
+
+    async def insert(self, portfolio_data: PortfolioCreate) -> Portfolio:
+        if portfolio_data.userId in self._by_user:
+            raise DuplicateKeyError(f"Portfolio already exists for user {portfolio_data.userId}", 11000)
+        portfolio = Portfolio(**portfolio_data.dict())
+        self._documents[portfolio.id] = portfolio.dict(by_alias=True)
+        self._by_user[portfolio.userId] = portfolio.id
+        return portfolio
+
+    async def update(self, user_id: str, update_data: PortfolioUpdate):
+        portfolio_id = self._by_user.get(user_id)
+        if portfolio_id is None:
+            return None
+        document = self._documents[portfolio_id]
+        document.update(copy.deepcopy(update_fields(update_data)))
+        document["version"] = document.get("version", 0) + 1
+        return copy.deepcopy(document)
+
+    async def bump_version(self, portfolio_id: ObjectId, counters=None) -> int:
+        document = self._documents.get(portfolio_id)
+        if document is None:
+            return 0
+        add_counters(document, counters)
+        document["version"] = document.get("version", 0) + 1
+        return document["version"]
+
+    async def set_counters(self, portfolio_id: ObjectId, counters):
+        document = self._documents.get(portfolio_id)
+        if document is None:
+            return None
+        previous = document.get("counters", {})
+        document.update({"counters": dict(counters), "updatedAt": datetime.utcnow()})
+        document["version"] = document.get("version", 0) + 1
+        return previous, document["version"]
+
+    async def owners(self):
+        for user_id, portfolio_id in list(self._by_user.items()):
+            yield user_id, portfolio_id
+
+
+class MemorySectionStore(SectionStore):
+    """Section items plus an ordered index of (order, _id) keys per portfolio"""
+
+    def __init__(self, section: Section):
+        super().__init__(section)
+        self._documents = {}  # _id -> document
+        self._index = {}  # portfolioId -> sorted [(order, _id)]
+
+    def _add(self, document: dict):
+        self._documents[document["_id"]] = document
+        bisect.insort(self._index.setdefault(document["portfolioId"], []), sort_key(document))
+
+    def _remove(self, document: dict):
+        keys = self._index[document["portfolioId"]]
+        del keys[bisect.bisect_left(keys, sort_key(document))]
+        del self._documents[document["_id"]]
+
+    def _owned(self, portfolio_id: ObjectId, item_id: ObjectId):
+        document = self._documents.get(item_id)
+        return document if document is not None and document["portfolioId"] == portfolio_id else None
+
+    def _keys(self, portfolio_id: ObjectId, after=None, limit: int = None):
+        keys = self._index.get(portfolio_id, [])
+        start = bisect.bisect_right(keys, tuple(after)) if after is not None else 0
+        return keys[start:start + limit] if limit else keys[start:]
+
+    async def list(self, portfolio_id: ObjectId, limit: int = None, fields: Sequence[str] = None):
+        return [
+            copy.deepcopy(project(self._documents[key[1]], fields)) for key in self._keys(portfolio_id, limit=limit)
+        ]
+
+    async def list_many(self, portfolio_ids: Sequence[ObjectId], limit: int = None, fields: Sequence[str] = None):
+        return {portfolio_id: await self.list(portfolio_id, limit, fields) for portfolio_id in portfolio_ids}
+
+    async def iterate(self, portfolio_id: ObjectId, after=None, limit: int = None, batch_size: int = 100):
+        for _, item_id in self._keys(portfolio_id, after, limit):
+            document = self._documents.get(item_id)
+            if document is not None:
+                yield copy.deepcopy(document)
+
+    async def get(self, portfolio_id: ObjectId, item_id: ObjectId, fields: Sequence[str] = None):
+        return copy.deepcopy(project(self._owned(portfolio_id, item_id), fields))
+
+    async def insert(self, portfolio_id: ObjectId, item_data):
+        item = self.section.model(portfolioId=portfolio_id, **item_data.dict())
+        self._add(item.dict(by_alias=True))
+        return item
+
+    async def insert_many(self, portfolio_id: ObjectId, items_data: list, ordered: bool = True):
+        items = [self.section.model(portfolioId=portfolio_id, **item_data.dict()) for item_data in items_data]
+        for item in items:
+            self._add(item.dict(by_alias=True))
+        return insert_results(items, {}, ordered)
+
+    async def reorder(self, portfolio_id: ObjectId, item_ids: List[str]):
+        now = datetime.utcnow()
+        found = set()
+        for order, item_id in reorder_positions(item_ids):
+            document = self._owned(portfolio_id, item_id)
+            if document is None:
+                continue
+            self._remove(document)
+            document.update({"order": order, "updatedAt": now})
+            self._add(document)
+            found.add(item_id)
+        return reorder_results(item_ids, found)
+
+    async def update(self, portfolio_id: ObjectId, item_id: ObjectId, update_data):
+        document = self._owned(portfolio_id, item_id)
+        if document is None:
+            return None
+        self._remove(document)
+        document.update(copy.deepcopy(update_fields(update_data)))
+        self._add(document)
+        return copy.deepcopy(document)
+
+    async def delete(self, portfolio_id: ObjectId, item_id: ObjectId) -> bool:
+        document = self._owned(portfolio_id, item_id)
+        if document is None:
+            return False
+        self._remove(document)
+        return True
+
+
+def build_memory_storage() -> Storage:
+    sections = {section.name: MemorySectionStore(section) for section in SECTIONS}
+    return Storage("memory", MemoryPortfolioStore(), sections)
@@ -0,0 +1,292 @@
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Sequence
+import bson
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from models.portfolio import Portfolio, PortfolioCreate, PortfolioUpdate
+from models.sections import Section, SECTIONS
+from services.storage import (
+    PortfolioStore, SectionStore, Storage, add_counters, group_by_portfolio, insert_results, project, reorder_positions,
+    reorder_results, update_fields,
+)
+
+# SQLite implementation of the stores in services/storage.py.
+#
+# Documents are stored as BSON blobs, so ObjectIds and datetimes round-trip
+# exactly as they do through Motor; the columns next to them only back the
+# lookups (userId, and (portfolio_id, ord, _id) for ordered section reads).
+# _id columns hold the 12 ObjectId bytes, which sort like ObjectIds.
+#
+# The database runs in WAL mode, so other processes (e.g. a read-only
+# replica of the file) can read while this one writes. Calls go through one
+# connection, serialized by a lock and run off the event loop in a thread.
+
+
+class SQLiteDatabase:
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS portfolios (_id BLOB PRIMARY KEY, user_id TEXT NOT NULL UNIQUE, doc BLOB NOT NULL)"
+        )
+        for section in SECTIONS:
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {section.collection} "
+                "(_id BLOB PRIMARY KEY, portfolio_id BLOB NOT NULL, ord INTEGER NOT NULL, doc BLOB NOT NULL)"
+            )
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {section.collection}_portfolio_order "
+                f"ON {section.collection} (portfolio_id, ord, _id)"
+            )
+
+    def _read(self, fn, *args):
+        with self._lock:
+            return fn(self._connection, *args)
+
+    def _write(self, fn, *args):
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._connection, *args)
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+            return result
+
+    async def read(self, fn, *args):
+        return await asyncio.to_thread(self._read, fn, *args)
+
+    async def write(self, fn, *args):
+        return await asyncio.to_thread(self._write, fn, *args)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def _key(object_id: ObjectId) -> bytes:
+    return object_id.binary
+
+
+def _decode(row):
+    return bson.decode(row[0]) if row else None
+
+
+class SQLitePortfolioStore(PortfolioStore):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    async def find_by_user(self, user_id: str, fields: Sequence[str] = None):
+        def find(connection):
+            return _decode(connection.execute("SELECT doc FROM portfolios WHERE user_id = ?", (user_id,)).fetchone())
+
+        return project(await self.database.read(find), fields)
+
+    async def find_by_users(self, user_ids: Sequence[str], fields: Sequence[str] = None):
+        user_ids = list(user_ids)
+
+        def find(connection):
+            placeholders = ", ".join("?" * len(user_ids))
+            rows = connection.execute(f"SELECT doc FROM portfolios WHERE user_id IN ({placeholders})", user_ids)
+            return [bson.decode(row[0]) for row in rows]
+
+        documents = await self.database.read(find) if user_ids else []
+        return [project(document, (*fields, "userId")) for document in documents] if fields else documents
+
+    async def insert(self, portfolio_data: PortfolioCreate) -> Portfolio:
+        portfolio = Portfolio(**portfolio_data.dict())
+
+        def insert(connection):
+            connection.execute(
+                "INSERT INTO portfolios (_id, user_id, doc) VALUES (?, ?, ?)",
+                (_key(portfolio.id), portfolio.userId, bson.encode(portfolio.dict(by_alias=True))),
+            )
+
+        try:
+            await self.database.write(insert)
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(f"Portfolio already exists for user {portfolio.userId}: {e}", 11000)
+        return portfolio
+
+    async def update(self, user_id: str, update_data: PortfolioUpdate):
+        fields = update_fields(update_data)
+
+        def update(connection):
+            document = _decode(connection.execute("SELECT doc FROM portfolios WHERE user_id = ?", (user_id,)).fetchone())
+            if document is None:
+                return None
+            document.update(fields)
+            document["version"] = document.get("version", 0) + 1
+            connection.execute("UPDATE portfolios SET doc = ? WHERE _id = ?", (bson.encode(document), _key(document["_id"])))
+            return document
+
+        return await self.database.write(update)
+
+    def _get(self, connection, portfolio_id: ObjectId):
+        return _decode(connection.execute("SELECT doc FROM portfolios WHERE _id = ?", (_key(portfolio_id),)).fetchone())
+
+    def _put(self, connection, document: dict):
+        connection.execute("UPDATE portfolios SET doc = ? WHERE _id = ?", (bson.encode(document), _key(document["_id"])))
+
+    async def bump_version(self, portfolio_id: ObjectId, counters=None) -> int:
+        def bump(connection):
+            document = self._get(connection, portfolio_id)
+            if document is None:
+                return 0
+            add_counters(document, counters)
+            document["version"] = document.get("version", 0) + 1
+            self._put(connection, document)
+            return document["version"]
+
+        return await self.database.write(bump)
+
+    async def set_counters(self, portfolio_id: ObjectId, counters):
+        now = datetime.utcnow()
+
+        def replace(connection):
+            document = self._get(connection, portfolio_id)
+            if document is None:
+                return None
+            previous = document.get("counters", {})
+            document.update({"counters": dict(counters), "updatedAt": now})
+            document["version"] = document.get("version", 0) + 1
+            self._put(connection, document)
+            return previous, document["version"]
+
+        return await self.database.write(replace)
+
+    async def owners(self):
+        def select(connection):
+            return connection.execute("SELECT user_id, _id FROM portfolios").fetchall()
+
+        for user_id, key in await self.database.read(select):
+            yield user_id, ObjectId(key)
+
+
+class SQLiteSectionStore(SectionStore):
+    def __init__(self, database: SQLiteDatabase, section: Section):
+        super().__init__(section)
+        self.database = database
+        self.table = section.collection
+
+    def _select(self, connection, portfolio_id: ObjectId, after, limit):
+        query = f"SELECT doc FROM {self.table} WHERE portfolio_id = ?"
+        params = [_key(portfolio_id)]
+        if after is not None:
+            order, object_id = after
+            query += " AND (ord, _id) > (?, ?)"
+            params += [order, _key(object_id)]
+        query += " ORDER BY ord, _id"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [bson.decode(row[0]) for row in connection.execute(query, params)]
+
+    def _get(self, connection, portfolio_id: ObjectId, item_id: ObjectId):
+        return _decode(connection.execute(
+            f"SELECT doc FROM {self.table} WHERE _id = ? AND portfolio_id = ?", (_key(item_id), _key(portfolio_id))
+        ).fetchone())
+
+    def _put(self, connection, document: dict):
+        connection.execute(
+            f"INSERT OR REPLACE INTO {self.table} (_id, portfolio_id, ord, doc) VALUES (?, ?, ?, ?)",
+            (_key(document["_id"]), _key(document["portfolioId"]), document.get("order", 0), bson.encode(document)),
+        )
+
+    async def list(self, portfolio_id: ObjectId, limit: int = None, fields: Sequence[str] = None):
+        documents = await self.database.read(self._select, portfolio_id, None, limit)
+        return [project(document, fields) for document in documents] if fields else documents
+
+    async def list_many(self, portfolio_ids: Sequence[ObjectId], limit: int = None, fields: Sequence[str] = None):
+        keys = [_key(portfolio_id) for portfolio_id in portfolio_ids]
+
+        def select(connection):
+            placeholders = ", ".join("?" * len(keys))
+            query = f"SELECT doc FROM {self.table} WHERE portfolio_id IN ({placeholders}) ORDER BY portfolio_id, ord, _id"
+            return [bson.decode(row[0]) for row in connection.execute(query, keys)]
+
+        documents = await self.database.read(select) if keys else []
+        return group_by_portfolio(documents, portfolio_ids, limit, fields)
+
+    async def iterate(self, portfolio_id: ObjectId, after=None, limit: int = None, batch_size: int = 100):
+        """Read in keyset batches of batch_size, so the lock is never held for a whole section"""
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            batch = await self.database.read(self._select, portfolio_id, after, size)
+            for document in batch:
+                yield document
+            if len(batch) < size:
+                return
+            after = (batch[-1].get("order", 0), batch[-1]["_id"])
+            if remaining is not None:
+                remaining -= len(batch)
+
+    async def get(self, portfolio_id: ObjectId, item_id: ObjectId, fields: Sequence[str] = None):
+        return project(await self.database.read(self._get, portfolio_id, item_id), fields)
+
+    async def insert(self, portfolio_id: ObjectId, item_data):
+        item = self.section.model(portfolioId=portfolio_id, **item_data.dict())
+        await self.database.write(self._put, item.dict(by_alias=True))
+        return item
+
+    async def insert_many(self, portfolio_id: ObjectId, items_data: list, ordered: bool = True):
+        items = [self.section.model(portfolioId=portfolio_id, **item_data.dict()) for item_data in items_data]
+
+        def insert(connection):
+            for item in items:
+                self._put(connection, item.dict(by_alias=True))
+
+        if items:
+            await self.database.write(insert)
+        return insert_results(items, {}, ordered)
+
+    async def reorder(self, portfolio_id: ObjectId, item_ids: List[str]):
+        now = datetime.utcnow()
+
+        def reorder(connection):
+            found = set()
+            for order, item_id in reorder_positions(item_ids):
+                document = self._get(connection, portfolio_id, item_id)
+                if document is not None:
+                    document.update({"order": order, "updatedAt": now})
+                    self._put(connection, document)
+                    found.add(item_id)
+            return found
+
+        return reorder_results(item_ids, await self.database.write(reorder))
+
+    async def update(self, portfolio_id: ObjectId, item_id: ObjectId, update_data):
+        fields = update_fields(update_data)
+
+        def update(connection):
+            document = self._get(connection, portfolio_id, item_id)
+            if document is not None:
+                document.update(fields)
+                self._put(connection, document)
+            return document
+
+        return await self.database.write(update)
+
+    async def delete(self, portfolio_id: ObjectId, item_id: ObjectId) -> bool:
+        def delete(connection):
+            cursor = connection.execute(
+                f"DELETE FROM {self.table} WHERE _id = ? AND portfolio_id = ?", (_key(item_id), _key(portfolio_id))
+            )
+            return cursor.rowcount > 0
+
+        return await self.database.write(delete)
+
+
+def build_sqlite_storage(path: str) -> Storage:
+    database = SQLiteDatabase(path)
+    sections = {section.name: SQLiteSectionStore(database, section) for section in SECTIONS}
+    return Storage("sqlite", SQLitePortfolioStore(database), sections, close=database.close)
@@ -0,0 +1,291 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError
+
+from models.portfolio import Portfolio, PortfolioCreate
+from models.sections import SECTIONS, SECTIONS_BY_NAME
+from services.counters import render_stats
+from services.serialization import dumps_bytes
+
+logger = logging.getLogger(__name__)
+
+# Import checkpoints, one document per import_id
+IMPORT_JOBS = "import_jobs"
+
+DUPLICATE_KEY = 11000
+
+
+class TransferError(Exception):
+    """An import could not be completed; report holds the progress made so far"""
+
+    def __init__(self, message: str, report: dict = None):
+        super().__init__(message)
+        self.report = report or {}
+
+
+class TransferConflict(TransferError):
+    """A concurrent import got to the same import id or user first"""
+
+
+class TransferStorageError(TransferError):
+    """The database failed while committing an import; rerun it with its importId to resume"""
+
+    def __init__(self, message: str, report: dict = None, transient: bool = False):
+        super().__init__(message, report)
+        self.transient = transient  # a connection failure, worth retrying shortly
+
+
+def _record(record_type: str, data) -> bytes:
+    return dumps_bytes({"type": record_type, "data": data}) + b"\n"
+
+
+async def export_portfolio(storage, user_id: str, batch_size: int = 500):
+    """Stream a portfolio and all its sections as NDJSON records.
+
+    Returns None if the user has no portfolio, otherwise an async iterator
+    of lines: first {"type": "portfolio"}, then one line per section item
+    ({"type": "<section>"}) read from a batched cursor, so memory stays
+    constant whatever the portfolio size.
+    """
+    portfolio = await storage.portfolios.find_by_user(user_id)
+    if portfolio is None:
+        return None
+    # Counters and the version are bookkeeping: imports rebuild them
+    render_stats(portfolio)
+    portfolio.pop("version", None)
+
+    async def lines():
+        yield _record("portfolio", portfolio)
+        for section in SECTIONS:
+            async for document in storage.sections[section.name].iterate(portfolio["_id"], batch_size=batch_size):
+                yield _record(section.name, document)
+
+    return lines()
+
+
+async def iter_lines(chunks):
+    """Split an async stream of byte chunks (e.g. a request body) into lines"""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+def _derived_id(import_id: str, key) -> ObjectId:
+    """Deterministic _id, so re-running a chunk of the same import is idempotent"""
+    return ObjectId(hashlib.sha1(f"{import_id}:{key}".encode("utf-8")).digest()[:12])
+
+
+def _timestamps(data: dict):
+    return {field: data[field] for field in ("createdAt", "updatedAt") if data.get(field)}
+
+
+async def _parse_lines(lines):
+    """Yield (line_number, record) for each non-blank NDJSON line"""
+    number = 0
+    async for line in lines:
+        number += 1
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise TransferError(f"Line {number}: invalid JSON ({e})")
+        if not isinstance(record, dict) or "type" not in record or not isinstance(record.get("data"), dict):
+            raise TransferError(f"Line {number}: expected {{\"type\": ..., \"data\": {{...}}}}")
+        yield number, record
+
+
+async def _conflicting_user(jobs, import_id: str, user_id: str):
+    """Fail an import whose user's portfolio was created concurrently, pointing at the import to resume"""
+    message = f"A portfolio for {user_id} was created while this import started"
+    await jobs.update_one({"_id": import_id}, {"$set": {"status": "failed", "error": message}})
+    other = await jobs.find_one(
+        {"userId": user_id, "_id": {"$ne": import_id}, "status": {"$ne": "completed"}}, {"_id": 1},
+        sort=[("startedAt", -1)],
+    )
+    if other is not None:
+        message += f"; resume import {other['_id']} with importId={other['_id']} if it did not complete"
+    raise TransferConflict(message, {"importId": import_id, "userId": user_id, "conflictingImportId": other and other["_id"]})
+
+
+async def import_portfolio(
+    db,
+    lines,
+    user_id: str = None,
+    import_id: str = None,
+    batch_size: int = 500,
+    concurrency: int = 4,
+):
+    """Load an exported portfolio from NDJSON lines into MongoDB.
+
+    Section records are validated with the *Create models in chunks of
+    batch_size and written with insert_many, with at most `concurrency`
+    chunks in flight. Each committed chunk is checkpointed under import_id;
+    running the same import again with that id skips committed chunks and
+    re-inserts the rest idempotently (ids are derived from import_id and
+    line position), so a failed import resumes where it stopped.
+    """
+    import_id = import_id or uuid.uuid4().hex
+    started = time.perf_counter()
+    jobs = db[IMPORT_JOBS]
+    records = _parse_lines(lines)
+
+    try:
+        line_number, first = await records.__anext__()
+    except StopAsyncIteration:
+        raise TransferError("Import is empty")
+    if first["type"] != "portfolio":
+        raise TransferError(f"Line {line_number}: first record must be the portfolio")
+    try:
+        portfolio_data = PortfolioCreate(**{**first["data"], **({"userId": user_id} if user_id else {})})
+    except ValidationError as e:
+        raise TransferError(f"Line {line_number}: {e}")
+
+    job = await jobs.find_one({"_id": import_id})
+    resumed = job is not None
+    if resumed and job["userId"] != portfolio_data.userId:
+        raise TransferError(f"Import {import_id} belongs to user {job['userId']}")
+    if not resumed:
+        if await db.portfolios.find_one({"userId": portfolio_data.userId}, {"_id": 1}):
+            raise TransferError("Portfolio already exists for this user")
+        job = {
+            "_id": import_id,
+            "userId": portfolio_data.userId,
+            "portfolioId": _derived_id(import_id, "portfolio"),
+            "batchSize": batch_size,
+            "committedChunks": [],
+            "documents": 0,
+            "status": "running",
+            "startedAt": datetime.utcnow(),
+        }
+        try:
+            await jobs.insert_one(job)
+        except DuplicateKeyError:
+            raise TransferConflict(
+                f"Import {import_id} was started concurrently; once it stops, retry with this importId to resume it",
+                {"importId": import_id, "userId": portfolio_data.userId},
+            )
+    portfolio_id = job["portfolioId"]
+    committed = set(job["committedChunks"])
+    # Chunk numbers are only stable with the batch size the import started with
+    batch_size = job.get("batchSize", batch_size)
+
+    if not await db.portfolios.find_one({"_id": portfolio_id}, {"_id": 1}):
+        portfolio = Portfolio(id=portfolio_id, **portfolio_data.dict(), **_timestamps(first["data"]))
+        try:
+            await db.portfolios.insert_one(portfolio.dict(by_alias=True))
+        except DuplicateKeyError:
+            # The same import resumed concurrently inserted it (same _id) and carries on; otherwise
+            # another import or a create got this user's portfolio in first
+            if not await db.portfolios.find_one({"_id": portfolio_id}, {"_id": 1}):
+                await _conflicting_user(jobs, import_id, portfolio_data.userId)
+
+    report = {
+        "importId": import_id,
+        "userId": portfolio_data.userId,
+        "portfolioId": portfolio_id,
+        "resumed": resumed,
+        "chunks": 0,
+        "skippedChunks": 0,
+        "documents": 0,
+    }
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    in_flight = set()
+    failures = []
+
+    async def write_chunk(chunk_number: int, section, documents):
+        try:
+            try:
+                await db[section.collection].insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY]
+                if errors:
+                    raise TransferStorageError(f"Chunk {chunk_number} ({section.name}): {errors[0].get('errmsg')}")
+            await jobs.update_one(
+                {"_id": import_id},
+                {"$addToSet": {"committedChunks": chunk_number}, "$inc": {"documents": len(documents)}},
+            )
+            report["chunks"] += 1
+            report["documents"] += len(documents)
+        except Exception as e:
+            failures.append(e)
+        finally:
+            semaphore.release()
+
+    chunk_counter = 0
+
+    async def flush(section, buffer):
+        nonlocal chunk_counter
+        chunk_counter += 1
+        chunk_number = chunk_counter
+        if chunk_number in committed:
+            report["skippedChunks"] += 1
+            return
+        documents = []
+        for number, data in buffer:
+            try:
+                item = section.create_model(**data)
+            except ValidationError as e:
+                raise TransferError(f"Line {number}: {e}")
+            model = section.model(
+                id=_derived_id(import_id, number), portfolioId=portfolio_id, **item.dict(), **_timestamps(data)
+            )
+            documents.append(model.dict(by_alias=True))
+        await semaphore.acquire()
+        task = asyncio.ensure_future(write_chunk(chunk_number, section, documents))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    buffers = {section.name: [] for section in SECTIONS}
+    try:
+        async for line_number, record in records:
+            if failures:
+                break
+            section = SECTIONS_BY_NAME.get(record["type"])
+            if section is None:
+                raise TransferError(f"Line {line_number}: unknown record type {record['type']!r}")
+            buffer = buffers[section.name]
+            buffer.append((line_number, record["data"]))
+            if len(buffer) >= batch_size:
+                await flush(section, buffer)
+                buffers[section.name] = []
+        if not failures:
+            for section in SECTIONS:
+                if buffers[section.name]:
+                    await flush(section, buffers[section.name])
+    except TransferError as e:
+        failures.append(e)
+    finally:
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 3)
+    report["docsPerSec"] = round(report["documents"] / elapsed, 1) if elapsed > 0 else None
+    if failures:
+        failure = failures[0]
+        try:
+            await jobs.update_one({"_id": import_id}, {"$set": {"status": "failed", "error": str(failure)}})
+        except Exception as e:
+            # Committed chunks are checkpointed already, so the import still resumes
+            logger.error(f"Error marking import {import_id} failed: {str(e)}")
+        if isinstance(failure, TransferError) and not isinstance(failure, TransferStorageError):
+            # Malformed input: the client's to fix
+            raise TransferError(str(failure), report)
+        raise TransferStorageError(str(failure), report, isinstance(failure, ConnectionFailure)) from failure
+    await jobs.update_one({"_id": import_id}, {"$set": {"status": "completed", "completedAt": datetime.utcnow()}})
+    return report
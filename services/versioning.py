@@ -0,0 +1,63 @@
+import hashlib
+from typing import NamedTuple
+from bson import ObjectId
+
+from services.storage import REF_FIELDS, PortfolioStore
+
+
+class PortfolioRef(NamedTuple):
+    id: ObjectId
+    version: int
+
+
+def portfolio_ref(document) -> PortfolioRef:
+    """Build a PortfolioRef from a portfolio document (pre-version documents count as 0)"""
+    return PortfolioRef(document["_id"], document.get("version", 0))
+
+
+def pop_ref(document) -> PortfolioRef:
+    """portfolio_ref(), then remove the version from the document: clients only see it in the ETag"""
+    ref = portfolio_ref(document)
+    document.pop("version", None)
+    return ref
+
+
+async def get_portfolio_ref(portfolios: PortfolioStore, user_id: str):
+    """Look up a portfolio's _id and version without loading the document"""
+    document = await portfolios.find_by_user(user_id, REF_FIELDS)
+    return portfolio_ref(document) if document else None
+
+
+async def bump_version(portfolios: PortfolioStore, portfolio_id: ObjectId, counters: dict = None) -> int:
+    """Atomically increment a portfolio's version and return the new value.
+
+    Call this after the data write has committed: a reader that sees the new
+    version is then guaranteed to also see the new data. The write's counter
+    deltas (services/counters.py) go in the same update.
+    """
+    return await portfolios.bump_version(portfolio_id, counters)
+
+
+def make_etag(ref: PortfolioRef, section: str, variant: str = "") -> str:
+    """Strong ETag for one section (or the full portfolio) at a given version.
+
+    Each variant of a section (a page, a sparse fieldset) gets its own tag.
+    """
+    if variant:
+        section = f"{section}~{hashlib.sha1(variant.encode('utf-8')).hexdigest()[:12]}"
+    return f'"{ref.id}-{ref.version}-{section}"'
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """Evaluate an If-None-Match header against an ETag (weak comparison, RFC 9110)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
@@ -0,0 +1,114 @@
+import json
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# How GET /api/portfolio/{user_id} loads its data:
+#   aggregate  - one $lookup pipeline, falls back to fanout if unsupported
+#   fanout     - concurrent find() per collection via asyncio.gather
+#   sequential - one find() after another (original behaviour)
+PORTFOLIO_FETCH_MODE = os.environ.get('PORTFOLIO_FETCH_MODE', 'aggregate')
+
+# Maximum number of items per section embedded in the full portfolio
+PORTFOLIO_SECTION_LIMIT = int(os.environ.get('PORTFOLIO_SECTION_LIMIT', '100'))
+
+# Concurrent identical portfolio reads share one fetch; its waiters get a 504 after this many seconds
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', '10'))
+
+# Maximum number of user ids per POST /api/portfolios:batchGet
+PORTFOLIO_BATCH_MAX_SIZE = int(os.environ.get('PORTFOLIO_BATCH_MAX_SIZE', '100'))
+
+# Number of latency samples kept per fetch mode for /api/stats
+LATENCY_WINDOW_SIZE = int(os.environ.get('LATENCY_WINDOW_SIZE', '1000'))
+
+# In-process cache of serialized portfolio responses (TTL of 0 disables it)
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', '300'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '1024'))
+
+# Cache-Control sent with ETag'd portfolio responses
+PORTFOLIO_CACHE_CONTROL = os.environ.get('PORTFOLIO_CACHE_CONTROL', 'public, max-age=0, must-revalidate')
+
+# Create missing registry indexes (models/indexes.py) at startup
+ENSURE_INDEXES = os.environ.get('ENSURE_INDEXES', 'true').lower() == 'true'
+
+# userId -> portfolio _id resolution cache used by section endpoints
+PORTFOLIO_ID_CACHE_TTL = float(os.environ.get('PORTFOLIO_ID_CACHE_TTL', '3600'))
+PORTFOLIO_ID_NEGATIVE_TTL = float(os.environ.get('PORTFOLIO_ID_NEGATIVE_TTL', '5'))
+PORTFOLIO_ID_CACHE_MAX_ENTRIES = int(os.environ.get('PORTFOLIO_ID_CACHE_MAX_ENTRIES', '10000'))
+
+# Batch section writes: items per :batch create, ids per /order reorder (one bulk write each)
+SECTION_BATCH_MAX_ITEMS = int(os.environ.get('SECTION_BATCH_MAX_ITEMS', '500'))
+SECTION_REORDER_MAX_IDS = int(os.environ.get('SECTION_REORDER_MAX_IDS', '1000'))
+
+# Keyset pagination of section lists (?limit=&cursor=) and NDJSON streaming
+SECTION_PAGE_DEFAULT_LIMIT = int(os.environ.get('SECTION_PAGE_DEFAULT_LIMIT', '50'))
+SECTION_PAGE_MAX_LIMIT = int(os.environ.get('SECTION_PAGE_MAX_LIMIT', '500'))
+SECTION_STREAM_BATCH_SIZE = int(os.environ.get('SECTION_STREAM_BATCH_SIZE', '100'))
+
+# NDJSON export/import (services/transfer.py)
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '500'))
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '500'))
+IMPORT_CONCURRENCY = int(os.environ.get('IMPORT_CONCURRENCY', '4'))
+
+# Content-negotiated gzip/brotli for cached portfolio responses
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5'))
+
+# Storage backend: mongo (Motor), memory (in-process, not persisted) or sqlite
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo')
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'portfolio.sqlite3')
+
+# Snapshot mode: serve GET /api/portfolio/{user_id} from prebuilt files in this directory
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', '')
+
+# Cross-worker cache invalidation: off | changestream (needs a replica set) | poll
+INVALIDATION_MODE = os.environ.get('INVALIDATION_MODE', 'off')
+INVALIDATION_POLL_INTERVAL = float(os.environ.get('INVALIDATION_POLL_INTERVAL', '1.0'))  # seconds
+# Poll mode re-reads this many seconds of versions each round to catch late commits
+INVALIDATION_POLL_OVERLAP = float(os.environ.get('INVALIDATION_POLL_OVERLAP', '5.0'))
+# Users (and portfolio _id -> userId mappings) whose last seen version each worker remembers
+INVALIDATION_MAX_TRACKED = int(os.environ.get('INVALIDATION_MAX_TRACKED', '10000'))
+
+# Server-Sent Events (GET /api/portfolio/{user_id}/events)
+EVENTS_REPLAY_SIZE = int(os.environ.get('EVENTS_REPLAY_SIZE', '100'))  # events kept per user for Last-Event-ID
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('EVENTS_HEARTBEAT_SECONDS', '15'))
+EVENTS_RETRY_MS = int(os.environ.get('EVENTS_RETRY_MS', '3000'))  # client reconnect delay
+EVENTS_IDLE_TTL = float(os.environ.get('EVENTS_IDLE_TTL', '300'))  # seconds a replay buffer outlives its last subscriber
+EVENTS_MAX_STREAM_SECONDS = float(os.environ.get('EVENTS_MAX_STREAM_SECONDS', '120'))  # then the client reconnects
+
+# Delta sync (GET /api/portfolio/{user_id}/changes)
+DELTA_SYNC_WINDOW = float(os.environ.get('DELTA_SYNC_WINDOW', '5.0'))  # seconds re-read before each token
+TOMBSTONE_TTL_SECONDS = int(os.environ.get('TOMBSTONE_TTL_SECONDS', str(30 * 24 * 3600)))  # older tokens get a full resync
+
+# In-process full-text search (GET /api/portfolio/{user_id}/search): portfolios indexed at once
+SEARCH_MAX_PORTFOLIOS = int(os.environ.get('SEARCH_MAX_PORTFOLIOS', '256'))
+
+# Facets (services/facets.py): items with more distinct tags count no co-occurring pairs
+FACET_PAIR_MAX_TAGS = int(os.environ.get('FACET_PAIR_MAX_TAGS', '16'))
+
+# Derived stats (services/counters.py): format per source as JSON, e.g. {"projects": "{value}+"}
+STAT_FORMATS = json.loads(os.environ.get('STAT_FORMATS') or '{}')
+
+# MongoDB connection pool (maxPoolSize); the admission limits below default to fractions of it
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '10'))
+
+# Admission control (services/admission.py): concurrent /api requests per class, beyond which
+# requests queue, and a full queue or a long wait gets 503 + Retry-After
+ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', 'true').lower() == 'true'
+ADMISSION_READ_LIMIT = int(os.environ.get('ADMISSION_READ_LIMIT', str(max(1, MONGO_MAX_POOL_SIZE * 4 // 5))))
+ADMISSION_WRITE_LIMIT = int(os.environ.get('ADMISSION_WRITE_LIMIT', str(max(1, MONGO_MAX_POOL_SIZE * 2 // 5))))
+ADMISSION_BULK_LIMIT = int(os.environ.get('ADMISSION_BULK_LIMIT', '1'))  # seeding, imports, admin jobs (not adapted)
+ADMISSION_MIN_LIMIT = int(os.environ.get('ADMISSION_MIN_LIMIT', '1'))
+ADMISSION_MAX_LIMIT = int(os.environ.get('ADMISSION_MAX_LIMIT', str(MONGO_MAX_POOL_SIZE * 2)))
+ADMISSION_QUEUE_SIZE = int(os.environ.get('ADMISSION_QUEUE_SIZE', '64'))  # waiters per class
+ADMISSION_BULK_QUEUE_SIZE = int(os.environ.get('ADMISSION_BULK_QUEUE_SIZE', '2'))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '2.0'))  # seconds, under the socket timeout
+# Read and write limits shrink while MongoDB's p95 command latency is above target, grow while under it
+ADMISSION_LATENCY_TARGET_MS = float(os.environ.get('ADMISSION_LATENCY_TARGET_MS', '100'))
+ADMISSION_ADJUST_INTERVAL = float(os.environ.get('ADMISSION_ADJUST_INTERVAL', '1.0'))  # seconds
+ADMISSION_DECREASE_FACTOR = float(os.environ.get('ADMISSION_DECREASE_FACTOR', '0.8'))
+ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', '1'))  # seconds
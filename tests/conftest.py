@@ -0,0 +1,67 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# server.py connects lazily, so importing it needs a MONGO_URL but no server;
+# each test swaps in a fresh mongomock-motor database (see the app fixture)
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("STORAGE_BACKEND", "mongo")
+os.environ.setdefault("ENSURE_INDEXES", "false")
+os.environ.setdefault("INVALIDATION_MODE", "off")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """The server module against a fresh mongomock-motor database and empty in-process caches"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import server
+    import settings
+    from services.facets import FacetStore
+    from services.portfolio_ids import PortfolioIdResolver
+    from services.response_cache import ResponseCache
+    from services.search import SearchIndex
+
+    db = mongomock_motor.AsyncMongoMockClient()[f"portfolio_test_{uuid.uuid4().hex[:8]}"]
+    storage = server.build_storage("mongo", db)
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "storage", storage)
+    monkeypatch.setattr(server, "portfolios", storage.portfolios)
+    monkeypatch.setattr(server, "section_repositories", storage.sections)
+    monkeypatch.setattr(server, "facet_store", FacetStore(db))
+    monkeypatch.setattr(server, "response_cache", ResponseCache(
+        settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_TTL
+    ))
+    monkeypatch.setattr(server, "portfolio_ids", PortfolioIdResolver(
+        settings.PORTFOLIO_ID_CACHE_MAX_ENTRIES, settings.PORTFOLIO_ID_CACHE_TTL, settings.PORTFOLIO_ID_NEGATIVE_TTL
+    ))
+    monkeypatch.setattr(server, "search_index", SearchIndex(settings.SEARCH_MAX_PORTFOLIOS, settings.LATENCY_WINDOW_SIZE))
+    return server
+
+
+@pytest.fixture
+async def client(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+async def user_id(client):
+    """A new, empty portfolio's userId"""
+    user_id = f"test-{uuid.uuid4().hex[:8]}"
+    response = await client.post("/api/portfolio", json={
+        "userId": user_id,
+        "personalInfo": {"name": "Test User", "title": "Tester"},
+    })
+    assert response.status_code == 200, response.text
+    return user_id
@@ -0,0 +1,282 @@
+"""Conformance checks every storage backend must pass (run by test_storage_conformance.py).
+
+The mongo backend runs against mongomock-motor, or against a real server
+when CONFORMANCE_MONGO_URL is set (in a scratch database dropped afterwards).
+"""
+import os
+import uuid
+from datetime import datetime
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from models.experience import ExperienceCreate, ExperienceUpdate
+from models.portfolio import PersonalInfo, PortfolioCreate, PortfolioUpdate, Stat
+from services.pagination import decode_cursor
+from services.storage import build_storage
+
+CHECKS = []
+
+
+def check(fn):
+    CHECKS.append(fn)
+    return fn
+
+
+def new_portfolio(user_id: str):
+    return PortfolioCreate(
+        userId=user_id,
+        personalInfo=PersonalInfo(name="Conformance", title="Tester"),
+        stats=[Stat(value="1", label="One")],
+    )
+
+
+def experience(order: int, role: str = None):
+    return ExperienceCreate(
+        role=role or f"Role {order}", company="Company", location="Remote", period="2024", order=order,
+        highlights=["a", "b"],
+    )
+
+
+async def new_user(storage):
+    user_id = f"conformance-{uuid.uuid4().hex[:8]}"
+    portfolio = await storage.portfolios.insert(new_portfolio(user_id))
+    return user_id, portfolio.id
+
+
+def roles(documents):
+    return [document["role"] for document in documents]
+
+
+@check
+async def portfolio_find_by_user(storage):
+    user_id, portfolio_id = await new_user(storage)
+    document = await storage.portfolios.find_by_user(user_id)
+    assert document["_id"] == portfolio_id and isinstance(document["_id"], ObjectId)
+    assert document["userId"] == user_id and document["version"] == 0
+    assert document["personalInfo"]["name"] == "Conformance"
+    assert isinstance(document["createdAt"], datetime)
+    assert await storage.portfolios.find_by_user(user_id, ("_id", "version")) == {"_id": portfolio_id, "version": 0}
+    assert await storage.portfolios.find_by_user("conformance-missing") is None
+    assert await storage.portfolios.exists(user_id)
+    assert not await storage.portfolios.exists("conformance-missing")
+
+
+@check
+async def portfolio_find_by_users(storage):
+    user_a, portfolio_a = await new_user(storage)
+    user_b, portfolio_b = await new_user(storage)
+    documents = await storage.portfolios.find_by_users([user_b, "conformance-missing", user_a])
+    assert sorted(document["_id"] for document in documents) == sorted([portfolio_a, portfolio_b])
+    projected = await storage.portfolios.find_by_users([user_a], ("_id", "version"))
+    assert projected == [{"_id": portfolio_a, "userId": user_a, "version": 0}], projected
+    assert await storage.portfolios.find_by_users([]) == []
+
+
+@check
+async def portfolio_user_id_is_unique(storage):
+    user_id, _ = await new_user(storage)
+    try:
+        await storage.portfolios.insert(new_portfolio(user_id))
+    except DuplicateKeyError:
+        return
+    raise AssertionError("second insert for the same userId did not raise DuplicateKeyError")
+
+
+@check
+async def portfolio_update_returns_new_document(storage):
+    user_id, _ = await new_user(storage)
+    updated = await storage.portfolios.update(
+        user_id, PortfolioUpdate(personalInfo=PersonalInfo(name="Renamed", title="Tester"))
+    )
+    assert updated["personalInfo"]["name"] == "Renamed" and updated["version"] == 1
+    assert updated["stats"][0]["label"] == "One"
+    assert (await storage.portfolios.find_by_user(user_id))["personalInfo"]["name"] == "Renamed"
+    assert await storage.portfolios.update("conformance-missing", PortfolioUpdate()) is None
+
+
+@check
+async def portfolio_bump_version(storage):
+    user_id, portfolio_id = await new_user(storage)
+    assert await storage.portfolios.bump_version(portfolio_id) == 1
+    assert await storage.portfolios.bump_version(portfolio_id) == 2
+    assert (await storage.portfolios.find_by_user(user_id, ("version",)))["version"] == 2
+    assert await storage.portfolios.bump_version(ObjectId()) == 0
+
+
+@check
+async def portfolio_counters(storage):
+    user_id, portfolio_id = await new_user(storage)
+    before = (await storage.portfolios.find_by_user(user_id))["updatedAt"]
+    assert await storage.portfolios.bump_version(portfolio_id, {"projects": 2, "experienceDays": 30}) == 1
+    assert await storage.portfolios.bump_version(portfolio_id, {"projects": -1}) == 2
+    document = await storage.portfolios.find_by_user(user_id)
+    assert document["counters"] == {"projects": 1, "experienceDays": 30}, document["counters"]
+    assert document["updatedAt"] >= before
+    previous, version = await storage.portfolios.set_counters(portfolio_id, {"projects": 4})
+    assert previous == {"projects": 1, "experienceDays": 30} and version == 3
+    assert (await storage.portfolios.find_by_user(user_id, ("counters",)))["counters"] == {"projects": 4}
+    assert await storage.portfolios.set_counters(ObjectId(), {}) is None
+    assert (user_id, portfolio_id) in [owner async for owner in storage.portfolios.owners()]
+
+
+@check
+async def section_list_is_ordered(storage):
+    _, portfolio_id = await new_user(storage)
+    store = storage.sections["experience"]
+    first = await store.insert(portfolio_id, experience(2, "tie-first"))
+    await store.insert(portfolio_id, experience(3))
+    await store.insert(portfolio_id, experience(1))
+    await store.insert(portfolio_id, experience(2, "tie-second"))
+    items = await store.list(portfolio_id)
+    assert roles(items) == ["Role 1", "tie-first", "tie-second", "Role 3"], roles(items)
+    assert items[1]["_id"] == first.id and items[1]["portfolioId"] == portfolio_id
+    assert roles(await store.list(portfolio_id, 2)) == ["Role 1", "tie-first"]
+    assert await store.list(ObjectId()) == []
+
+
+@check
+async def section_list_many(storage):
+    _, portfolio_a = await new_user(storage)
+    _, portfolio_b = await new_user(storage)
+    store = storage.sections["experience"]
+    await store.insert_many(portfolio_a, [experience(3), experience(1), experience(2)])
+    await store.insert(portfolio_b, experience(1, "b"))
+    missing = ObjectId()
+    groups = await store.list_many([portfolio_a, portfolio_b, missing])
+    assert roles(groups[portfolio_a]) == ["Role 1", "Role 2", "Role 3"] and roles(groups[portfolio_b]) == ["b"]
+    assert groups[missing] == []
+    limited = await store.list_many([portfolio_a, portfolio_b], 2, ("_id", "role"))
+    assert roles(limited[portfolio_a]) == ["Role 1", "Role 2"] and set(limited[portfolio_a][0]) == {"_id", "role"}
+    assert await store.list_many([]) == {}
+
+
+@check
+async def section_get(storage):
+    _, portfolio_id = await new_user(storage)
+    store = storage.sections["experience"]
+    item = await store.insert(portfolio_id, experience(1))
+    document = await store.get(portfolio_id, item.id)
+    assert document["_id"] == item.id and document["role"] == "Role 1"
+    assert await store.get(portfolio_id, item.id, ("_id", "current")) == {"_id": item.id, "current": False}
+    assert await store.get(ObjectId(), item.id) is None
+    assert await store.get(portfolio_id, ObjectId()) is None
+
+
+@check
+async def section_items_are_scoped_to_portfolio(storage):
+    _, portfolio_a = await new_user(storage)
+    _, portfolio_b = await new_user(storage)
+    store = storage.sections["experience"]
+    item = await store.insert(portfolio_a, experience(1))
+    await store.insert(portfolio_b, experience(1, "other"))
+    assert roles(await store.list(portfolio_a)) == ["Role 1"]
+    assert await store.update(portfolio_b, item.id, ExperienceUpdate(role="x")) is None
+    assert not await store.delete(portfolio_b, item.id)
+    assert len(await store.list(portfolio_a)) == 1
+
+
+@check
+async def section_pages_and_iterate(storage):
+    _, portfolio_id = await new_user(storage)
+    store = storage.sections["experience"]
+    await store.insert_many(portfolio_id, [experience(order % 4) for order in range(11)])
+    expected = await store.list(portfolio_id)
+    seen, after = [], None
+    while True:
+        items, cursor = await store.page(portfolio_id, 3, after)
+        seen += items
+        if cursor is None:
+            break
+        after = decode_cursor(cursor)
+    assert [item["_id"] for item in seen] == [item["_id"] for item in expected]
+    iterated = [item async for item in store.iterate(portfolio_id, batch_size=2)]
+    assert [item["_id"] for item in iterated] == [item["_id"] for item in expected]
+    position = (expected[4]["order"], expected[4]["_id"])
+    tail = [item async for item in store.iterate(portfolio_id, after=position, limit=3, batch_size=2)]
+    assert [item["_id"] for item in tail] == [item["_id"] for item in expected[5:8]]
+
+
+@check
+async def section_update_returns_new_document(storage):
+    _, portfolio_id = await new_user(storage)
+    store = storage.sections["experience"]
+    item = await store.insert(portfolio_id, experience(1))
+    await store.insert(portfolio_id, experience(2))
+    updated = await store.update(portfolio_id, item.id, ExperienceUpdate(role="Moved", order=5))
+    assert updated["_id"] == item.id and updated["role"] == "Moved" and updated["order"] == 5
+    assert updated["company"] == "Company" and updated["updatedAt"] >= updated["createdAt"]
+    assert roles(await store.list(portfolio_id)) == ["Role 2", "Moved"]
+    assert await store.update(portfolio_id, ObjectId(), ExperienceUpdate(role="x")) is None
+
+
+@check
+async def section_delete(storage):
+    _, portfolio_id = await new_user(storage)
+    store = storage.sections["experience"]
+    item = await store.insert(portfolio_id, experience(1))
+    assert await store.delete(portfolio_id, item.id)
+    assert not await store.delete(portfolio_id, item.id)
+    assert await store.list(portfolio_id) == []
+
+
+@check
+async def section_insert_many(storage):
+    _, portfolio_id = await new_user(storage)
+    store = storage.sections["experience"]
+    results = await store.insert_many(portfolio_id, [experience(2), experience(1)], ordered=False)
+    assert [result["status"] for result in results] == ["created", "created"]
+    assert [result["index"] for result in results] == [0, 1]
+    assert roles(await store.list(portfolio_id)) == ["Role 1", "Role 2"]
+    assert await store.insert_many(portfolio_id, []) == []
+
+
+@check
+async def section_reorder(storage):
+    _, portfolio_id = await new_user(storage)
+    store = storage.sections["experience"]
+    a = await store.insert(portfolio_id, experience(1, "a"))
+    b = await store.insert(portfolio_id, experience(2, "b"))
+    c = await store.insert(portfolio_id, experience(3, "c"))
+    results = await store.reorder(portfolio_id, [str(c.id), str(a.id), "not-an-id", str(ObjectId()), str(b.id)])
+    assert [result["status"] for result in results] == ["updated", "updated", "not_found", "not_found", "updated"]
+    assert [result["order"] for result in results] == [1, 2, 3, 4, 5]
+    assert roles(await store.list(portfolio_id)) == ["c", "a", "b"]
+
+
+@check
+async def returned_documents_are_detached(storage):
+    user_id, portfolio_id = await new_user(storage)
+    store = storage.sections["experience"]
+    await store.insert(portfolio_id, experience(1))
+    (await store.list(portfolio_id))[0]["highlights"].append("mutated")
+    (await storage.portfolios.find_by_user(user_id))["stats"].clear()
+    assert (await store.list(portfolio_id))[0]["highlights"] == ["a", "b"]
+    assert len((await storage.portfolios.find_by_user(user_id))["stats"]) == 1
+
+
+async def open_storage(backend: str, mongo_url: str, scratch_dir: str):
+    """(storage, cleanup coroutine function) for a backend, or None if it cannot run here"""
+    if backend == "memory":
+        return build_storage("memory"), None
+    if backend == "sqlite":
+        storage = build_storage("sqlite", sqlite_path=os.path.join(scratch_dir, "conformance.sqlite3"))
+        return storage, None
+    db_name = f"storage_conformance_{uuid.uuid4().hex[:8]}"
+    if mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=5000)
+    else:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            return None
+        client = AsyncMongoMockClient()
+    db = client[db_name]
+    # The unique userId index is what makes duplicate inserts fail
+    await db.portfolios.create_index([("userId", 1)], unique=True)
+
+    async def cleanup():
+        await client.drop_database(db_name)
+
+    return build_storage("mongo", db), cleanup
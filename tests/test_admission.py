@@ -0,0 +1,138 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from services.admission import AdmissionMiddleware, admission_controller, build_admission_controller, route_class
+
+pytestmark = pytest.mark.anyio
+
+ADDRESS = ("mongo", 27017)
+
+
+@pytest.mark.parametrize("method, path, expected", [
+    ("GET", "/api/portfolio/u", "read"),
+    ("POST", "/api/portfolios:batchGet", "read"),
+    ("PUT", "/api/portfolio/u/projects/1", "write"),
+    ("POST", "/api/seed-data", "bulk"),
+    ("POST", "/api/admin/counters:rebuild", "bulk"),
+    ("GET", "/api/portfolio/u/events", None),
+    ("GET", "/api/stats", None),
+    ("GET", "/metrics", None),
+])
+def test_route_class(method, path, expected):
+    assert route_class(method, path) == expected
+
+
+def slow_app(controller, seconds=0.2):
+    app = FastAPI()
+
+    @app.get("/api/portfolio/{user_id}")
+    async def read(user_id: str):
+        await asyncio.sleep(seconds)
+        return {"userId": user_id}
+
+    return AdmissionMiddleware(app, controller)
+
+
+async def test_queues_then_sheds_with_retry_after():
+    controller = build_admission_controller()
+    read = controller.limiters["read"]
+    read.limit, read.queue_size, read.queue_timeout = 2, 3, 5
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=slow_app(controller)), base_url="http://test") as client:
+        responses = await asyncio.gather(*[client.get(f"/api/portfolio/{i}") for i in range(8)])
+    assert sorted(response.status_code for response in responses) == [200] * 5 + [503] * 3
+    rejected = next(response for response in responses if response.status_code == 503)
+    assert rejected.headers["Retry-After"] == str(controller.retry_after)
+    assert read.stats()["rejected"] == 3 and read.in_flight == 0 and read.stats()["waiting"] == 0
+
+
+async def test_gives_up_after_the_queue_timeout():
+    controller = build_admission_controller()
+    read = controller.limiters["read"]
+    read.limit, read.queue_size, read.queue_timeout = 1, 8, 0.1
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=slow_app(controller)), base_url="http://test") as client:
+        responses = await asyncio.gather(*[client.get(f"/api/portfolio/{i}") for i in range(3)])
+    assert sorted(response.status_code for response in responses) == [200, 503, 503]
+    assert read.timed_out == 2 and read.in_flight == 0
+
+
+async def test_shed_requests_keep_cors_headers(client, monkeypatch):
+    read = admission_controller.limiters["read"]
+    monkeypatch.setattr(read, "limit", 0)
+    monkeypatch.setattr(read, "queue_size", 0)
+    response = await client.get("/api/portfolio/anyone", headers={"Origin": "https://example.com"})
+    assert response.status_code == 503 and response.headers["Retry-After"]
+    assert response.headers["Access-Control-Allow-Origin"] == "*"
+    assert (await client.get("/api/stats")).status_code == 200
+
+
+def adjust(controller, clock, latencies):
+    for latency in latencies:
+        controller.observe(latency)
+    clock[0] += controller.adjust_interval
+    controller.maybe_adjust()
+
+
+def test_limits_follow_latency_and_recover():
+    clock = [0.0]
+    controller = build_admission_controller()
+    controller.clock, controller._adjusted_at = (lambda: clock[0]), 0.0
+    read, bulk = controller.limiters["read"], controller.limiters["bulk"]
+    initial = read.limit
+
+    adjust(controller, clock, [1.0] * 100)
+    assert read.limit == max(read.min_limit, int(initial * controller.decrease_factor))
+    # Under target: back up by one per interval towards the configured limit, saturated or not
+    adjust(controller, clock, [0.001] * 100)
+    assert read.limit == min(initial, int(initial * controller.decrease_factor) + 1)
+    for _ in range(initial):
+        adjust(controller, clock, [1.0] * 100)
+    assert read.limit == read.min_limit
+    # A quiet interval restores it at once
+    adjust(controller, clock, [])
+    assert read.limit == initial
+    # Growing past it takes saturation
+    adjust(controller, clock, [0.001])
+    assert read.limit == initial
+    read.saturated = True
+    adjust(controller, clock, [0.001])
+    assert read.limit == initial + 1
+    assert bulk.limit == bulk.initial_limit
+
+
+def event(command_name, request_id, command=None, reply=None):
+    return SimpleNamespace(
+        command_name=command_name, request_id=request_id, connection_id=ADDRESS,
+        command=command or {}, reply=reply or {}, duration_micros=1_000_000,
+    )
+
+
+def test_change_stream_waits_are_not_latency():
+    controller = build_admission_controller()
+    listener = controller.command_listener()
+    opened = event("aggregate", 1, {"aggregate": 1, "pipeline": [{"$changeStream": {}}]}, {"cursor": {"id": 42}})
+    listener.started(opened)
+    listener.succeeded(opened)
+    for request_id in range(2, 5):
+        waited = event("getMore", request_id, {"getMore": 42}, {"cursor": {"id": 42}})
+        listener.started(waited)
+        listener.succeeded(waited)
+    tailed = event("find", 5, {"find": "log", "tailable": True, "awaitData": True}, {"cursor": {"id": 7}})
+    listener.started(tailed)
+    listener.succeeded(tailed)
+    assert not controller._samples
+
+    # Ordinary commands, and getMores on other cursors, are sampled
+    for sampled in (event("find", 6, {"find": "projects"}), event("getMore", 7, {"getMore": 99})):
+        listener.started(sampled)
+        listener.succeeded(sampled)
+    assert len(controller._samples) == 2
+
+    listener.started(event("killCursors", 8, {"killCursors": "log", "cursors": [7]}))
+    closed = event("getMore", 9, {"getMore": 42}, {"cursor": {"id": 0}})
+    listener.started(closed)
+    listener.succeeded(closed)
+    assert not listener._awaiting_cursors and not listener._skipped
@@ -0,0 +1,41 @@
+import pytest
+
+import settings
+
+pytestmark = pytest.mark.anyio
+
+
+def project(title, order=0):
+    return {"title": title, "status": "Done", "icon": "shield", "description": "d", "tech": ["Wazuh"], "order": order}
+
+
+async def titles(client, user_id):
+    return [item["title"] for item in (await client.get(f"/api/portfolio/{user_id}/projects")).json()]
+
+
+async def test_batch_create_and_reorder(client, user_id):
+    created = await client.post(f"/api/portfolio/{user_id}/projects:batch", json={
+        "items": [project(title, order) for order, title in enumerate("ABC")],
+    })
+    assert created.status_code == 200 and created.json()["created"] == 3
+    items = (await client.get(f"/api/portfolio/{user_id}/projects")).json()
+    assert [item["title"] for item in items] == ["A", "B", "C"]
+
+    ids = [item["_id"] for item in reversed(items)]
+    reordered = await client.patch(f"/api/portfolio/{user_id}/projects/order", json={"ids": ids + ["0" * 24]})
+    assert reordered.json()["updated"] == 3 and reordered.json()["notFound"] == 1
+    assert await titles(client, user_id) == ["C", "B", "A"]
+
+    duplicated = await client.patch(f"/api/portfolio/{user_id}/projects/order", json={"ids": ids[:1] * 2})
+    assert duplicated.status_code == 400
+
+
+async def test_batches_are_bounded(client, user_id):
+    too_many_items = [project(str(order), order) for order in range(settings.SECTION_BATCH_MAX_ITEMS + 1)]
+    response = await client.post(f"/api/portfolio/{user_id}/projects:batch", json={"items": too_many_items})
+    assert response.status_code == 422
+    assert await titles(client, user_id) == []
+
+    too_many_ids = ["0" * 24] * (settings.SECTION_REORDER_MAX_IDS + 1)
+    response = await client.patch(f"/api/portfolio/{user_id}/projects/order", json={"ids": too_many_ids})
+    assert response.status_code == 422
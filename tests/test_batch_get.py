@@ -0,0 +1,22 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_batch_get_keeps_request_order_and_reports_missing(client, user_id):
+    await client.post("/api/portfolio", json={"userId": "other", "personalInfo": {"name": "Other", "title": "Tester"}})
+    await client.post(f"/api/portfolio/{user_id}/skills", json={"category": "Languages", "icon": "code", "skills": ["Python"]})
+
+    response = await client.post("/api/portfolios:batchGet", json={"userIds": ["other", "nobody", user_id, "other"]})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [data["portfolio"]["userId"] for data in body["portfolios"]] == ["other", user_id]
+    assert body["notFound"] == ["nobody"]
+    assert len(body["portfolios"][1]["skills"]) == 1
+    assert "version" not in body["portfolios"][0]["portfolio"]
+
+
+async def test_batch_get_limit(app, client, monkeypatch):
+    monkeypatch.setattr(app.settings, "PORTFOLIO_BATCH_MAX_SIZE", 2)
+    response = await client.post("/api/portfolios:batchGet", json={"userIds": ["a", "b", "c"]})
+    assert response.status_code == 400
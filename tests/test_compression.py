@@ -0,0 +1,47 @@
+import pytest
+
+from services.compression import ENCODERS, encoded_etag, negotiate
+
+pytestmark = pytest.mark.anyio
+
+
+def test_negotiate():
+    assert negotiate(None) is None
+    assert negotiate("identity") is None
+    assert negotiate("gzip") == "gzip"
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("*") == next(iter(ENCODERS))
+    assert negotiate("gzip;q=0.5, br;q=0") == "gzip"
+
+
+def test_encoded_etag():
+    assert encoded_etag('"abc"', None) == '"abc"'
+    assert encoded_etag('"abc"', "gzip") == '"abc-gzip"'
+
+
+async def test_large_bodies_are_compressed_once(app, client, user_id):
+    for number in range(20):
+        await client.post(f"/api/portfolio/{user_id}/skills", json={
+            "category": f"Category {number}", "icon": "code", "skills": ["Python", "Rust", "TypeScript", "Go"],
+        })
+    compressions = app.response_compressor.counters["gzip"]["compressions"]
+
+    plain = await client.get(f"/api/portfolio/{user_id}/skills", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    gzipped = await client.get(f"/api/portfolio/{user_id}/skills", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["vary"] == "Accept-Encoding, Accept"
+    assert gzipped.json() == plain.json()
+    assert gzipped.headers["ETag"] == encoded_etag(plain.headers["ETag"], "gzip")
+
+    again = await client.get(
+        f"/api/portfolio/{user_id}/skills", headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["ETag"]}
+    )
+    assert again.status_code == 304
+    await client.get(f"/api/portfolio/{user_id}/skills", headers={"Accept-Encoding": "gzip"})
+    assert app.response_compressor.counters["gzip"]["compressions"] == compressions + 1
+
+
+async def test_small_bodies_are_sent_as_is(client, user_id):
+    response = await client.get(f"/api/portfolio/{user_id}/skills", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
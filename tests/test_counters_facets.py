@@ -0,0 +1,50 @@
+import pytest
+
+from services.counters import count_items, rebuild_counters
+
+pytestmark = pytest.mark.anyio
+
+EXPERIENCE = {
+    "role": "Analyst", "company": "Acme", "location": "Remote", "period": "2019 - 2021",
+    "startDate": "2019-01-01T00:00:00", "endDate": "2021-01-01T00:00:00", "skills": ["Splunk", "Wazuh"],
+}
+
+
+async def portfolio_of(app, user_id):
+    return await app.db.portfolios.find_one({"userId": user_id})
+
+
+async def facet_counts(app, portfolio_id):
+    document = await app.db.portfolio_facets.find_one({"_id": portfolio_id})
+    counts = document["facets"].get("experienceSkills", {})
+    return {kind: {key: count for key, count in counts.get(kind, {}).items() if count} for kind in ("counts", "pairs")}
+
+
+async def test_repeated_edits_leave_counters_and_facets_alone(app, client, user_id):
+    portfolio_id = (await portfolio_of(app, user_id))["_id"]
+    # Writes only $inc an existing facets document (mongomock cannot run the rebuild pipeline)
+    await app.db.portfolio_facets.insert_one({"_id": portfolio_id, "facets": {}})
+    item = (await client.post(f"/api/portfolio/{user_id}/experience", json=EXPERIENCE)).json()
+    url = f"/api/portfolio/{user_id}/experience/{item['_id']}"
+
+    counters = (await portfolio_of(app, user_id))["counters"]
+    facets = await facet_counts(app, portfolio_id)
+    assert counters == {"experience": 1, "experienceDays": 731}
+    assert facets == {"counts": {"Splunk": 1, "Wazuh": 1}, "pairs": {"Splunk|Wazuh": 1}}
+
+    for update in ({"skills": ["Splunk", "Wazuh"]}, {"skills": ["Splunk", "Wazuh"]},
+                   {"endDate": EXPERIENCE["endDate"]}, {"endDate": EXPERIENCE["endDate"]}):
+        assert (await client.put(url, json=update)).status_code == 200
+        assert (await portfolio_of(app, user_id))["counters"] == counters
+        assert await facet_counts(app, portfolio_id) == facets
+
+    assert (await client.put(url, json={"endDate": "2020-01-01T00:00:00"})).status_code == 200
+    assert (await portfolio_of(app, user_id))["counters"]["experienceDays"] == 365
+    assert (await client.put(url, json={"skills": ["Splunk"]})).status_code == 200
+    assert await facet_counts(app, portfolio_id) == {"counts": {"Splunk": 1}, "pairs": {}}
+    assert not (await rebuild_counters(app.storage, portfolio_id))["drifted"]
+
+    assert (await client.delete(url)).status_code == 200
+    assert await facet_counts(app, portfolio_id) == {"counts": {}, "pairs": {}}
+    assert not any((await portfolio_of(app, user_id))["counters"].values())
+    assert not any((await count_items(app.storage, portfolio_id)).values())
@@ -0,0 +1,44 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+SKILL = {"category": "Languages", "icon": "code", "skills": ["Python"]}
+
+
+async def test_changes_since_a_token(client, user_id):
+    first = await client.get(f"/api/portfolio/{user_id}/changes")
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "no-store"
+    body = first.json()
+    assert body["full"] is True
+    assert body["portfolio"]["userId"] == user_id
+    assert "version" not in body["portfolio"]
+
+    unchanged = (await client.get(f"/api/portfolio/{user_id}/changes", params={"since": body["next"]})).json()
+    assert unchanged["full"] is False
+    assert unchanged["portfolio"] is None
+    assert unchanged["changed"]["skills"] == []
+
+    skill = (await client.post(f"/api/portfolio/{user_id}/skills", json=SKILL)).json()
+    changed = (await client.get(f"/api/portfolio/{user_id}/changes", params={"since": unchanged["next"]})).json()
+    assert changed["full"] is False
+    assert [item["_id"] for item in changed["changed"]["skills"]] == [skill["_id"]]
+
+    assert (await client.delete(f"/api/portfolio/{user_id}/skills/{skill['_id']}")).status_code == 200
+    deleted = (await client.get(f"/api/portfolio/{user_id}/changes", params={"since": changed["next"]})).json()
+    assert deleted["deleted"]["skills"] == [skill["_id"]]
+
+
+async def test_bad_token_is_400(client, user_id):
+    response = await client.get(f"/api/portfolio/{user_id}/changes", params={"since": "garbage"})
+    assert response.status_code == 400
+
+
+async def test_token_of_another_portfolio_resyncs_in_full(client, user_id):
+    other = await client.post("/api/portfolio", json={
+        "userId": "other", "personalInfo": {"name": "Other", "title": "Tester"},
+    })
+    assert other.status_code == 200
+    token = (await client.get("/api/portfolio/other/changes")).json()["next"]
+
+    assert (await client.get(f"/api/portfolio/{user_id}/changes", params={"since": token})).json()["full"] is True
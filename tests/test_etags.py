@@ -0,0 +1,58 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+SKILL = {"category": "Languages", "icon": "code", "skills": ["Python"]}
+
+
+async def test_portfolio_conditional_get(client, user_id):
+    first = await client.get(f"/api/portfolio/{user_id}")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('"')  # strong
+    assert first.headers["Cache-Control"] == "public, max-age=0, must-revalidate"
+
+    unchanged = await client.get(f"/api/portfolio/{user_id}", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == etag
+    assert unchanged.content == b""
+
+    response = await client.put(f"/api/portfolio/{user_id}", json={"personalInfo": {"name": "Renamed", "title": "Tester"}})
+    assert response.status_code == 200, response.text
+
+    changed = await client.get(f"/api/portfolio/{user_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["portfolio"]["personalInfo"]["name"] == "Renamed"
+
+
+async def test_section_write_changes_the_portfolio_and_section_etags(client, user_id):
+    portfolio_etag = (await client.get(f"/api/portfolio/{user_id}")).headers["ETag"]
+    section_etag = (await client.get(f"/api/portfolio/{user_id}/skills")).headers["ETag"]
+    assert section_etag != portfolio_etag
+
+    response = await client.post(f"/api/portfolio/{user_id}/skills", json=SKILL)
+    assert response.status_code == 200, response.text
+
+    section = await client.get(f"/api/portfolio/{user_id}/skills", headers={"If-None-Match": section_etag})
+    assert section.status_code == 200
+    assert len(section.json()) == 1
+    assert (await client.get(
+        f"/api/portfolio/{user_id}/skills", headers={"If-None-Match": section.headers["ETag"]}
+    )).status_code == 304
+    portfolio = await client.get(f"/api/portfolio/{user_id}", headers={"If-None-Match": portfolio_etag})
+    assert portfolio.status_code == 200
+
+
+async def test_if_none_match_lists_and_wildcard(client, user_id):
+    etag = (await client.get(f"/api/portfolio/{user_id}/skills")).headers["ETag"]
+
+    listed = await client.get(f"/api/portfolio/{user_id}/skills", headers={"If-None-Match": f'"stale", {etag}'})
+    assert listed.status_code == 304
+    wildcard = await client.get(f"/api/portfolio/{user_id}/skills", headers={"If-None-Match": "*"})
+    assert wildcard.status_code == 304
+    assert (await client.get(f"/api/portfolio/{user_id}/skills", headers={"If-None-Match": '"stale"'})).status_code == 200
+
+
+async def test_missing_portfolio_is_404(client):
+    assert (await client.get("/api/portfolio/nobody", headers={"If-None-Match": "*"})).status_code == 404
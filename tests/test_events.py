@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from services.events import EventHub, change
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def hub():
+    hub = EventHub(replay_size=2, heartbeat_seconds=60, retry_ms=1000, idle_ttl=60, max_stream_seconds=60)
+    yield hub
+    await hub.stop()
+
+
+async def _next(stream):
+    return (await asyncio.wait_for(stream.__anext__(), 1)).decode("utf-8")
+
+
+async def test_changes_are_streamed_and_resumable(hub):
+    stream = hub.subscribe("alice")
+    assert (await _next(stream)).startswith("retry: 1000")
+
+    hub.publish("alice", 2, [change("skills", "create", "id-1", {"_id": "id-1"})])
+    frame = await _next(stream)
+    assert "event: change" in frame and '"version":2' in frame and '"op":"create"' in frame
+    last_event_id = frame.split("\n")[0][len("id: "):]
+    await stream.aclose()
+
+    # Missed while disconnected, replayed on resume
+    hub.publish("alice", 3, [change("skills", "delete", "id-1")])
+    resumed = hub.subscribe("alice", last_event_id)
+    await _next(resumed)
+    assert '"op":"delete"' in await _next(resumed)
+    assert hub.resumes == 1
+    await resumed.aclose()
+
+
+async def test_unknown_or_dropped_positions_get_a_refresh(hub):
+    stream = hub.subscribe("alice", "otherepoch-5")
+    await _next(stream)
+    assert "event: refresh" in await _next(stream)
+    await stream.aclose()
+
+    stream = hub.subscribe("alice")
+    await _next(stream)
+    hub.publish("alice", 2, [change("skills", "create", "id-1")])
+    last_event_id = (await _next(stream)).split("\n")[0][len("id: "):]
+    await stream.aclose()
+    # More events than the replay buffer holds since last_event_id
+    hub.publish("alice", 3, [change("skills", "create", str(number)) for number in range(3)])
+    resumed = hub.subscribe("alice", last_event_id)
+    await _next(resumed)
+    assert "event: refresh" in await _next(resumed)
+    await resumed.aclose()
+
+
+async def test_events_published_right_after_connecting_are_delivered(hub):
+    stream = hub.subscribe("alice")
+    first = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0)
+    # Published while the retry frame is still on its way to the client
+    hub.publish("alice", 2, [change("skills", "create", "id-1")])
+    assert (await first).startswith(b"retry:")
+    assert "event: change" in await _next(stream)
+    await stream.aclose()
+
+
+async def test_users_without_subscribers_are_not_buffered(hub):
+    hub.publish("nobody", 2, [change("skills", "create", "id-1")])
+    assert hub.stats()["channels"] == 0
+
+
+async def test_missing_portfolio_stream_is_404(client):
+    assert (await client.get("/api/portfolio/nobody/events")).status_code == 404
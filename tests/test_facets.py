@@ -0,0 +1,23 @@
+from services.facets import FACETS_BY_SECTION, tag_deltas
+
+TECH = FACETS_BY_SECTION["projects"]
+
+
+def counts(deltas, kind):
+    return {key.split(".", 3)[3]: delta for key, delta in deltas.items() if key.split(".")[2] == kind}
+
+
+def test_pairs_are_counted_up_to_the_tag_cap(monkeypatch):
+    monkeypatch.setattr("settings.FACET_PAIR_MAX_TAGS", 4)
+    capped = tag_deltas(TECH, [(None, {"tech": ["a", "b", "c", "d"]})])
+    assert len(counts(capped, "counts")) == 4 and len(counts(capped, "pairs")) == 6
+
+    over = tag_deltas(TECH, [(None, {"tech": ["a", "b", "c", "d", "e"]})])
+    assert len(counts(over, "counts")) == 5 and counts(over, "pairs") == {}
+
+
+def test_shrinking_below_the_cap_adds_the_pairs(monkeypatch):
+    monkeypatch.setattr("settings.FACET_PAIR_MAX_TAGS", 4)
+    deltas = tag_deltas(TECH, [({"tech": ["a", "b", "c", "d", "e"]}, {"tech": ["a", "b"]})])
+    assert counts(deltas, "counts") == {"c": -1, "d": -1, "e": -1}
+    assert counts(deltas, "pairs") == {"a|b": 1}
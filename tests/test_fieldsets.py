@@ -0,0 +1,39 @@
+import pytest
+
+from services.fieldsets import InvalidFieldset, parse_fieldset
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("include, fields", [
+    ("nope", None),
+    (None, "projects"),
+    (None, "projects.nope"),
+    ("skills", "projects.title"),
+])
+def test_invalid_fieldsets(include, fields):
+    with pytest.raises(InvalidFieldset):
+        parse_fieldset(include, fields)
+
+
+def test_no_fieldset_is_the_full_portfolio():
+    assert parse_fieldset(None, None) is None
+    assert parse_fieldset("", " ") is None
+
+
+async def test_include_and_fields(client, user_id):
+    await client.post(f"/api/portfolio/{user_id}/projects", json={
+        "title": "SOC", "status": "Done", "icon": "shield", "description": "d", "tech": ["Wazuh"],
+    })
+    await client.post(f"/api/portfolio/{user_id}/skills", json={"category": "Languages", "icon": "code", "skills": []})
+
+    sparse = await client.get(f"/api/portfolio/{user_id}", params={"include": "projects", "fields": "projects.title"})
+    assert sparse.status_code == 200
+    body = sparse.json()
+    # The portfolio is always included; sections left out are not
+    assert set(body) == {"portfolio", "projects"}
+    assert [set(project) for project in body["projects"]] == [{"_id", "title"}]
+
+    full = await client.get(f"/api/portfolio/{user_id}")
+    assert sparse.headers["ETag"] != full.headers["ETag"]
+    assert (await client.get(f"/api/portfolio/{user_id}", params={"include": "nope"})).status_code == 400
@@ -0,0 +1,35 @@
+import pytest
+
+from models.indexes import INDEXES, RETIRED_INDEXES
+from services.index_manager import ensure_indexes
+
+pytestmark = pytest.mark.anyio
+
+ALL = sorted(f"{spec.collection}.{spec.name}" for spec in INDEXES)
+
+
+async def test_ensure_indexes_is_idempotent(app):
+    planned = await ensure_indexes(app.db, dry_run=True)
+    assert sorted(planned["missing"]) == ALL
+    assert planned["created"] == []
+
+    created = await ensure_indexes(app.db)
+    assert sorted(created["created"]) == ALL
+    assert created["errors"] == []
+
+    again = await ensure_indexes(app.db)
+    assert sorted(again["present"]) == ALL
+    assert again["created"] == again["conflicts"] == again["unmanaged"] == []
+
+
+async def test_conflicts_unmanaged_and_retired_indexes(app):
+    retired = RETIRED_INDEXES[0]
+    await app.db[retired.collection].create_index(list(retired.keys), name=retired.name)
+    await app.db.portfolios.create_index([("userId", 1)], name="userId_unique")  # not unique
+    await app.db.portfolios.create_index([("personalInfo.name", 1)], name="by_name")
+
+    report = await ensure_indexes(app.db)
+    assert [conflict["index"] for conflict in report["conflicts"]] == ["portfolios.userId_unique"]
+    assert report["unmanaged"] == ["portfolios.by_name"]
+    assert report["dropped"] == [f"{retired.collection}.{retired.name}"]
+    assert retired.name not in await app.db[retired.collection].index_information()
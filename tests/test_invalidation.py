@@ -0,0 +1,97 @@
+import pytest
+from bson import ObjectId
+
+from services.invalidation import InvalidationBus
+
+pytestmark = pytest.mark.anyio
+
+
+def bus(max_tracked):
+    delivered = []
+    listener = lambda user_id, version, sections: delivered.append((user_id, version))
+    return InvalidationBus(None, "changestream", listener, max_tracked=max_tracked), delivered
+
+
+async def test_remote_versions_evict_once():
+    invalidation, delivered = bus(max_tracked=10)
+    await invalidation.publish("a", ObjectId(), 3)
+    invalidation._deliver("a", 3, (), None)
+    invalidation._deliver("a", 4, (), None)
+    invalidation._deliver("a", 4, (), None)
+    assert delivered == [("a", 4)] and invalidation.duplicates == 2
+
+
+async def test_tracked_users_are_bounded():
+    invalidation, delivered = bus(max_tracked=2)
+    for user_id in ("a", "b", "c"):
+        await invalidation.publish(user_id, ObjectId(), 1)
+    assert invalidation.stats()["tracked_users"] == 2 and invalidation.stats()["tracked_portfolios"] == 2
+    # "a" was forgotten: its known version is evicted again, which is harmless
+    invalidation._deliver("a", 1, (), None)
+    invalidation._deliver("c", 1, (), None)
+    assert delivered == [("a", 1)]
+
+
+class FakeStream:
+    """A change stream yielding the given changes (None for an empty getMore), then failing"""
+
+    def __init__(self, changes, tokens):
+        self.changes = list(changes)
+        self.tokens = iter(tokens)
+        self.resume_token = next(self.tokens)
+        self.alive = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def try_next(self):
+        if not self.changes:
+            raise ConnectionError("stream dropped")
+        self.resume_token = next(self.tokens)
+        return self.changes.pop(0)
+
+
+class FakeDb:
+    def __init__(self, streams):
+        self.streams = list(streams)
+        self.resumed_after = []
+
+    def watch(self, pipeline, full_document=None, resume_after=None):
+        self.resumed_after.append(resume_after)
+        return self.streams.pop(0)
+
+
+async def test_quiet_stream_failures_resume_instead_of_resetting():
+    db = FakeDb([FakeStream([None, None], ["opened", "idle-1", "idle-2"])])
+    invalidation = InvalidationBus(db, "changestream", lambda *change: None)
+
+    with pytest.raises(ConnectionError):
+        await invalidation._watch()
+    assert invalidation._resume_token == "idle-2"
+
+    db.streams.append(FakeStream([], ["reopened"]))
+    with pytest.raises(ConnectionError):
+        await invalidation._watch()
+    assert db.resumed_after == [None, "idle-2"]
+
+
+async def test_a_failure_right_after_opening_keeps_the_opening_token():
+    db = FakeDb([FakeStream([], ["opened"])])
+    invalidation = InvalidationBus(db, "changestream", lambda *change: None)
+
+    with pytest.raises(ConnectionError):
+        await invalidation._watch()
+    assert invalidation._resume_token == "opened"
+
+
+async def test_a_reset_keeps_snapshot_files(app, monkeypatch, tmp_path):
+    from services.snapshots import SnapshotStore
+
+    monkeypatch.setattr(app, "snapshots", SnapshotStore(str(tmp_path), 1024))
+    app.snapshots.write("alice", b"{}", '"etag"', 1)
+
+    app.apply_remote_write(None, None, ())
+    assert app.snapshots.get("alice") is not None
@@ -0,0 +1,18 @@
+import random
+
+import pytest
+
+from benchmarks.load_test import MIXES, LoadTest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("mix", sorted(MIXES))
+async def test_every_mix_runs_without_errors(client, mix):
+    test = LoadTest(client, ["bench-0", "bench-1"], random.Random(1))
+    await test.seed(3)
+
+    result = await test.run(MIXES[mix], 60, 4)
+    assert result["total"]["requests"] == 60
+    assert result["total"]["errors"] == 0, result["operations"]
+    assert result["total"]["p50_ms"] <= result["total"]["p99_ms"]
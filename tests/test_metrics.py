@@ -0,0 +1,16 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_requests_are_labelled_by_route_template(client, user_id):
+    await client.get(f"/api/portfolio/{user_id}/skills")
+    await client.get("/api/no/such/route")
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'route="/api/portfolio/{user_id}/skills"' in text
+    assert user_id not in text
+    assert 'route="<unmatched>"' in text
@@ -0,0 +1,136 @@
+import base64
+import json
+
+import pytest
+from bson import ObjectId
+
+from services.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+pytestmark = pytest.mark.anyio
+
+
+async def _add_skills(client, user_id, orders):
+    for order in orders:
+        response = await client.post(f"/api/portfolio/{user_id}/skills", json={
+            "category": f"Category {order}", "icon": "code", "skills": [], "order": order,
+        })
+        assert response.status_code == 200, response.text
+
+
+def test_cursor_round_trip():
+    object_id = ObjectId()
+    assert decode_cursor(encode_cursor({"_id": object_id, "order": 3})) == (3, object_id)
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not a cursor")
+
+
+def _token(position) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("position", [
+    [{"$gt": 0}, "0123456789abcdef01234567"],
+    [True, "0123456789abcdef01234567"],
+    [1.5, "0123456789abcdef01234567"],
+    [1, {"$gt": ""}],
+    [1, "not an id"],
+    [1],
+])
+def test_tampered_cursors_are_rejected(position):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(_token(position))
+
+
+async def test_tampered_cursor_is_400(client, user_id):
+    cursor = _token([{"$gt": 0}, "0123456789abcdef01234567"])
+    response = await client.get(f"/api/portfolio/{user_id}/skills", params={"limit": 2, "cursor": cursor})
+    assert response.status_code == 400
+    response = await client.get(
+        f"/api/portfolio/{user_id}/skills", params={"cursor": cursor}, headers={"Accept": "application/x-ndjson"}
+    )
+    assert response.status_code == 400
+
+
+async def test_keyset_pages_cover_every_item_once(client, user_id):
+    # Ties on order are broken by _id
+    await _add_skills(client, user_id, [2, 0, 1, 1, 0, 2, 1])
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = await client.get(f"/api/portfolio/{user_id}/skills", params=params)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page["items"]) <= 3
+        seen.extend(page["items"])
+        cursor = page["nextCursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == 7
+    assert len({item["_id"] for item in seen}) == 7
+    keys = [(item["order"], item["_id"]) for item in seen]
+    assert keys == sorted(keys)
+
+
+async def test_pages_are_not_capped_at_100(client, user_id):
+    await _add_skills(client, user_id, range(120))
+
+    response = await client.get(f"/api/portfolio/{user_id}/skills")
+    assert len(response.json()) == 120
+    page = (await client.get(f"/api/portfolio/{user_id}/skills", params={"limit": 110})).json()
+    assert len(page["items"]) == 110
+    assert page["nextCursor"] is not None
+
+
+async def test_bad_cursor_and_limit(client, user_id):
+    response = await client.get(f"/api/portfolio/{user_id}/skills", params={"cursor": "garbage"})
+    assert response.status_code == 400
+    response = await client.get(f"/api/portfolio/{user_id}/skills", params={"limit": 0})
+    assert response.status_code == 422
+
+
+async def test_ndjson_stream(client, user_id):
+    await _add_skills(client, user_id, [1, 0, 2])
+
+    response = await client.get(f"/api/portfolio/{user_id}/skills", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["order"] for item in items] == [0, 1, 2]
+
+    etag = response.headers["ETag"]
+    cached = await client.get(
+        f"/api/portfolio/{user_id}/skills", headers={"Accept": "application/x-ndjson", "If-None-Match": etag}
+    )
+    assert cached.status_code == 304
+
+    limited = await client.get(
+        f"/api/portfolio/{user_id}/skills", params={"limit": 2}, headers={"Accept": "application/x-ndjson"}
+    )
+    assert len(limited.text.splitlines()) == 2
+
+
+async def test_each_representation_has_its_own_etag(client, user_id):
+    await _add_skills(client, user_id, [0, 1, 2])
+    ndjson = {"Accept": "application/x-ndjson"}
+    url = f"/api/portfolio/{user_id}/skills"
+
+    json_list = await client.get(url)
+    stream = await client.get(url, headers=ndjson)
+    first_page = await client.get(url, params={"limit": 2}, headers=ndjson)
+    etags = {json_list.headers["ETag"], stream.headers["ETag"], first_page.headers["ETag"]}
+    assert len(etags) == 3
+    for response in (json_list, stream, first_page):
+        assert response.headers["Vary"] == "Accept-Encoding, Accept"
+
+    # A body held for one representation is never revalidated as another
+    held = await client.get(url, headers={**ndjson, "If-None-Match": json_list.headers["ETag"]})
+    assert held.status_code == 200 and len(held.text.splitlines()) == 3
+    held = await client.get(url, headers={**ndjson, "If-None-Match": first_page.headers["ETag"]})
+    assert held.status_code == 200
+    cursor = (await client.get(url, params={"limit": 2})).json()["nextCursor"]
+    next_page = await client.get(
+        url, params={"limit": 2, "cursor": cursor}, headers={**ndjson, "If-None-Match": first_page.headers["ETag"]}
+    )
+    assert next_page.status_code == 200 and len(next_page.text.splitlines()) == 1
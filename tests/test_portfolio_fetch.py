@@ -0,0 +1,41 @@
+import pytest
+from pymongo.errors import OperationFailure
+
+from services import portfolio_fetch
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def failing_aggregate(monkeypatch):
+    """Make the $lookup fetch fail with a given server error code"""
+    monkeypatch.setattr(portfolio_fetch, "_aggregate_supported", True)
+    calls = []
+
+    def fail_with(code):
+        async def aggregate(*args, **kwargs):
+            calls.append(code)
+            raise OperationFailure("aggregate failed", code=code)
+
+        monkeypatch.setattr(portfolio_fetch, "fetch_portfolio_aggregate", aggregate)
+        return calls
+
+    return fail_with
+
+
+@pytest.mark.parametrize("code", [189, 50, 10334])  # stepdown, maxTimeMS expired, over 16 MB
+async def test_transient_failures_fall_back_once(app, user_id, failing_aggregate, code):
+    calls = failing_aggregate(code)
+    for _ in range(2):
+        result = await portfolio_fetch.fetch_portfolio(app.storage, user_id, mode="aggregate")
+        assert result["portfolio"]["userId"] == user_id
+    assert calls == [code, code] and portfolio_fetch._aggregate_supported
+
+
+@pytest.mark.parametrize("code", sorted(portfolio_fetch.UNSUPPORTED_PIPELINE_CODES))
+async def test_unsupported_pipelines_switch_to_fanout(app, user_id, failing_aggregate, code):
+    calls = failing_aggregate(code)
+    for _ in range(2):
+        result = await portfolio_fetch.fetch_portfolio(app.storage, user_id, mode="aggregate")
+        assert result["portfolio"]["userId"] == user_id
+    assert calls == [code] and not portfolio_fetch._aggregate_supported
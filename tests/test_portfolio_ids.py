@@ -0,0 +1,70 @@
+import pytest
+from bson import ObjectId
+
+from services.portfolio_ids import PortfolioIdResolver
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakePortfolios:
+    def __init__(self, ids):
+        self.ids = ids
+        self.queries = 0
+
+    async def find_by_user(self, user_id, fields=None):
+        self.queries += 1
+        return {"_id": self.ids[user_id]} if user_id in self.ids else None
+
+
+async def test_positive_and_negative_entries_expire_separately():
+    clock = FakeClock()
+    portfolio_id = ObjectId()
+    portfolios = FakePortfolios({"alice": portfolio_id})
+    resolver = PortfolioIdResolver(10, ttl_seconds=60, negative_ttl_seconds=1, clock=clock)
+
+    assert await resolver.resolve(portfolios, "alice") == portfolio_id
+    assert await resolver.resolve(portfolios, "alice") == portfolio_id
+    assert await resolver.resolve(portfolios, "bob") is None
+    assert await resolver.resolve(portfolios, "bob") is None
+    assert portfolios.queries == 2
+    assert (resolver.hits, resolver.negative_hits, resolver.misses) == (1, 1, 2)
+
+    clock.now = 2
+    assert await resolver.resolve(portfolios, "bob") is None
+    assert await resolver.resolve(portfolios, "alice") == portfolio_id
+    assert portfolios.queries == 3
+
+
+async def test_lru_bound_prime_and_forget():
+    portfolios = FakePortfolios({})
+    resolver = PortfolioIdResolver(2, ttl_seconds=60, negative_ttl_seconds=1)
+    ids = [ObjectId() for _ in range(3)]
+    for number, portfolio_id in enumerate(ids):
+        resolver.prime(f"user-{number}", portfolio_id)
+
+    assert resolver.cached("user-0") == (False, None)
+    assert resolver.cached("user-2") == (True, ids[2])
+    assert resolver.evictions == 1
+
+    resolver.forget("user-2")
+    assert await resolver.resolve(portfolios, "user-2") is None
+    assert portfolios.queries == 1
+
+
+async def test_creating_a_portfolio_forgets_the_negative_entry(client):
+    assert (await client.get("/api/portfolio/late-user/skills")).status_code == 404
+    response = await client.post("/api/portfolio", json={
+        "userId": "late-user", "personalInfo": {"name": "Test User", "title": "Tester"},
+    })
+    assert response.status_code == 200
+    assert (await client.post("/api/portfolio/late-user/skills", json={
+        "category": "Languages", "icon": "code", "skills": [],
+    })).status_code == 200
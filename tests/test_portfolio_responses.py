@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+INTERNAL_FIELDS = ("counters", "version")
+
+
+def assert_public(portfolio):
+    assert portfolio["personalInfo"]["name"] == "Test User"
+    for field in INTERNAL_FIELDS:
+        assert field not in portfolio
+
+
+async def test_portfolio_bookkeeping_stays_internal(client, user_id):
+    await client.post(f"/api/portfolio/{user_id}/projects", json={
+        "title": "SOC", "status": "Done", "icon": "shield", "description": "d", "tech": ["Wazuh"],
+    })
+    updated = await client.put(f"/api/portfolio/{user_id}", json={"stats": [{"label": "Projects", "source": "projects"}]})
+    assert_public(updated.json())
+    assert updated.json()["stats"][0]["value"] == "1"
+
+    response = await client.get(f"/api/portfolio/{user_id}")
+    assert response.headers["ETag"]
+    assert_public(response.json()["portfolio"])
+    sparse = await client.get(f"/api/portfolio/{user_id}", params={"fields": "portfolio.stats.value"})
+    assert [stat["value"] for stat in sparse.json()["portfolio"]["stats"]] == ["1"]
+    assert not set(INTERNAL_FIELDS) & set(sparse.json()["portfolio"])
+
+    batch = await client.post("/api/portfolios:batchGet", json={"userIds": [user_id]})
+    assert_public(batch.json()["portfolios"][0]["portfolio"])
+    assert_public((await client.get(f"/api/portfolio/{user_id}/changes")).json()["portfolio"])
+
+    export = await client.get(f"/api/portfolio/{user_id}/export")
+    assert_public(json.loads(export.text.splitlines()[0])["data"])
+
+
+async def test_create_response_leaves_out_bookkeeping(client):
+    response = await client.post("/api/portfolio", json={
+        "userId": "fresh-user", "personalInfo": {"name": "Test User", "title": "Tester"},
+    })
+    assert_public(response.json())
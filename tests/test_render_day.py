@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.counters import render_stat
+from services.delta import SyncToken, encode_sync_token
+from services.snapshots import SnapshotStore
+
+pytestmark = pytest.mark.anyio
+
+CURRENT_ROLE = {
+    "role": "Engineer", "company": "Acme", "location": "Remote", "period": "2020 - now",
+    "startDate": "2020-01-01T00:00:00", "current": True,
+}
+YEARS = {"stats": [{"label": "Years", "source": "experienceYears"}]}
+
+
+def test_current_roles_grow_with_the_day():
+    counters = {"currentRoles": 1, "currentStartDays": (datetime(2020, 1, 1) - datetime(1970, 1, 1)).days}
+    stat = {"source": "experienceYears"}
+    assert render_stat(stat, counters, datetime(2022, 6, 1)) == "2+"
+    assert render_stat(stat, counters, datetime(2023, 6, 1)) == "3+"
+
+
+async def test_etag_and_cache_change_with_the_render_day(app, client, user_id, monkeypatch):
+    await client.post(f"/api/portfolio/{user_id}/experience", json=CURRENT_ROLE)
+    await client.put(f"/api/portfolio/{user_id}", json=YEARS)
+    monkeypatch.setattr(app, "render_day", lambda: "2030-01-01")
+    first = await client.get(f"/api/portfolio/{user_id}")
+    etag = first.headers["ETag"]
+    assert (await client.get(f"/api/portfolio/{user_id}", headers={"If-None-Match": etag})).status_code == 304
+
+    monkeypatch.setattr(app, "render_day", lambda: "2030-01-02")
+    next_day = await client.get(f"/api/portfolio/{user_id}", headers={"If-None-Match": etag})
+    assert next_day.status_code == 200 and next_day.headers["ETag"] != etag
+
+
+async def test_snapshots_are_rerendered_on_a_new_day(app, client, user_id, monkeypatch, tmp_path):
+    monkeypatch.setattr(app, "snapshots", SnapshotStore(str(tmp_path), 1024))
+    monkeypatch.setattr(app, "render_day", lambda: "2030-01-01")
+    etag = (await client.get(f"/api/portfolio/{user_id}")).headers["ETag"]
+    assert app.snapshots.get(user_id).rendered_on == "2030-01-01"
+
+    monkeypatch.setattr(app, "render_day", lambda: "2030-01-02")
+    response = await client.get(f"/api/portfolio/{user_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+    assert app.snapshots.get(user_id).rendered_on == "2030-01-02"
+
+
+async def test_delta_sync_resends_the_portfolio_on_a_new_day(app, client, user_id):
+    await client.put(f"/api/portfolio/{user_id}", json=YEARS)
+    first = (await client.get(f"/api/portfolio/{user_id}/changes")).json()
+    unchanged = (await client.get(f"/api/portfolio/{user_id}/changes", params={"since": first["next"]})).json()
+    assert unchanged["portfolio"] is None
+
+    ref = await app.get_portfolio_version(user_id)
+    yesterday = encode_sync_token(SyncToken(ref.id, ref.version, datetime.utcnow() - timedelta(days=1)))
+    resent = (await client.get(f"/api/portfolio/{user_id}/changes", params={"since": yesterday})).json()
+    assert not resent["full"] and resent["portfolio"]["stats"][0]["label"] == "Years"
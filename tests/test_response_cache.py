@@ -0,0 +1,28 @@
+from services.response_cache import CachedResponse, ResponseCache
+
+RESPONSE = CachedResponse(b"{}", '"etag"')
+
+
+def test_generations_are_bounded_and_never_reused():
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    captured = cache.generation("a")
+    for user_id in ("a", "b", "c", "d"):
+        cache.invalidate(user_id)
+    assert cache.stats()["generations"] == 2
+    # "a" lost its generation, but a read that started before its write still cannot cache
+    cache.set("a", "portfolio", RESPONSE, captured)
+    assert cache.get("a", "portfolio") is None
+    cache.set("a", "portfolio", RESPONSE, cache.generation("a"))
+    assert cache.get("a", "portfolio") == RESPONSE
+
+
+def test_clear_drops_reads_in_flight():
+    cache = ResponseCache(max_entries=8, ttl_seconds=60)
+    cache.invalidate("a")
+    captured = {user_id: cache.generation(user_id) for user_id in ("a", "b")}
+    cache.clear()
+    for user_id, generation in captured.items():
+        cache.set(user_id, "portfolio", RESPONSE, generation)
+        assert cache.get(user_id, "portfolio") is None
+    assert cache.stats()["generations"] == 0 and cache.stale_writes == 2
+
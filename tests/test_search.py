@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+from services.search import SEARCH_FIELDS, SearchIndex
+
+pytestmark = pytest.mark.anyio
+
+PROJECT = {"status": "Live", "icon": "rocket", "description": "A compiler written in Rust", "tech": ["Rust", "LLVM"]}
+
+
+async def test_search_ranks_and_follows_writes(client, user_id):
+    compiler = (await client.post(f"/api/portfolio/{user_id}/projects", json={"title": "Compiler", **PROJECT})).json()
+    await client.post(f"/api/portfolio/{user_id}/projects", json={
+        **PROJECT, "title": "Website", "description": "A static site", "tech": ["Python"],
+    })
+    await client.post(f"/api/portfolio/{user_id}/skills", json={"category": "Languages", "icon": "code", "skills": ["Rust"]})
+
+    found = (await client.get(f"/api/portfolio/{user_id}/search", params={"q": "rust"})).json()
+    assert found["total"] == 2
+    assert {result["section"] for result in found["results"]} == {"projects", "skills"}
+    scores = [result["score"] for result in found["results"]]
+    assert scores == sorted(scores, reverse=True)
+
+    projects = (await client.get(f"/api/portfolio/{user_id}/search", params={"q": "rust", "sections": "projects"})).json()
+    assert [result["item"]["_id"] for result in projects["results"]] == [compiler["_id"]]
+
+    # The built index is patched by later writes
+    await client.delete(f"/api/portfolio/{user_id}/projects/{compiler['_id']}")
+    after = (await client.get(f"/api/portfolio/{user_id}/search", params={"q": "compiler"})).json()
+    assert after["total"] == 0
+
+
+async def test_search_errors(client, user_id):
+    assert (await client.get(f"/api/portfolio/{user_id}/search", params={"q": "x", "sections": "nope"})).status_code == 400
+    assert (await client.get("/api/portfolio/nobody/search", params={"q": "x"})).status_code == 404
+
+
+class SlowSkills:
+    """Section storage whose list() lets a write land mid-build"""
+
+    def __init__(self, during_build):
+        self.during_build = during_build
+
+    async def list(self, portfolio_id):
+        self.during_build()
+        return []
+
+
+def test_generations_are_bounded():
+    index = SearchIndex(max_portfolios=2)
+    for user_id in ("a", "b", "c", "d"):
+        index.discard(user_id)
+    assert index.stats()["generations"] == 2
+    # Forgotten users share a base generation that moved past every one they had
+    assert index.generation("a") == index.generation("b") == 4
+    index.clear()
+    assert index.stats()["generations"] == 0
+    assert index.generation("d") == 5
+
+
+@pytest.mark.parametrize("write", [
+    lambda index: index.discard("a"),
+    # Only another user's write, but it pushes "a" out of the bounded generations
+    lambda index: [index.discard(user_id) for user_id in ("b", "c")],
+    lambda index: index.clear(),
+])
+async def test_builds_that_overlap_a_write_are_not_kept(write):
+    index = SearchIndex(max_portfolios=2)
+    index.discard("a")
+    storage = SimpleNamespace(sections={section: SlowSkills(lambda: write(index)) for section in SEARCH_FIELDS})
+
+    await index.search(storage, "a", ObjectId(), "rust")
+    assert index.stats()["portfolios"] == 0 and index.stale_builds == 1
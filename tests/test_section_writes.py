@@ -0,0 +1,43 @@
+import pytest
+from bson import ObjectId
+
+pytestmark = pytest.mark.anyio
+
+SKILL = {"category": "Languages", "icon": "code", "skills": ["Python"]}
+
+
+async def test_create_update_delete_return_the_written_item(client, user_id):
+    created = await client.post(f"/api/portfolio/{user_id}/skills", json=SKILL)
+    assert created.status_code == 200
+    item = created.json()
+    assert item["_id"] and item["category"] == "Languages" and item["createdAt"]
+
+    updated = await client.put(f"/api/portfolio/{user_id}/skills/{item['_id']}", json={**SKILL, "skills": ["Rust"]})
+    assert updated.status_code == 200
+    assert updated.json()["_id"] == item["_id"]
+    assert updated.json()["skills"] == ["Rust"]
+    assert updated.json()["updatedAt"] >= item["updatedAt"]
+
+    assert (await client.delete(f"/api/portfolio/{user_id}/skills/{item['_id']}")).status_code == 200
+    assert (await client.get(f"/api/portfolio/{user_id}/skills")).json() == []
+
+
+async def test_missing_items_are_404(client, user_id):
+    missing = str(ObjectId())
+    assert (await client.put(f"/api/portfolio/{user_id}/skills/{missing}", json=SKILL)).status_code == 404
+    assert (await client.put(f"/api/portfolio/{user_id}/skills/not-an-id", json=SKILL)).status_code == 404
+    assert (await client.delete(f"/api/portfolio/{user_id}/skills/{missing}")).status_code == 404
+    assert (await client.post("/api/portfolio/nobody/skills", json=SKILL)).status_code == 404
+
+
+async def test_items_of_another_portfolio_are_404(client, user_id):
+    await client.post("/api/portfolio", json={"userId": "other", "personalInfo": {"name": "Other", "title": "Tester"}})
+    item = (await client.post("/api/portfolio/other/skills", json=SKILL)).json()
+
+    assert (await client.put(f"/api/portfolio/{user_id}/skills/{item['_id']}", json=SKILL)).status_code == 404
+    assert (await client.delete(f"/api/portfolio/{user_id}/skills/{item['_id']}")).status_code == 404
+    assert len((await client.get("/api/portfolio/other/skills")).json()) == 1
+
+
+async def test_update_missing_portfolio_is_404(client):
+    assert (await client.put("/api/portfolio/nobody", json={"personalInfo": {"name": "X", "title": "Y"}})).status_code == 404
@@ -0,0 +1,34 @@
+import json
+from datetime import date, datetime
+
+import pytest
+from bson import ObjectId
+
+from models.portfolio import PyObjectId
+from models.skill import SkillCreate
+from services.serialization import dumps_bytes
+
+
+def test_mongo_types_encode_in_one_pass():
+    object_id = ObjectId()
+    document = {
+        "_id": object_id,
+        "portfolioId": PyObjectId(object_id),
+        "createdAt": datetime(2024, 5, 1, 12, 30),
+        "day": date(2024, 5, 1),
+        "item": SkillCreate(category="Languages", icon="code", skills=["Python"]),
+        "name": "Zoë",
+    }
+    assert json.loads(dumps_bytes(document)) == {
+        "_id": str(object_id),
+        "portfolioId": str(object_id),
+        "createdAt": "2024-05-01T12:30:00",
+        "day": "2024-05-01",
+        "item": {"category": "Languages", "icon": "code", "skills": ["Python"], "order": 0},
+        "name": "Zoë",
+    }
+
+
+def test_unknown_types_are_rejected():
+    with pytest.raises(TypeError):
+        dumps_bytes({"value": object()})
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from services.single_flight import SingleFlight, SingleFlightTimeout
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_calls_share_one_flight():
+    flight = SingleFlight(timeout=1.0)
+    calls = 0
+    release = asyncio.Event()
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return calls
+
+    waiters = [asyncio.ensure_future(flight.do("key", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(*waiters) == [1] * 5
+    assert flight.flights == 1
+    assert flight.coalesced == 4
+
+    # Once done, the next call starts afresh
+    assert await flight.do("key", fetch) == 2
+
+
+async def test_errors_are_shared_and_not_cached():
+    flight = SingleFlight(timeout=1.0)
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.errors == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+async def test_timeout_cancels_the_flight():
+    flight = SingleFlight(timeout=0.01)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    with pytest.raises(SingleFlightTimeout):
+        await flight.do("key", hang)
+    assert flight.timeouts == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+async def test_a_cancelled_caller_does_not_cancel_the_others():
+    flight = SingleFlight(timeout=1.0)
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "data"
+
+    first = asyncio.ensure_future(flight.do("key", fetch))
+    second = asyncio.ensure_future(flight.do("key", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    assert await second == "data"
@@ -0,0 +1,88 @@
+import gzip
+
+import pytest
+
+from services.snapshots import SnapshotStore
+
+pytestmark = pytest.mark.anyio
+
+
+def test_write_and_map(tmp_path):
+    store = SnapshotStore(str(tmp_path), min_size=100)
+    body = b'{"portfolio":' + b" " * 200 + b"}"
+    assert store.write("alice", body, '"etag"', 2, rendered_on="2030-01-01")
+
+    snapshot = store.get("alice")
+    assert (snapshot.etag, snapshot.version, snapshot.rendered_on) == ('"etag"', 2, "2030-01-01")
+    assert snapshot.body() == body
+    assert gzip.decompress(snapshot.body("gzip")) == body
+    assert store.get("alice") is snapshot
+    assert store.get("bob") is None
+
+
+def test_small_bodies_are_stored_as_is(tmp_path):
+    store = SnapshotStore(str(tmp_path), min_size=100)
+    store.write("alice", b"{}", '"etag"', 1)
+    assert set(store.get("alice").parts) == {""}
+
+
+def test_older_versions_never_replace_newer(tmp_path):
+    store = SnapshotStore(str(tmp_path), min_size=100)
+    store.write("alice", b'{"v":2}', '"two"', 2)
+    assert not store.write("alice", b'{"v":1}', '"one"', 1)
+    assert store.get("alice").etag == '"two"'
+
+    store.discard_older("alice", 2)
+    assert store.get("alice") is not None
+    store.discard_older("alice", 3)
+    assert store.get("alice") is None
+
+
+def test_user_ids_stay_inside_the_directory(tmp_path):
+    store = SnapshotStore(str(tmp_path), min_size=100)
+    assert store.path("../../etc/passwd").parent == tmp_path
+
+
+async def test_reads_are_served_from_the_snapshot_and_writes_refresh_it(app, client, user_id, monkeypatch, tmp_path):
+    monkeypatch.setattr(app, "snapshots", SnapshotStore(str(tmp_path), 1024))
+    first = await client.get(f"/api/portfolio/{user_id}")
+    assert first.status_code == 200
+    snapshot = app.snapshots.get(user_id)
+    assert snapshot.etag == first.headers["ETag"]
+    assert snapshot.body() == first.content
+
+    await client.put(f"/api/portfolio/{user_id}", json={"personalInfo": {"name": "Renamed", "title": "Tester"}})
+    assert app.snapshots.get(user_id).version > snapshot.version
+    second = await client.get(f"/api/portfolio/{user_id}", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.json()["portfolio"]["personalInfo"]["name"] == "Renamed"
+
+
+@pytest.mark.parametrize("content", [
+    b"",
+    b'{"etag": "\\"e\\"", "version": 1, "parts": {"": [0, 100]}}\n{}',  # body cut short
+    b'{"etag": "\\"e\\"", "vers',  # crashed mid-header
+    b'{"etag": "\\"e\\"", "version": 1}\n{}',
+    b'{"etag": "\\"e\\"", "version": "1", "parts": {"": [0, 2]}}\n{}',
+    b'[1, 2]\n{}',
+])
+def test_corrupt_files_are_discarded(tmp_path, content):
+    store = SnapshotStore(str(tmp_path), min_size=100)
+    store.path("alice").write_bytes(content)
+
+    assert store.get("alice") is None
+    assert not store.path("alice").exists()
+    assert store.stats()["corrupt"] == 1
+    # And the next render replaces it
+    assert store.write("alice", b"{}", '"etag"', 1)
+    assert store.get("alice").etag == '"etag"'
+
+
+async def test_a_corrupt_snapshot_is_rerendered(app, client, user_id, monkeypatch, tmp_path):
+    monkeypatch.setattr(app, "snapshots", SnapshotStore(str(tmp_path), 1024))
+    app.snapshots.path(user_id).write_bytes(b'{"etag": "\"e\"", "version": 1, "parts": {"": [0, 9999]}}\n{')
+
+    response = await client.get(f"/api/portfolio/{user_id}")
+    assert response.status_code == 200
+    assert response.json()["portfolio"]["userId"] == user_id
+    assert app.snapshots.get(user_id).etag == response.headers["ETag"]
@@ -0,0 +1,21 @@
+import pytest
+from pydantic import ValidationError
+
+from models.portfolio import Stat
+from services.counters import render_stat
+
+
+@pytest.mark.parametrize("template", [
+    "{value:>999999999}", "{value.__class__}", "{value[0]}", "{value!r}", "{other}", "{}", "{0}", "{value", "x" * 65,
+])
+def test_rejects_anything_but_a_bare_placeholder(template):
+    with pytest.raises(ValidationError):
+        Stat(label="Projects", source="projects", format=template)
+
+
+@pytest.mark.parametrize("template, rendered", [
+    ("{value}+", "12+"), ("{value} of {value}", "12 of 12"), ("{{{value}}}", "{12}"), ("Many", "Many"),
+])
+def test_renders_literal_templates(template, rendered):
+    stat = Stat(label="Projects", source="projects", format=template).dict()
+    assert render_stat(stat, {"projects": 12}) == rendered
@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+from services.storage import STORAGE_BACKENDS
+from storage_checks import CHECKS, open_storage
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(params=STORAGE_BACKENDS)
+async def storage(request, tmp_path):
+    opened = await open_storage(request.param, os.environ.get("CONFORMANCE_MONGO_URL"), str(tmp_path))
+    if opened is None:
+        pytest.skip(f"{request.param} needs mongomock-motor")
+    storage, cleanup = opened
+    yield storage
+    if cleanup is not None:
+        await cleanup()
+    storage.close()
+
+
+@pytest.mark.parametrize("check", CHECKS, ids=lambda fn: fn.__name__)
+async def test_conformance(storage, check):
+    await check(storage)
@@ -0,0 +1,152 @@
+import json
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError, OperationFailure
+
+from services.transfer import IMPORT_JOBS, TransferConflict, import_portfolio
+
+pytestmark = pytest.mark.anyio
+
+
+class _Racing:
+    """A database whose `name` collection gets `competitor` inserted just before our own insert,
+    as if a concurrent import had passed the same existence checks and won"""
+
+    def __init__(self, db, name, competitor):
+        self._db = db
+        self._name = name
+        self._competitor = competitor
+
+    def __getitem__(self, name):
+        collection = self._db[name]
+        return _RacingCollection(collection, self._competitor) if name == self._name else collection
+
+    def __getattr__(self, name):
+        return self[name] if name == self._name else getattr(self._db, name)
+
+
+class _RacingCollection:
+    def __init__(self, collection, competitor):
+        self._collection = collection
+        self._competitor = competitor
+
+    async def insert_one(self, document, *args, **kwargs):
+        if self._competitor is not None:
+            competitor, self._competitor = self._competitor, None
+            await self._collection.insert_one(competitor)
+        return await self._collection.insert_one(document, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+def _lines(user_id):
+    records = [
+        {"type": "portfolio", "data": {"userId": user_id, "personalInfo": {"name": "Test User", "title": "Tester"}}},
+        {"type": "skills", "data": {"category": "Languages", "icon": "code", "skills": ["Python"]}},
+    ]
+    return [json.dumps(record).encode("utf-8") for record in records]
+
+
+async def _aiter(lines):
+    for line in lines:
+        yield line
+
+
+async def test_import_round_trip(client, user_id):
+    await client.post(f"/api/portfolio/{user_id}/skills", json={"category": "Languages", "icon": "code", "skills": ["Python"]})
+    exported = await client.get(f"/api/portfolio/{user_id}/export")
+    assert exported.status_code == 200
+
+    response = await client.post("/api/portfolio:import?user_id=copy", content=exported.content)
+    assert response.status_code == 200, response.text
+    skills = (await client.get("/api/portfolio/copy/skills")).json()
+    assert [skill["skills"] for skill in skills] == [["Python"]]
+
+
+async def test_concurrent_import_of_the_same_id_conflicts(app):
+    competitor = {"_id": "import-1", "userId": "copy", "status": "running"}
+    db = _Racing(app.db, IMPORT_JOBS, competitor)
+
+    with pytest.raises(TransferConflict) as e:
+        await import_portfolio(db, _aiter(_lines("copy")), import_id="import-1")
+    assert "importId" in str(e.value)
+    assert e.value.report["importId"] == "import-1"
+
+
+async def test_concurrent_import_for_the_same_user_conflicts(app):
+    await app.db.portfolios.create_index("userId", unique=True)
+    await app.db[IMPORT_JOBS].insert_one({"_id": "import-1", "userId": "copy", "status": "running"})
+    db = _Racing(app.db, "portfolios", {"_id": "other-portfolio", "userId": "copy"})
+
+    with pytest.raises(TransferConflict) as e:
+        await import_portfolio(db, _aiter(_lines("copy")), import_id="import-2")
+    assert e.value.report["conflictingImportId"] == "import-1"
+    assert "importId=import-1" in str(e.value)
+    assert (await app.db[IMPORT_JOBS].find_one({"_id": "import-2"}))["status"] == "failed"
+
+
+async def test_import_conflict_is_409(app, client, monkeypatch):
+    await app.db.portfolios.create_index("userId", unique=True)
+    monkeypatch.setattr(app, "db", _Racing(app.db, "portfolios", {"_id": "other-portfolio", "userId": "copy"}))
+
+    response = await client.post("/api/portfolio:import", content=b"\n".join(_lines("copy")))
+    assert response.status_code == 409, response.text
+    assert response.json()["report"]["userId"] == "copy"
+
+
+class _Failing:
+    """A database whose section inserts fail with `error` (only the first `times` of them)"""
+
+    def __init__(self, db, error, times=1):
+        self._db = db
+        self._error = error
+        self.times = times
+
+    def __getitem__(self, name):
+        collection = self._db[name]
+        return collection if name in ("portfolios", IMPORT_JOBS) else _FailingCollection(collection, self)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+class _FailingCollection:
+    def __init__(self, collection, db):
+        self._collection = collection
+        self._db = db
+
+    async def insert_many(self, documents, *args, **kwargs):
+        if self._db.times > 0:
+            self._db.times -= 1
+            raise self._db._error
+        return await self._collection.insert_many(documents, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+@pytest.mark.parametrize("error, status_code", [
+    (AutoReconnect("connection reset"), 503),
+    (OperationFailure("disk full", 14031), 500),
+    (BulkWriteError({"writeErrors": [{"code": 121, "errmsg": "validation failed"}]}), 500),
+])
+async def test_storage_failures_are_server_errors_and_resume(app, client, monkeypatch, error, status_code):
+    body = b"\n".join(_lines("copy"))
+    monkeypatch.setattr(app, "db", _Failing(app.db, error))
+
+    failed = await client.post("/api/portfolio:import", content=body)
+    assert failed.status_code == status_code, failed.text
+    import_id = failed.json()["report"]["importId"]
+
+    resumed = await client.post("/api/portfolio:import", params={"import_id": import_id}, content=body)
+    assert resumed.status_code == 200, resumed.text
+    assert resumed.json()["resumed"] is True
+    assert len((await client.get("/api/portfolio/copy/skills")).json()) == 1
+
+
+async def test_malformed_lines_are_client_errors(client):
+    lines = _lines("copy") + [json.dumps({"type": "skills", "data": {"category": "No icon"}}).encode("utf-8")]
+    response = await client.post("/api/portfolio:import", content=b"\n".join(lines))
+    assert response.status_code == 400
+    assert response.json()["report"]["importId"]